@@ -2,18 +2,37 @@ import os
 import random
 import time
 import base64
+import copy
+import hashlib
+import heapq
+import itertools
 import re
 import json
+import logging
+import socket
+import sqlite3
+import statistics
 import subprocess
 import unicodedata
-from difflib import SequenceMatcher
 import tempfile
 import shutil
+import queue
 import threading
 import uuid
+import zipfile
+from collections import Counter, OrderedDict, deque
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse, parse_qs
 from flask import Flask, render_template, request, redirect, url_for, Response, stream_with_context, jsonify, send_file
 
+import click
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http.cookiejar import DefaultCookiePolicy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from bs4 import BeautifulSoup
 import yt_dlp
 
@@ -34,7 +53,7 @@ def _make_task():
     task_id = uuid.uuid4().hex[:12]
     task = {
         'id': task_id,
-        'status': 'starting',     # starting | downloading | merging | done | error
+        'status': 'starting',     # queued | starting | downloading | merging | done | error
         'progress': 0,            # 0-100
         'message': 'Preparing…',
         'filename': None,
@@ -45,6 +64,8 @@ def _make_task():
         'error': None,
         'created_at': time.time(),
         'last_activity': time.time(),
+        '_changed': threading.Condition(),   # notified when progress/status/message change
+        '_notified': None,
     }
     download_tasks[task_id] = task
     # Prune old tasks — never kill a still-running download
@@ -53,7 +74,8 @@ def _make_task():
         t = download_tasks.get(tid)
         if not t:
             continue
-        if t['status'] in ('starting', 'downloading', 'merging'):
+        _sync_follower(t)
+        if t['status'] in ('queued', 'starting', 'downloading', 'merging'):
             continue
         age = now - t.get('last_activity', t['created_at'])
         if age > TASK_TTL:
@@ -61,6 +83,20 @@ def _make_task():
     return task
 
 
+def _notify_task(task, force=False):
+    """Wake /download_events listeners if progress, status or message changed.
+
+    ``force`` wakes them regardless (e.g. the queue position moved).
+    """
+    snapshot = (task['status'], task['progress'], task['message'])
+    if snapshot == task.get('_notified') and not force:
+        return
+    task['_notified'] = snapshot
+    with task['_changed']:
+        task['_version'] = task.get('_version', 0) + 1
+        task['_changed'].notify_all()
+
+
 def _cleanup_task(task_id):
     """Remove task and its temp files."""
     task = download_tasks.pop(task_id, None)
@@ -68,72 +104,363 @@ def _cleanup_task(task_id):
         shutil.rmtree(task['tmpdir'], ignore_errors=True)
 
 
-# ── Global download limiter (100 per 24 h across all platforms) ───────────
+# ── Small in-process TTL/LRU cache ────────────────────────────────────────
+class _TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value or None (counts as a miss)."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        """Store ``value`` for ``ttl`` seconds (default: the cache TTL)."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def replace(self, key, old, new):
+        """Swap ``old`` for ``new`` under ``key``, keeping its expiry; False if it changed."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] is not old:
+                return False
+            self._data[key] = (entry[0], new)
+            return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ── Download limiter (sliding 24-h window; global, per-IP, per-platform) ──
+# Counts live in fixed-width time buckets, so a check is one indexed SUM and a
+# reservation is one UPSERT — no per-request sort or file rewrite.  The SQLite
+# backend (WAL mode) is shared safely by every gunicorn worker on the box.
 DAILY_DOWNLOAD_LIMIT = 100
+PER_IP_DAILY_LIMIT = int(os.environ.get('PER_IP_DAILY_LIMIT', 0))          # 0 = no per-IP cap
+PLATFORM_DAILY_LIMITS = {                                                 # e.g. "youtube=60,spotify=40"
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition('=') for item in os.environ.get('PLATFORM_DAILY_LIMITS', '').split(',')
+    )
+    if name.strip() and limit.strip().isdigit()
+}
+LIMIT_WINDOW_SECONDS = 86400
+LIMIT_BUCKET_SECONDS = 900
+DOWNLOAD_LIMITER_BACKEND = os.environ.get('DOWNLOAD_LIMITER_BACKEND', 'sqlite')   # sqlite | memory
+_DL_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.download_limits.sqlite3')
 _DL_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.download_log.json')
-_dl_log_lock = threading.Lock()
 
 
-def _load_download_log():
-    """Load timestamps from disk. Caller must hold _dl_log_lock."""
+def _current_bucket(now=None):
+    return int((now or time.time()) // LIMIT_BUCKET_SECONDS)
+
+
+def _oldest_live_bucket(now=None):
+    return _current_bucket(now) - LIMIT_WINDOW_SECONDS // LIMIT_BUCKET_SECONDS + 1
+
+
+class _LimiterBackend(ABC):
+    """Bucketed sliding-window counters keyed by scope (``global``, ``ip:…``, …)."""
+
+    @abstractmethod
+    def reserve(self, limits):
+        """Atomically add one to every scope in ``limits`` ({scope: limit}) if all are under their limit."""
+
+    @abstractmethod
+    def release(self, scopes):
+        """Undo one reservation in each of ``scopes``."""
+
+    @abstractmethod
+    def count(self, scope):
+        """Reservations for ``scope`` in the current window."""
+
+    @abstractmethod
+    def record(self, scope, stamps):
+        """Add past reservations to ``scope`` at their original unix times (no limit check)."""
+
+
+class _MemoryLimiter(_LimiterBackend):
+    """Single-process backend (DOWNLOAD_LIMITER_BACKEND=memory, or when SQLite is unavailable)."""
+
+    def __init__(self):
+        self._buckets = {}   # scope -> {bucket: count}
+        self._lock = threading.Lock()
+
+    def _count(self, scope, oldest):
+        return sum(c for b, c in self._buckets.get(scope, {}).items() if b >= oldest)
+
+    def reserve(self, limits):
+        oldest = _oldest_live_bucket()
+        bucket = _current_bucket()
+        with self._lock:
+            if any(self._count(scope, oldest) >= limit for scope, limit in limits.items()):
+                return False
+            for scope in limits:
+                buckets = self._buckets.setdefault(scope, {})
+                for b in [b for b in buckets if b < oldest]:
+                    del buckets[b]
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            return True
+
+    def release(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                live = [b for b, c in self._buckets.get(scope, {}).items() if c > 0]
+                if live:
+                    self._buckets[scope][max(live)] -= 1
+
+    def count(self, scope):
+        with self._lock:
+            return self._count(scope, _oldest_live_bucket())
+
+    def record(self, scope, stamps):
+        oldest = _oldest_live_bucket()
+        with self._lock:
+            buckets = self._buckets.setdefault(scope, {})
+            for bucket in map(_current_bucket, stamps):
+                if bucket >= oldest:
+                    buckets[bucket] = buckets.get(bucket, 0) + 1
+
+
+class _SQLiteTxn:
+    """``BEGIN IMMEDIATE`` … ``COMMIT`` so check-and-increment is atomic across processes.
+
+    ``immediate=False`` opens a plain deferred transaction for read-only
+    work, which in WAL mode never waits on (or blocks) writers.
+    """
+
+    def __init__(self, conn, immediate=True):
+        self.conn = conn
+        self.immediate = immediate
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE' if self.immediate else 'BEGIN')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class _SQLiteLimiter(_LimiterBackend):
+    """Cross-process backend: one WAL-mode SQLite file shared by all workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS download_buckets ('
+                ' scope TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,'
+                ' PRIMARY KEY (scope, bucket))'
+            )
+
+    def _conn(self, immediate=True):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _SQLiteTxn(conn, immediate)
+
+    @staticmethod
+    def _count(conn, scope, oldest):
+        row = conn.execute(
+            'SELECT COALESCE(SUM(count), 0) FROM download_buckets WHERE scope = ? AND bucket >= ?',
+            (scope, oldest),
+        ).fetchone()
+        return row[0]
+
+    def reserve(self, limits):
+        oldest = _oldest_live_bucket()
+        bucket = _current_bucket()
+        with self._conn() as conn:
+            if any(self._count(conn, scope, oldest) >= limit for scope, limit in limits.items()):
+                return False
+            for scope in limits:
+                conn.execute(
+                    'INSERT INTO download_buckets (scope, bucket, count) VALUES (?, ?, 1) '
+                    'ON CONFLICT (scope, bucket) DO UPDATE SET count = count + 1',
+                    (scope, bucket),
+                )
+            conn.execute('DELETE FROM download_buckets WHERE bucket < ?', (oldest,))
+            return True
+
+    def release(self, scopes):
+        with self._conn() as conn:
+            for scope in scopes:
+                conn.execute(
+                    'UPDATE download_buckets SET count = count - 1 WHERE scope = ? AND bucket = ('
+                    ' SELECT MAX(bucket) FROM download_buckets WHERE scope = ? AND count > 0)',
+                    (scope, scope),
+                )
+
+    def count(self, scope):
+        # Read-only: no write lock, so page renders don't queue behind reservations
+        with self._conn(immediate=False) as conn:
+            return self._count(conn, scope, _oldest_live_bucket())
+
+    def record(self, scope, stamps):
+        oldest = _oldest_live_bucket()
+        per_bucket = Counter(b for b in map(_current_bucket, stamps) if b >= oldest)
+        with self._conn() as conn:
+            for bucket, n in per_bucket.items():
+                conn.execute(
+                    'INSERT INTO download_buckets (scope, bucket, count) VALUES (?, ?, ?) '
+                    'ON CONFLICT (scope, bucket) DO UPDATE SET count = count + excluded.count',
+                    (scope, bucket, n),
+                )
+
+
+def _make_limiter():
+    if DOWNLOAD_LIMITER_BACKEND == 'sqlite':
+        try:
+            return _SQLiteLimiter(_DL_DB_FILE)
+        except sqlite3.Error as e:
+            print(f"Download limiter: SQLite unavailable ({e}), using in-memory counters")
+    return _MemoryLimiter()
+
+
+def _import_legacy_download_log(limiter):
+    """One-time import of the old ``.download_log.json`` timestamps into the global scope.
+
+    The file is claimed by renaming it first, so with several gunicorn
+    workers exactly one of them imports it.
+    """
+    claimed = _DL_LOG_FILE + '.imported'
     try:
-        with open(_DL_LOG_FILE, 'r') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
+        os.replace(_DL_LOG_FILE, claimed)
+        with open(claimed, 'r') as f:
+            stamps = json.load(f)
     except (FileNotFoundError, json.JSONDecodeError, OSError):
-        pass
-    return []
+        return
+    if isinstance(stamps, list):
+        limiter.record('global', [s for s in stamps if isinstance(s, (int, float))])
 
 
-def _save_download_log(log):
-    """Persist timestamps to disk atomically. Caller must hold _dl_log_lock."""
-    tmp = _DL_LOG_FILE + '.tmp'
-    try:
-        with open(tmp, 'w') as f:
-            json.dump(log, f)
-        # Atomic rename (as atomic as the OS allows)
-        if os.path.exists(_DL_LOG_FILE):
-            os.replace(tmp, _DL_LOG_FILE)
-        else:
-            os.rename(tmp, _DL_LOG_FILE)
-    except OSError:
-        pass
+_download_limiter = None
+_download_limiter_lock = threading.Lock()
 
 
-def _prune_log(log):
-    """Remove timestamps older than 24h. Returns new sorted list."""
-    now = time.time()
-    cutoff = now - 86400
-    if isinstance(log, dict): return [] # Reset if format mismatch
-    return sorted([t for t in log if t > cutoff])
+def _limiter():
+    """The download limiter, built (and the legacy log imported) on first use."""
+    global _download_limiter
+    if _download_limiter is None:
+        with _download_limiter_lock:
+            if _download_limiter is None:
+                limiter = _make_limiter()
+                _import_legacy_download_log(limiter)
+                _download_limiter = limiter
+    return _download_limiter
+
+
+# X-Forwarded-For hops appended by proxies we control (the platform router).
+# Only those are trusted: the client can prepend anything it likes, so the
+# first hop must never be used for the per-IP quota.  0 = not behind a proxy.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=0)
+
+
+def _client_ip():
+    """Client IP as seen by the last trusted proxy (ProxyFix rewrites remote_addr)."""
+    return request.remote_addr or 'unknown'
 
 
-def downloads_remaining():
+def _quota_limits(client_ip=None, platform=None):
+    """{scope: limit} for every quota that applies to this request."""
+    limits = {'global': DAILY_DOWNLOAD_LIMIT}
+    if client_ip and PER_IP_DAILY_LIMIT:
+        limits[f'ip:{client_ip}'] = PER_IP_DAILY_LIMIT
+    if platform in PLATFORM_DAILY_LIMITS:
+        limits[f'platform:{platform}'] = PLATFORM_DAILY_LIMITS[platform]
+    return limits
+
+
+def downloads_remaining(client_ip=None, platform=None):
     """How many downloads are still allowed in the current 24-h window."""
-    with _dl_log_lock:
-        log = _prune_log(_load_download_log())
-        return max(DAILY_DOWNLOAD_LIMIT - len(log), 0)
-
-
-def try_reserve_download():
-    """Atomically check limit AND record a download. Returns True if allowed."""
-    with _dl_log_lock:
-        log = _prune_log(_load_download_log())
-        if len(log) >= DAILY_DOWNLOAD_LIMIT:
-            return False
-        log.append(time.time())
-        _save_download_log(log)
-        return True
+    return max(min(
+        limit - _limiter().count(scope)
+        for scope, limit in _quota_limits(client_ip, platform).items()
+    ), 0)
+
+
+def try_reserve_download(client_ip=None, platform=None):
+    """Atomically check every applicable quota AND record a download.
+
+    Returns the reservation (a tuple of scopes, truthy) to hand back to
+    ``unreserve_download``, or None when any quota is exhausted.
+    """
+    limits = _quota_limits(client_ip, platform)
+    if not _limiter().reserve(limits):
+        return None
+    return tuple(limits)
 
 
-def unreserve_download():
-    """Remove the most recent entry (e.g. if download actually failed)."""
-    with _dl_log_lock:
-        log = _prune_log(_load_download_log())
-        if log:
-            log.pop()
-            _save_download_log(log)
+def unreserve_download(reservation=None):
+    """Give back a reservation (e.g. if the download actually failed).
+
+    ``()`` releases nothing — used by batch sub-tasks, which share their
+    parent's reservation.
+    """
+    _limiter().release(('global',) if reservation is None else reservation)
+
+
+def _quota_exceeded_message(client_ip=None, platform=None):
+    for scope, limit in _quota_limits(client_ip, platform).items():
+        if _limiter().count(scope) >= limit:
+            if scope.startswith('ip:'):
+                return f'Your daily download limit is reached ({limit}/day). Try again later.'
+            if scope.startswith('platform:'):
+                name = PLATFORMS.get(platform, {}).get('name', platform)
+                return f'Daily {name} download limit reached ({limit}/day). Try again later.'
+    return f'Daily download limit reached ({DAILY_DOWNLOAD_LIMIT}/day). Try again later.'
 
 
 # ── Proxy Rotation Logic (for 402 Payment Required errors) ──────────────────
@@ -173,6 +500,12 @@ PLATFORMS = {
     }
 }
 
+def _is_youtube_target(target):
+    """True for a YouTube URL or a ``ytsearch`` query."""
+    target = (target or '').lower()
+    return target.startswith('ytsearch') or any(d in target for d in PLATFORMS['youtube']['domains'])
+
+
 def detect_platform(url):
     """Detect which platform the URL belongs to."""
     url_lower = url.lower()
@@ -182,6 +515,120 @@ def detect_platform(url):
                 return platform_id, config
     return 'youtube', PLATFORMS['youtube']  # Default to YouTube
 
+# ── Shared HTTP client (keep-alive pools for every scraper / API helper) ─────
+# One session for the whole process: urllib3 keeps a pool of live connections
+# per host, so repeat calls to the same host skip the TCP + TLS handshake.
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 32))   # hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 16))           # connections per host
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+HTTP_DEFAULT_TIMEOUT = (5, 15)   # (connect, read) seconds when the caller gives none
+_HTTP_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+try:
+    import brotli  # noqa: F401 — lets urllib3 decode Content-Encoding: br
+    _HTTP_ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _HTTP_ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class _HttpClient:
+    """Pooled ``requests`` sessions with opt-in retry/backoff and per-host metrics.
+
+    Retries are off unless a call passes ``retry=True``: paid endpoints
+    (ScrapingBee bills every attempt) must never be re-sent behind the
+    caller's back.  ``keep_cookies=True`` gives the call its own cookie jar so
+    cookies set along a redirect chain are sent on the following hops.
+    """
+
+    def __init__(self):
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+            respect_retry_after_header=False,   # never park a request thread on Retry-After
+        )
+        self._session = self._make_session(0)   # requests default: no retries
+        self._retry_session = self._make_session(retry)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_session(retry):
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept-Encoding'] = _HTTP_ACCEPT_ENCODING
+        # Calls are independent scrapes on behalf of different users — don't
+        # let cookies from one leak into the next through the shared jar.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def request(self, method, url, retry=False, keep_cookies=False, **kwargs):
+        kwargs.setdefault('timeout', HTTP_DEFAULT_TIMEOUT)
+        if keep_cookies:
+            kwargs.setdefault('cookies', requests.cookies.RequestsCookieJar())
+        session = self._retry_session if retry else self._session
+        host = urlparse(url).hostname or ''
+        started = time.time()
+        status = None
+        try:
+            resp = session.request(method, url, **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            self._record(host, time.time() - started, status)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _record(self, host, elapsed, status):
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = self._hosts[host] = {
+                    'requests': 0, 'errors': 0, 'total_seconds': 0.0,
+                    'latency_histogram': [0] * (len(_HTTP_LATENCY_BUCKETS) + 1),
+                }
+            entry['requests'] += 1
+            entry['total_seconds'] += elapsed
+            if status is None or status >= 400:
+                entry['errors'] += 1
+            idx = next(
+                (i for i, bound in enumerate(_HTTP_LATENCY_BUCKETS) if elapsed <= bound),
+                len(_HTTP_LATENCY_BUCKETS),
+            )
+            entry['latency_histogram'][idx] += 1
+
+    def stats(self):
+        labels = [f'<={b}s' for b in _HTTP_LATENCY_BUCKETS] + [f'>{_HTTP_LATENCY_BUCKETS[-1]}s']
+        with self._lock:
+            return {
+                host: {
+                    'requests': e['requests'],
+                    'errors': e['errors'],
+                    'mean_seconds': round(e['total_seconds'] / e['requests'], 3),
+                    'latency_histogram': dict(zip(labels, e['latency_histogram'])),
+                }
+                for host, e in self._hosts.items()
+            }
+
+
+_http = _HttpClient()
+
+
 def get_youtube_channel_avatar(channel_id):
     """Fetch YouTube channel avatar from channel page."""
     if not channel_id:
@@ -193,7 +640,7 @@ def get_youtube_channel_avatar(channel_id):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
-        response = requests.get(channel_url, headers=headers, timeout=10)
+        response = _http.get(channel_url, headers=headers, timeout=10, retry=True)
         
         if response.status_code == 200:
             html = response.text
@@ -232,10 +679,11 @@ def _fetch_html_with_proxies(url):
     }
     
     try:
-        response = requests.get(
+        response = _http.get(
             url,
             headers=headers,
-            timeout=15
+            timeout=15,
+            retry=True,
         )
         if response.status_code == 200:
             return response.text
@@ -327,10 +775,11 @@ def get_instagram_user_avatar(user_id):
     }
 
     try:
-        resp = requests.get(
+        resp = _http.get(
             api_url,
             headers=ig_headers,
             timeout=10,
+            retry=True,
         )
         if resp.status_code == 200:
             user = resp.json().get("user", {})
@@ -361,7 +810,7 @@ def _resolve_fb_numeric_id_to_slug(numeric_id):
         return None
 
     try:
-        r = requests.head(
+        r = _http.head(
             f"https://www.facebook.com/{numeric_id}",
             headers={
                 "User-Agent": "facebookexternalhit/1.1",
@@ -369,6 +818,8 @@ def _resolve_fb_numeric_id_to_slug(numeric_id):
             },
             timeout=15,
             allow_redirects=True,
+            keep_cookies=True,   # facebook sets cookies on the hops before the slug
+            retry=True,
         )
         m = re.search(
             r'facebook\.com/([A-Za-z0-9._-]+)/?(?:\?.*)?$', r.url
@@ -423,7 +874,7 @@ def get_facebook_avatar_via_graph_api(uploader_id=None, webpage_url=None):
         f"?type=large&redirect=false"
     )
     try:
-        resp = requests.get(graph_url, timeout=10)
+        resp = _http.get(graph_url, timeout=10, retry=True)
         if resp.status_code != 200:
             return None
         data = resp.json().get('data', {})
@@ -613,7 +1064,7 @@ def _yt_dlp_base_opts(player_client=None, for_download=False, extra_opts=None):
         pass
 
     if for_download:
-        opts['concurrent_fragment_downloads'] = 8
+        opts['concurrent_fragment_downloads'] = _fragments_per_job(8)
         opts['retries'] = 10
         opts['fragment_retries'] = 10
 
@@ -623,70 +1074,240 @@ def _yt_dlp_base_opts(player_client=None, for_download=False, extra_opts=None):
     return opts
 
 
-def extract_video_info(video_url):
-    """Extract video info using yt-dlp with multi-client anti-bot strategy."""
-    last_error = None
-    best_info = None
-    best_height = -1
+def _is_bot_block_error(exc):
+    """True when yt-dlp failed because YouTube flagged the request as a bot."""
+    err_str = str(exc).lower()
+    return 'sign in' in err_str or 'bot' in err_str or '403' in err_str
 
-    print(f"Attempting to extract video info...")
 
-    # Try each client in priority order; web_safari first (best bypass)
-    clients_to_try = _YT_PLAYER_CLIENTS + [None]   # None = yt-dlp default
+# ── Adaptive player-client ranking ───────────────────────────────────────────
+# Per-client success / bot-block / latency statistics with exponential decay,
+# so a client that was blocked an hour ago gets another chance.  Clients are
+# picked by Thompson sampling; _YT_PLAYER_CLIENTS order only acts as a prior.
+CLIENT_STATS_HALF_LIFE = int(os.environ.get('CLIENT_STATS_HALF_LIFE', 900))  # seconds
+CLIENT_LATENCY_SCALE = 10.0   # a median probe of this many seconds halves a client's score
+CLIENT_BLOCK_PENALTY = 2.0    # a bot-block weighs this many plain failures
 
-    for attempt in range(2):
-        for player_client in clients_to_try:
-            try:
-                ydl_opts = _yt_dlp_base_opts(player_client)
 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
+class _ClientScoreboard:
+    """Decaying per-player-client statistics and a bandit picker."""
 
-                    formats = info.get('formats') or []
-                    current_height = max(
-                        (f.get('height') or 0) for f in formats if isinstance(f, dict)
-                    ) if formats else 0
-
-                    if current_height > best_height:
-                        best_height = current_height
-                        best_info = info
-
-                    # Early return if we already found high-res metadata
-                    if best_height >= 1440:
-                        channel_id = best_info.get('channel_id')
-                        if channel_id and not best_info.get('artist_image'):
-                            avatar = get_youtube_channel_avatar(channel_id)
-                            if avatar:
-                                best_info['artist_image'] = avatar
-                        return best_info
-
-                    # If we got ANY valid formats, no need to try more clients
-                    if current_height > 0:
-                        break
+    def __init__(self, clients, half_life):
+        self.half_life = half_life
+        n = len(clients)
+        # Earlier entries in the hard-coded list start with a slightly better prior
+        self._prior = {c: 1.0 + (n - i) / n for i, c in enumerate(clients)}
+        self._stats = {}
+        self._lock = threading.Lock()
 
-            except Exception as e:
-                last_error = e
-                err_str = str(e).lower()
-                # If bot detection or sign-in error, try next client
-                if 'sign in' in err_str or 'bot' in err_str or '403' in err_str:
-                    print(f"  Client '{player_client}' blocked, trying next…")
-                    time.sleep(0.5)
+    def _entry(self, client, now):
+        """Return the stats entry for ``client`` decayed to ``now``. Caller holds the lock."""
+        entry = self._stats.get(client)
+        if entry is None:
+            entry = self._stats[client] = {
+                'success': 0.0, 'failure': 0.0, 'blocked': 0.0,
+                'updated_at': now, 'latencies': deque(maxlen=50),
+            }
+        factor = 0.5 ** ((now - entry['updated_at']) / self.half_life)
+        for key in ('success', 'failure', 'blocked'):
+            entry[key] *= factor
+        entry['updated_at'] = now
+        return entry
+
+    def record(self, client, outcome, latency=None):
+        """Record ``outcome`` ('success' | 'failure' | 'blocked') for ``client``."""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(client, now)
+            entry[outcome] += 1.0
+            if latency is not None and outcome == 'success':
+                entry['latencies'].append(latency)
+
+    @contextmanager
+    def track(self, client, target, measure_latency=True):
+        """Time the wrapped yt-dlp call and record its outcome for ``client``.
+
+        Only YouTube ``target``s (URL or ``ytsearch`` query) count: other
+        extractors ignore player_client, so their failures say nothing
+        about which client YouTube currently prefers.
+        """
+        if not _is_youtube_target(target):
+            yield
+            return
+        started = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.record(client, 'blocked' if _is_bot_block_error(e) else 'failure')
+            raise
+        self.record(client, 'success', time.time() - started if measure_latency else None)
+
+    def rank(self, clients=None):
+        """Return ``clients`` (default: all named clients) best-first by sampled score."""
+        clients = list(_YT_PLAYER_CLIENTS if clients is None else clients)
+        now = time.time()
+        scored = []
+        with self._lock:
+            for client in clients:
+                entry = self._entry(client, now)
+                alpha = self._prior.get(client, 1.0) + entry['success']
+                beta = 1.0 + entry['failure'] + CLIENT_BLOCK_PENALTY * entry['blocked']
+                score = random.betavariate(alpha, beta)
+                if entry['latencies']:
+                    score /= 1.0 + statistics.median(entry['latencies']) / CLIENT_LATENCY_SCALE
+                scored.append((score, client))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [client for _, client in scored]
+
+    def choose(self, clients=None):
+        return self.rank(clients)[0]
+
+    def stats(self):
+        now = time.time()
+        out = {}
+        with self._lock:
+            for client in list(self._prior) + [c for c in self._stats if c not in self._prior]:
+                entry = self._entry(client, now)
+                total = entry['success'] + entry['failure'] + entry['blocked']
+                latencies = entry['latencies']
+                out[client or 'default'] = {
+                    'weighted_attempts': round(total, 2),
+                    'success_rate': round(entry['success'] / total, 3) if total else None,
+                    'block_rate': round(entry['blocked'] / total, 3) if total else None,
+                    'median_latency': round(statistics.median(latencies), 2) if latencies else None,
+                }
+        return out
+
+
+_client_scoreboard = _ClientScoreboard(_YT_PLAYER_CLIENTS + [None], CLIENT_STATS_HALF_LIFE)
+
+
+# ── Concurrent player-client probing ─────────────────────────────────────────
+# The leading client is probed alone; the race only widens to the other
+# clients when it fails, comes up short, or is still silent after
+# YT_PROBE_HEDGE_SECONDS, so a blocked IP no longer costs minutes of serial
+# timeouts while a healthy one costs a single extraction.
+YT_PROBE_CONCURRENCY = int(os.environ.get('YT_PROBE_CONCURRENCY', 3))  # 1 = sequential
+YT_PROBE_HEDGE_SECONDS = float(os.environ.get('YT_PROBE_HEDGE_SECONDS', 4))
+# Probes that lose a race can't be interrupted and keep their worker until
+# yt-dlp returns, so the pool is sized for several races' full fan-out.
+YT_PROBE_POOL_SIZE = int(os.environ.get('YT_PROBE_POOL_SIZE', 8 * max(YT_PROBE_CONCURRENCY, 1)))
+
+_probe_pool = ThreadPoolExecutor(max_workers=YT_PROBE_POOL_SIZE, thread_name_prefix='yt-probe')
+_winning_clients = {}   # platform_id -> player_client that last produced formats
+_winning_clients_lock = threading.Lock()
+
+
+def _clients_for_platform(platform_id):
+    """Player clients (None = yt-dlp default): last winner first, then by scoreboard rank."""
+    clients = _client_scoreboard.rank(_YT_PLAYER_CLIENTS + [None])
+    with _winning_clients_lock:
+        if platform_id not in _winning_clients:
+            return clients
+        winner = _winning_clients[platform_id]
+    return [winner] + [c for c in clients if c != winner]
+
+
+def _record_winning_client(platform_id, player_client):
+    with _winning_clients_lock:
+        _winning_clients[platform_id] = player_client
+
+
+def _probe_client(video_url, player_client):
+    """Extract metadata with one player client. Returns (info, max_height)."""
+    with _client_scoreboard.track(player_client, video_url):
+        with yt_dlp.YoutubeDL(_yt_dlp_base_opts(player_client)) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+    formats = info.get('formats') or []
+    height = max(
+        ((f.get('height') or 0) for f in formats if isinstance(f, dict)),
+        default=0,
+    )
+    return info, height
+
+
+def _race_player_clients(video_url, clients, goal_height):
+    """Probe ``clients`` in order, the first one alone.
+
+    Up to YT_PROBE_CONCURRENCY run at once only after the first probe fails,
+    falls short of ``goal_height`` or outlives YT_PROBE_HEDGE_SECONDS.
+    Returns ``(info, client, last_error)`` as soon as one client reaches
+    ``goal_height``; otherwise the tallest result once every client has
+    answered.  Probes still queued when a winner appears are cancelled and
+    the ones already running are ignored.
+    """
+    pending = list(clients)
+    in_flight = {}
+    best_info, best_client, best_height = None, None, -1
+    last_error = None
+    width = 1
+
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < width:
+                client = pending.pop(0)
+                in_flight[_probe_pool.submit(_probe_client, video_url, client)] = client
+
+            hedge = YT_PROBE_HEDGE_SECONDS if width < YT_PROBE_CONCURRENCY and pending else None
+            done, _ = wait(in_flight, timeout=hedge, return_when=FIRST_COMPLETED)
+            if not done:   # leader is slow: hedge with the next clients
+                width = max(YT_PROBE_CONCURRENCY, 1)
+            for future in done:
+                player_client = in_flight.pop(future)
+                try:
+                    info, height = future.result()
+                except Exception as e:
+                    last_error = e
+                    width = max(YT_PROBE_CONCURRENCY, 1)
+                    if _is_bot_block_error(e):
+                        print(f"  Client '{player_client}' blocked, trying next…")
                     continue
-                # Other errors — still try next client
-                continue
 
+                if height > best_height:
+                    best_info, best_client, best_height = info, player_client, height
+                if height >= goal_height:
+                    return info, player_client, last_error
+                width = max(YT_PROBE_CONCURRENCY, 1)
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    return best_info, best_client, last_error
+
+
+def extract_video_info(video_url, target_height=None):
+    """Extract video info using yt-dlp with multi-client anti-bot strategy.
+
+    YouTube player clients are probed best-ranked first and only raced when
+    that one fails or is slow; the first one that yields formats at or above
+    ``target_height`` (any video format when None) wins and is tried first on
+    the next request.  Other platforms get one probe.  Callers resolve
+    metadata only (the download path probes on its own), so they pass no
+    height.
+    """
+    last_error = None
+    best_info = None
+
+    print(f"Attempting to extract video info...")
+
+    platform_id, _ = detect_platform(video_url)
+    # player_client only changes anything for the YouTube extractor; elsewhere
+    # a race would just multiply requests against the site's rate limits
+    clients_to_try = _clients_for_platform(platform_id) if platform_id == 'youtube' else [None]
+
+    for attempt in range(2):
+        best_info, best_client, last_error = _race_player_clients(
+            video_url, clients_to_try, target_height or 1
+        )
         if best_info:
+            if platform_id == 'youtube':
+                _record_winning_client(platform_id, best_client)
             break
 
         print(f"Attempt {attempt+1} — all clients failed: {str(last_error).splitlines()[0] if str(last_error) else 'Unknown error'}")
         time.sleep(2)
 
     if best_info:
-        channel_id = best_info.get('channel_id')
-        if channel_id and not best_info.get('artist_image'):
-            avatar = get_youtube_channel_avatar(channel_id)
-            if avatar:
-                best_info['artist_image'] = avatar
         return best_info
 
     # All attempts failed
@@ -696,6 +1317,7 @@ spotify_token_cache = {
     'access_token': None,
     'expires_at': 0
 }
+_spotify_token_lock = threading.Lock()   # one token refresh in flight at a time
 
 
 def _extract_spotify_track_id(track_url):
@@ -721,10 +1343,19 @@ def _extract_spotify_item(track_url):
 
 def get_spotify_app_token():
     """Get and cache Spotify app token using Client Credentials flow."""
-    now = int(time.time())
-    if spotify_token_cache['access_token'] and spotify_token_cache['expires_at'] > now + 30:
-        return spotify_token_cache['access_token']
-
+    token = spotify_token_cache['access_token']
+    if token and spotify_token_cache['expires_at'] > int(time.time()) + 30:
+        return token
+    with _spotify_token_lock:
+        # Another thread may have refreshed while we waited for the lock
+        now = int(time.time())
+        if spotify_token_cache['access_token'] and spotify_token_cache['expires_at'] > now + 30:
+            return spotify_token_cache['access_token']
+        return _refresh_spotify_token(now)
+
+
+def _refresh_spotify_token(now):
+    """Fetch a new app token; caller holds ``_spotify_token_lock``."""
     client_id = os.environ.get("SPOTIFY_CLIENT_ID")
     client_secret = os.environ.get("SPOTIFY_CLIENT_SECRET")
     if not client_id or not client_secret:
@@ -737,7 +1368,7 @@ def get_spotify_app_token():
     }
     payload = {"grant_type": "client_credentials"}
 
-    response = requests.post(
+    response = _http.post(
         "https://accounts.spotify.com/api/token",
         headers=headers,
         data=payload,
@@ -761,18 +1392,116 @@ def spotify_api_get(path):
     """GET against Spotify API with one retry on 401."""
     token = get_spotify_app_token()
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"https://api.spotify.com{path}", headers=headers, timeout=15)
+    response = _http.get(f"https://api.spotify.com{path}", headers=headers, timeout=15, retry=True)
 
     if response.status_code == 401:
-        spotify_token_cache['access_token'] = None
-        spotify_token_cache['expires_at'] = 0
+        with _spotify_token_lock:
+            # Only drop the token we used; a concurrent 401 may have refreshed it already
+            if spotify_token_cache['access_token'] == token:
+                spotify_token_cache['access_token'] = None
+                spotify_token_cache['expires_at'] = 0
         token = get_spotify_app_token()
         headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"https://api.spotify.com{path}", headers=headers, timeout=15)
+        response = _http.get(f"https://api.spotify.com{path}", headers=headers, timeout=15, retry=True)
 
     return response
 
 
+# ── Spotify record cache + batched Web API lookups ──────────────────────────
+# Track, artist and album objects change far less often than they are looked
+# up.  Misses that arrive within SPOTIFY_BATCH_WINDOW of each other are
+# folded into one multi-ID request (/v1/tracks?ids=…).
+SPOTIFY_RECORD_TTL = int(os.environ.get('SPOTIFY_RECORD_TTL', 6 * 3600))
+SPOTIFY_RECORD_MAX_ENTRIES = int(os.environ.get('SPOTIFY_RECORD_MAX_ENTRIES', 5000))
+SPOTIFY_BATCH_WINDOW = 0.02   # seconds the first miss waits for others to join its batch
+
+_spotify_records = _TTLCache(SPOTIFY_RECORD_MAX_ENTRIES, SPOTIFY_RECORD_TTL)   # 'track:<id>' -> API object
+
+
+class _SpotifyBatcher:
+    """Coalesces concurrent ``/v1/<kind>s/<id>`` lookups into multi-ID requests."""
+
+    def __init__(self, kind, max_ids):
+        self.kind = kind
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()   # id -> Future
+        self._flushing = False
+        self.requests = 0
+        self.ids_fetched = 0
+
+    def get(self, item_id, timeout=20):
+        """Return the API object for ``item_id`` (None if Spotify doesn't know it)."""
+        cached = _spotify_records.get(f'{self.kind}:{item_id}')
+        if cached is not None:
+            return cached
+        with self._lock:
+            future = self._pending.get(item_id)
+            if future is None:
+                future = self._pending[item_id] = Future()
+            flush = not self._flushing
+            self._flushing = True
+        if flush:
+            time.sleep(SPOTIFY_BATCH_WINDOW)
+            self._drain()
+        return future.result(timeout=timeout)
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                ids = list(itertools.islice(self._pending, self.max_ids))
+                if not ids:
+                    self._flushing = False
+                    return
+                futures = [self._pending.pop(i) for i in ids]
+            try:
+                items = self._fetch(ids)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for item_id, future, item in zip(ids, futures, items):
+                if item:
+                    _spotify_records.put(f'{self.kind}:{item_id}', item)
+                future.set_result(item)
+
+    def _fetch(self, ids):
+        response = spotify_api_get(f"/v1/{self.kind}s?ids={','.join(ids)}")
+        if response.status_code != 200:
+            raise Exception(f"Spotify {self.kind}s lookup failed ({response.status_code})")
+        items = response.json().get(f'{self.kind}s') or []
+        with self._lock:
+            self.requests += 1
+            self.ids_fetched += len(ids)
+        return list(items) + [None] * (len(ids) - len(items))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'ids_fetched': self.ids_fetched,
+                'pending': len(self._pending),
+            }
+
+
+_spotify_batchers = {
+    'track': _SpotifyBatcher('track', 50),
+    'artist': _SpotifyBatcher('artist', 50),
+    'album': _SpotifyBatcher('album', 20),
+}
+
+
+def spotify_lookup(kind, item_id):
+    """Cached/batched Web API object for a track, artist or album ID."""
+    return _spotify_batchers[kind].get(item_id)
+
+
+def _spotify_cache_stats():
+    stats = _spotify_records.stats()
+    stats['batches'] = {kind: b.stats() for kind, b in _spotify_batchers.items()}
+    return stats
+
+
 def _fetch_html(url):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -781,7 +1510,7 @@ def _fetch_html(url):
         "Referer": "https://www.google.com/"
     }
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = _http.get(url, headers=headers, timeout=15, retry=True)
         if response.status_code != 200:
             return None
         return response.text
@@ -877,6 +1606,12 @@ def _select_direct_video_format(formats, quality='best'):
 HAS_ARIA2C = shutil.which('aria2c') is not None
 
 
+def _aria2c_args():
+    """aria2c arguments with connections capped to this job's fragment share."""
+    conns = str(_fragments_per_job(16))
+    return ['-c', '-j', '4', '-x', conns, '-s', conns, '-k', '5M', '--file-allocation=none']
+
+
 def _get_quality_labels(formats):
     """Return best/worst quality labels + available quality tiers."""
     video_fmts = [
@@ -924,6 +1659,21 @@ def _video_mime_from_ext(ext):
     return 'video/mp4'
 
 
+_AUDIO_MIME_MAP = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'm4a': 'audio/mp4',
+    'opus': 'audio/opus',
+    'webm': 'audio/webm',
+    'ogg': 'audio/ogg',
+}
+
+
+def _audio_mime_from_ext(ext):
+    ext = (ext or '').lower()
+    return _AUDIO_MIME_MAP.get(ext, f'audio/{ext}')
+
+
 def _format_duration_seconds(seconds):
     """Format seconds as mm:ss with leading zeros (e.g., 00:07)."""
     if seconds is None:
@@ -951,6 +1701,14 @@ EXCLUDED_HINTS = {
     "nightcore", "8d", "slowed", "sped up", "reverb", "edit", "version",
 }
 
+# Candidate acceptance thresholds (tuned with bench/bench_match_accuracy.py).
+# A title this similar is accepted even when the artist isn't named.
+SPOTIFY_MIN_ARTIST_COVERAGE = float(os.environ.get('SPOTIFY_MIN_ARTIST_COVERAGE', 0.35))
+SPOTIFY_MIN_TITLE_SIMILARITY = float(os.environ.get('SPOTIFY_MIN_TITLE_SIMILARITY', 0.55))
+SPOTIFY_TITLE_OVERRIDE = float(os.environ.get('SPOTIFY_TITLE_OVERRIDE', 0.9))
+# Duration tolerance (seconds) per search strategy
+SPOTIFY_MATCH_TOLERANCES = {'audio': 2, 'lyrics': 4, 'soundcloud': 5, 'relaxed': 12}
+
 
 def _normalize_text(value):
     """Unicode-normalize, strip brackets/feat, lowercase for comparison."""
@@ -965,13 +1723,22 @@ def _normalize_text(value):
     return value
 
 
+# One alternation instead of a regex per hint (longest first so "sped up" wins over shorter overlaps)
+_EXCLUDED_HINT_RE = re.compile(
+    r"(?:^|\s)(?:" + "|".join(re.escape(h) for h in sorted(EXCLUDED_HINTS, key=len, reverse=True)) + r")(?:\s|$)"
+)
+
+# Per-candidate scoring detail; MATCH_LOG_LEVEL=DEBUG to see every candidate
+_match_log = logging.getLogger('simple_downloader.matcher')
+_match_log_level = getattr(logging, os.environ.get('MATCH_LOG_LEVEL', 'WARNING').upper(), None)
+_match_log.setLevel(_match_log_level if isinstance(_match_log_level, int) else logging.INFO)
+if not _match_log.handlers:
+    _match_log.addHandler(logging.StreamHandler())
+_match_log.propagate = False   # own handler only; don't print twice under gunicorn/flask
+
+
 def _contains_excluded_hint(text):
-    norm = _normalize_text(text)
-    for hint in EXCLUDED_HINTS:
-        pattern = r"(?:^|\s)" + re.escape(hint) + r"(?:\s|$)"
-        if re.search(pattern, norm):
-            return True
-    return False
+    return _EXCLUDED_HINT_RE.search(_normalize_text(text)) is not None
 
 
 def _contains_phrase(haystack_norm, phrase_norm):
@@ -994,68 +1761,113 @@ def _artist_coverage(artists, haystack):
     return hits / len(artists)
 
 
-def _score_spotify_candidate(track_title, track_artists, target_dur_s, candidate, tolerance=5):
-    """Score a yt-dlp search result against the Spotify track.
+def _trigrams(norm_text):
+    """Character-trigram multiset of an already-normalized string."""
+    padded = f"  {norm_text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
 
-    Returns (score, duration_diff) or None if the candidate is rejected.
+
+class _SpotifyMatcher:
+    """Scores search entries against one Spotify track.
+
+    Everything derived from the track — normalized title and its trigrams,
+    one compiled word-boundary pattern per artist — is built once, so each
+    candidate costs one normalization of its own text plus a trigram
+    (Dice) similarity instead of a SequenceMatcher run.
     """
-    title = (candidate.get("title") or "").strip()
-    uploader = (candidate.get("uploader") or candidate.get("channel") or "").strip()
-    duration = candidate.get("duration")
-    url = candidate.get("webpage_url") or candidate.get("url")
 
-    if not title or not url:
-        return None
-    
-    # If duration is missing slightly risky but allow it if titles match well
-    if duration is None:
-        duration = target_dur_s
-        
-    duration = int(duration)
-    duration_diff = abs(duration - target_dur_s)
-    if duration_diff > tolerance:
-        return None
+    def __init__(self, track_title, track_artists, target_dur_s):
+        self.target_dur_s = target_dur_s
+        self.min_artist_coverage = SPOTIFY_MIN_ARTIST_COVERAGE
+        self.min_title_similarity = SPOTIFY_MIN_TITLE_SIMILARITY
+        self.title_override = SPOTIFY_TITLE_OVERRIDE
+        self.norm_title = _normalize_text(track_title)
+        self._title_grams = _trigrams(self.norm_title)
+        self._title_gram_count = sum(self._title_grams.values())
+        # Handle list or string for artists
+        if isinstance(track_artists, str):
+            artist_list = [a.strip() for a in track_artists.split(",")]
+        else:
+            artist_list = list(track_artists)
+        self._artist_patterns = [
+            re.compile(r"(?:^|\s)" + re.escape(norm) + r"(?:\s|$)") if norm else None
+            for norm in (_normalize_text(a) for a in artist_list)
+        ]
+
+    def title_similarity(self, norm_candidate):
+        grams = _trigrams(norm_candidate)
+        total = self._title_gram_count + sum(grams.values())
+        return 2.0 * sum((self._title_grams & grams).values()) / total
+
+    def artist_coverage(self, norm_text):
+        if not self._artist_patterns:
+            return 0.0
+        hits = sum(1 for p in self._artist_patterns if p is not None and p.search(norm_text))
+        return hits / len(self._artist_patterns)
+
+    def score(self, candidate, tolerance=5):
+        """``(score, duration_diff)`` for one search entry, or None if rejected."""
+        title = (candidate.get("title") or "").strip()
+        uploader = (candidate.get("uploader") or candidate.get("channel") or "").strip()
+        duration = candidate.get("duration")
+        url = candidate.get("webpage_url") or candidate.get("url")
+
+        if not title or not url:
+            return None
 
-    combined_text = f"{title} {uploader}"
-    if _contains_excluded_hint(combined_text):
-        return None
+        # If duration is missing slightly risky but allow it if titles match well
+        if duration is None:
+            duration = self.target_dur_s
 
-    norm_target = _normalize_text(track_title)
-    norm_candidate = _normalize_text(title)
-    title_similarity = SequenceMatcher(None, norm_target, norm_candidate).ratio()
+        duration_diff = abs(int(duration) - self.target_dur_s)
+        if duration_diff > tolerance:
+            return None
 
-    # Handle list or string for artists
-    if isinstance(track_artists, str):
-        artist_list = [a.strip() for a in track_artists.split(",")]
-    else:
-        artist_list = list(track_artists)
-        
-    artist_cov = _artist_coverage(artist_list, combined_text)
+        norm_combined = _normalize_text(f"{title} {uploader}")
+        if _EXCLUDED_HINT_RE.search(norm_combined):
+            return None
+
+        title_similarity = self.title_similarity(_normalize_text(title))
+        artist_cov = self.artist_coverage(norm_combined)
 
-    # RELAXED THRESHOLDS:
-    # Was 0.50 -> Now 0.35 (sometimes artist name is just "The Weeknd" vs "Weeknd" etc)
-    if artist_cov < 0.35:
-        # Special case: if title is exceptionally similar (>0.9), allow low artist coverage
-        if title_similarity < 0.9:
+        # RELAXED THRESHOLDS:
+        # Was 0.50 -> Now 0.35 (sometimes artist name is just "The Weeknd" vs "Weeknd" etc)
+        if artist_cov < self.min_artist_coverage:
+            # Special case: if title is exceptionally similar (>0.9), allow low artist coverage
+            if title_similarity < self.title_override:
+                return None
+
+        # Was 0.70 -> Now 0.55
+        if title_similarity < self.min_title_similarity:
             return None
-            
-    # Was 0.70 -> Now 0.55
-    if title_similarity < 0.55:
-        return None
 
-    duration_score = 1.0 - (duration_diff / max(tolerance, 1))
-    extractor = (candidate.get("extractor") or "").lower()
-    source_bonus = 0.03  # youtube default
-    if "music" in extractor or "ytmusic" in extractor:
-        source_bonus = 0.05
-    elif "soundcloud" in extractor:
-        source_bonus = 0.02
+        duration_score = 1.0 - (duration_diff / max(tolerance, 1))
+        extractor = (candidate.get("extractor") or "").lower()
+        source_bonus = 0.03  # youtube default
+        if "music" in extractor or "ytmusic" in extractor:
+            source_bonus = 0.05
+        elif "soundcloud" in extractor:
+            source_bonus = 0.02
+
+        score = (title_similarity * 0.60) + (artist_cov * 0.30) + (duration_score * 0.10) + source_bonus
+        _match_log.debug(
+            "candidate title=%r score=%.2f title_sim=%.2f artist_cov=%.2f dur_diff=%ss",
+            title, score, title_similarity, artist_cov, duration_diff,
+        )
+        return score, duration_diff
 
-    score = (title_similarity * 0.60) + (artist_cov * 0.30) + (duration_score * 0.10) + source_bonus
-    
-    print(f"[DEBUG] Candidate: '{title}' | Score: {score:.2f} | TitleSim: {title_similarity:.2f} | ArtistCov: {artist_cov:.2f} | DurDiff: {duration_diff}s")
-    
-    return score, duration_diff
+    def score_many(self, candidates, tolerance=5):
+        """Score a whole batch of search entries; results line up with ``candidates``."""
+        return [self.score(c, tolerance) for c in candidates]
+
+
+def _score_spotify_candidate(track_title, track_artists, target_dur_s, candidate, tolerance=5):
+    """Score a yt-dlp search result against the Spotify track.
+
+    Returns (score, duration_diff) or None if the candidate is rejected.
+    Prefer building one ``_SpotifyMatcher`` per track when scoring many.
+    """
+    return _SpotifyMatcher(track_title, track_artists, target_dur_s).score(candidate, tolerance)
 
 
 def _yt_dlp_cli_search(query, limit=10, timeout=30):
@@ -1103,9 +1915,217 @@ def _yt_dlp_cli_search(query, limit=10, timeout=30):
     return parsed
 
 
+# ── Tiered Spotify track resolver ────────────────────────────────────────
+# Cheapest source first; stop at the first tier that leaves a complete record
+# (title, artists, duration, cover).  The JS-rendered ScrapingBee fetch costs
+# paid credits and several seconds, so it only runs when every free tier
+# came up short.
+SCRAPINGBEE_RENDER_CREDITS = 5   # credits charged per render_js=true request
+
+_spotify_track_meta = _TTLCache(SPOTIFY_RECORD_MAX_ENTRIES, SPOTIFY_RECORD_TTL)   # track id -> result dict
+
+
+class _SpotifyTierStats:
+    """Per-tier call counts, latency, completions and paid credits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def record(self, tier, elapsed, complete, credits=0):
+        with self._lock:
+            entry = self._tiers.setdefault(
+                tier, {'calls': 0, 'completed': 0, 'total_seconds': 0.0, 'credits': 0}
+            )
+            entry['calls'] += 1
+            entry['completed'] += int(complete)
+            entry['total_seconds'] += elapsed
+            entry['credits'] += credits
+
+    def stats(self):
+        with self._lock:
+            return {
+                tier: {
+                    'calls': e['calls'],
+                    'completed': e['completed'],
+                    'mean_seconds': round(e['total_seconds'] / e['calls'], 3),
+                    'credits': e['credits'],
+                }
+                for tier, e in self._tiers.items()
+            }
+
+
+_spotify_tiers = _SpotifyTierStats()
+
+
+def _spotify_track_complete(result):
+    return all(result.get(k) for k in ('title', 'uploader', 'duration_ms', 'thumbnail'))
+
+
+def _parse_spotify_embed(html, result, state):
+    """Fill ``result`` from a track embed page (static or JS-rendered)."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    for script in soup.find_all("script"):
+        content = script.string or ""
+
+        # Look for track data in scripts
+        if '"duration":' in content or '"type":"track"' in content:
+            # Extract song name
+            name_match = re.search(r'"name"\s*:\s*"([^"]+)"', content)
+            if name_match:
+                result["title"] = name_match.group(1)
+
+            # Extract duration (can be "duration_ms" or just "duration")
+            dur_match = re.search(r'"duration(?:_ms)?"\s*:\s*(\d+)', content)
+            if dur_match:
+                result["duration_ms"] = int(dur_match.group(1))
+                result["duration"] = _format_duration(result["duration_ms"])
+
+            # Extract artist(s) and artist ID
+            artist_matches = re.findall(r'"artists"\s*:\s*\[(.*?)\]', content, re.DOTALL)
+            if artist_matches:
+                artist_names = re.findall(r'"name"\s*:\s*"([^"]+)"', artist_matches[0])
+                if artist_names:
+                    result["uploader"] = ", ".join(artist_names)
+
+                # Extract first artist ID for fetching artist image
+                artist_id_match = re.search(r'spotify:artist:([a-zA-Z0-9]+)', artist_matches[0])
+                if artist_id_match:
+                    state['artist_id'] = artist_id_match.group(1)
+
+            # Extract album/track image (will use as fallback for artist image)
+            img_match = re.search(r'"url"\s*:\s*"(https://[^"]*spotify[^"]*\.(?:jpg|png|jpeg)[^"]*)"', content)
+            if img_match:
+                result["thumbnail"] = img_match.group(1)
+
+            break
+
+    # Fallback for image from meta tag
+    if not result["thumbnail"]:
+        og_img = soup.find("meta", property="og:image")
+        if og_img:
+            result["thumbnail"] = og_img.get("content")
+
+
+def _parse_spotify_artist_image(html):
+    artist_img_match = re.search(r'"image"\s*:\s*\[?\s*\{?\s*"url"\s*:\s*"(https://[^"]+)"', html)
+    if artist_img_match:
+        return artist_img_match.group(1)
+    # Try og:image meta tag
+    og_artist_img = BeautifulSoup(html, "html.parser").find("meta", property="og:image")
+    if og_artist_img:
+        return og_artist_img.get("content")
+    return None
+
+
+def _spotify_tier_web_api(track_id, result, state):
+    """Spotify Web API (most reliable when credentials are available)."""
+    if not (os.environ.get("SPOTIFY_CLIENT_ID") and os.environ.get("SPOTIFY_CLIENT_SECRET")):
+        return
+    api_data = spotify_lookup('track', track_id)
+    if not api_data:
+        return
+    result["title"] = api_data.get("name") or result["title"]
+    api_artists = [a.get("name", "").strip() for a in api_data.get("artists", []) if a.get("name")]
+    if api_artists:
+        result["uploader"] = ", ".join(api_artists)
+    result["duration_ms"] = int(api_data.get("duration_ms") or 0) or result["duration_ms"]
+    if result["duration_ms"]:
+        result["duration"] = _format_duration(result["duration_ms"])
+    album_images = (api_data.get("album") or {}).get("images") or []
+    if album_images:
+        result["thumbnail"] = album_images[0]["url"]
+    # Fetch artist image
+    if api_data.get("artists"):
+        state['artist_id'] = api_data["artists"][0].get("id")
+        if state['artist_id']:
+            try:
+                artist_data = spotify_lookup('artist', state['artist_id']) or {}
+                a_images = artist_data.get("images") or []
+                if a_images:
+                    result["artist_image"] = a_images[0]["url"]
+            except Exception:
+                pass
+
+
+def _spotify_tier_static_embed(track_id, result, state):
+    """Embed page HTML as served, parsed without running JS (free)."""
+    html = _fetch_html(f"https://open.spotify.com/embed/track/{track_id}")
+    if html:
+        _parse_spotify_embed(html, result, state)
+    if state['artist_id'] and not result["artist_image"]:
+        artist_html = _fetch_html(f"https://open.spotify.com/embed/artist/{state['artist_id']}")
+        if artist_html:
+            result["artist_image"] = _parse_spotify_artist_image(artist_html)
+
+
+def _spotify_tier_oembed(track_id, result, state):
+    """oEmbed fallback for missing fields (FREE, no credits)."""
+    if result["thumbnail"] and result["title"] and result["uploader"]:
+        return
+    resp = _http.get(f"https://open.spotify.com/oembed?url={state['url']}", timeout=10, retry=True)
+    if resp.status_code != 200:
+        return
+    data = resp.json()
+
+    if not result["thumbnail"]:
+        result["thumbnail"] = data.get("thumbnail_url")
+
+    # Parse title for song name and artist
+    title = data.get("title", "")
+    if title:
+        if " - song and lyrics by " in title:
+            parts = title.split(" - song and lyrics by ")
+            if not result["title"]:
+                result["title"] = parts[0].strip()
+            if not result["uploader"] and len(parts) > 1:
+                result["uploader"] = parts[1].strip()
+        elif " by " in title:
+            idx = title.rfind(" by ")
+            if not result["title"]:
+                result["title"] = title[:idx].strip()
+            if not result["uploader"]:
+                result["uploader"] = title[idx+4:].strip()
+        else:
+            if not result["title"]:
+                result["title"] = title
+
+
+def _spotify_tier_scrapingbee(track_id, result, state):
+    """JS-rendered embed page via ScrapingBee (paid; last resort)."""
+    params = {
+        "api_key": SCRAPINGBEE_API_KEY,
+        "url": f"https://open.spotify.com/embed/track/{track_id}",
+        "render_js": "true",
+        "wait": "2000",
+    }
+    state['credits'] = SCRAPINGBEE_RENDER_CREDITS
+    resp = _http.get(SCRAPINGBEE_URL, params=params, timeout=45)
+    if resp.status_code == 200:
+        _parse_spotify_embed(resp.text, result, state)
+
+    # Artist image from the artist embed page (if we have artist ID)
+    if state['artist_id'] and not result["artist_image"]:
+        params["url"] = f"https://open.spotify.com/embed/artist/{state['artist_id']}"
+        state['credits'] += SCRAPINGBEE_RENDER_CREDITS
+        resp = _http.get(SCRAPINGBEE_URL, params=params, timeout=30)
+        if resp.status_code == 200:
+            result["artist_image"] = _parse_spotify_artist_image(resp.text)
+
+
+_SPOTIFY_TRACK_TIERS = (
+    ('web_api', _spotify_tier_web_api),
+    ('static_embed', _spotify_tier_static_embed),
+    ('oembed', _spotify_tier_oembed),
+    ('scrapingbee', _spotify_tier_scrapingbee),
+)
+
+
 def get_spotify_metadata(track_url):
     """
-    Get Spotify track metadata using ScrapingBee + oEmbed.
+    Get Spotify track metadata: record cache, Web API, static embed, oEmbed,
+    then ScrapingBee — stopping at the first tier that completes the record.
     Returns: song_name, artist_name, image_url, duration, artist_image
     """
     result = {
@@ -1131,7 +2151,7 @@ def get_spotify_metadata(track_url):
     if kind != "track":
         try:
             oembed_url = f"https://open.spotify.com/oembed?url={track_url}"
-            resp = requests.get(oembed_url, timeout=10)
+            resp = _http.get(oembed_url, timeout=10, retry=True)
             if resp.status_code == 200:
                 data = resp.json()
                 result["thumbnail"] = data.get("thumbnail_url")
@@ -1148,6 +2168,7 @@ def get_spotify_metadata(track_url):
             print(f"Spotify oEmbed Error: {e}")
 
         # Ensure defaults for non-track items
+        result["metadata_incomplete"] = not (result["title"] and result["uploader"])
         result["title"] = result["title"] or "Unknown"
         result["uploader"] = result["uploader"] or "Unknown"
         result["artist_image"] = result["artist_image"] or result["thumbnail"]
@@ -1156,170 +2177,28 @@ def get_spotify_metadata(track_url):
         return result
 
     track_id = item_id
-    artist_id = None  # Will extract from track data
-    
-    # APPROACH 0: Spotify Web API (most reliable when credentials are available)
-    client_id = os.environ.get("SPOTIFY_CLIENT_ID")
-    client_secret = os.environ.get("SPOTIFY_CLIENT_SECRET")
-    if client_id and client_secret:
+    cached = _spotify_track_meta.get(track_id)
+    if cached is not None:
+        _spotify_tiers.record('cache', 0.0, complete=True)
+        return dict(cached, spotify_url=track_url)
+
+    state = {'artist_id': None, 'url': track_url}
+    complete = False
+    for tier, resolve_tier in _SPOTIFY_TRACK_TIERS:
+        started = time.time()
         try:
-            api_resp = spotify_api_get(f"/v1/tracks/{track_id}")
-            if api_resp.status_code == 200:
-                api_data = api_resp.json()
-                result["title"] = api_data.get("name") or result["title"]
-                api_artists = [a.get("name", "").strip() for a in api_data.get("artists", []) if a.get("name")]
-                if api_artists:
-                    result["uploader"] = ", ".join(api_artists)
-                result["duration_ms"] = int(api_data.get("duration_ms") or 0) or result["duration_ms"]
-                if result["duration_ms"]:
-                    result["duration"] = _format_duration(result["duration_ms"])
-                album_images = (api_data.get("album") or {}).get("images") or []
-                if album_images:
-                    result["thumbnail"] = album_images[0]["url"]
-                # Fetch artist image
-                if api_data.get("artists"):
-                    first_artist = api_data["artists"][0]
-                    artist_id = first_artist.get("id")
-                    if artist_id:
-                        try:
-                            artist_resp = spotify_api_get(f"/v1/artists/{artist_id}")
-                            if artist_resp.status_code == 200:
-                                a_images = artist_resp.json().get("images") or []
-                                if a_images:
-                                    result["artist_image"] = a_images[0]["url"]
-                        except Exception:
-                            pass
+            resolve_tier(track_id, result, state)
         except Exception as e:
-            print(f"Spotify API Error: {e}")
+            print(f"Spotify {tier} tier error: {e}")
+        complete = _spotify_track_complete(result)
+        _spotify_tiers.record(tier, time.time() - started, complete, state.pop('credits', 0))
+        if complete:
+            break
 
-    # APPROACH 1: Scrape embed page via ScrapingBee (has all metadata including duration)
-    embed_url = f"https://open.spotify.com/embed/track/{track_id}"
-    
-    try:
-        params = {
-            "api_key": SCRAPINGBEE_API_KEY,
-            "url": embed_url,
-            "render_js": "true",
-            "wait": "2000",
-        }
-        
-        resp = requests.get(SCRAPINGBEE_URL, params=params, timeout=45)
-        
-        if resp.status_code == 200:
-            html = resp.text
-            soup = BeautifulSoup(html, "html.parser")
-            
-            for script in soup.find_all("script"):
-                content = script.string or ""
-                
-                # Look for track data in scripts
-                if '"duration":' in content or '"type":"track"' in content:
-                    # Extract song name
-                    name_match = re.search(r'"name"\s*:\s*"([^"]+)"', content)
-                    if name_match:
-                        result["title"] = name_match.group(1)
-                    
-                    # Extract duration (can be "duration_ms" or just "duration")
-                    dur_match = re.search(r'"duration(?:_ms)?"\s*:\s*(\d+)', content)
-                    if dur_match:
-                        result["duration_ms"] = int(dur_match.group(1))
-                        result["duration"] = _format_duration(result["duration_ms"])
-                    
-                    # Extract artist(s) and artist ID
-                    artist_matches = re.findall(r'"artists"\s*:\s*\[(.*?)\]', content, re.DOTALL)
-                    if artist_matches:
-                        artist_names = re.findall(r'"name"\s*:\s*"([^"]+)"', artist_matches[0])
-                        if artist_names:
-                            result["uploader"] = ", ".join(artist_names)
-                        
-                        # Extract first artist ID for fetching artist image
-                        artist_id_match = re.search(r'spotify:artist:([a-zA-Z0-9]+)', artist_matches[0])
-                        if artist_id_match:
-                            artist_id = artist_id_match.group(1)
-                    
-                    # Extract album/track image (will use as fallback for artist image)
-                    img_match = re.search(r'"url"\s*:\s*"(https://[^"]*spotify[^"]*\.(?:jpg|png|jpeg)[^"]*)"', content)
-                    if img_match:
-                        result["thumbnail"] = img_match.group(1)
-                    
-                    break
-            
-            # Fallback for image from meta tag
-            if not result["thumbnail"]:
-                og_img = soup.find("meta", property="og:image")
-                if og_img:
-                    result["thumbnail"] = og_img.get("content")
-                    
-    except Exception as e:
-        print(f"ScrapingBee Error: {e}")
-    
-    # APPROACH 2: Get artist image from artist embed page (if we have artist ID)
-    if artist_id and not result["artist_image"]:
-        try:
-            artist_embed_url = f"https://open.spotify.com/embed/artist/{artist_id}"
-            params = {
-                "api_key": SCRAPINGBEE_API_KEY,
-                "url": artist_embed_url,
-                "render_js": "true",
-                "wait": "2000",
-            }
-            
-            resp = requests.get(SCRAPINGBEE_URL, params=params, timeout=30)
-            
-            if resp.status_code == 200:
-                artist_html = resp.text
-                
-                # Look for artist image in the response
-                artist_img_match = re.search(r'"image"\s*:\s*\[?\s*\{?\s*"url"\s*:\s*"(https://[^"]+)"', artist_html)
-                if artist_img_match:
-                    result["artist_image"] = artist_img_match.group(1)
-                else:
-                    # Try og:image meta tag
-                    artist_soup = BeautifulSoup(artist_html, "html.parser")
-                    og_artist_img = artist_soup.find("meta", property="og:image")
-                    if og_artist_img:
-                        result["artist_image"] = og_artist_img.get("content")
-                        
-        except Exception as e:
-            print(f"Artist image fetch error: {e}")
-    
-    # APPROACH 3: oEmbed fallback for missing fields (FREE, no credits)
-    if not result["thumbnail"] or not result["title"] or not result["uploader"]:
-        try:
-            oembed_url = f"https://open.spotify.com/oembed?url={track_url}"
-            resp = requests.get(oembed_url, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                
-                if not result["thumbnail"]:
-                    result["thumbnail"] = data.get("thumbnail_url")
-                
-                # Parse title for song name and artist
-                title = data.get("title", "")
-                if title:
-                    if " - song and lyrics by " in title:
-                        parts = title.split(" - song and lyrics by ")
-                        if not result["title"]:
-                            result["title"] = parts[0].strip()
-                        if not result["uploader"] and len(parts) > 1:
-                            result["uploader"] = parts[1].strip()
-                    elif " by " in title:
-                        idx = title.rfind(" by ")
-                        if not result["title"]:
-                            result["title"] = title[:idx].strip()
-                        if not result["uploader"]:
-                            result["uploader"] = title[idx+4:].strip()
-                    else:
-                        if not result["title"]:
-                            result["title"] = title
-                            
-        except Exception as e:
-            print(f"oEmbed Error: {e}")
-    
-    # Set defaults for any missing fields
-    result["title"] = result["title"] or "Unknown Track"
-    result["uploader"] = result["uploader"] or "Unknown Artist"
+    # Set defaults for any missing fields
+    result["metadata_incomplete"] = not complete
+    result["title"] = result["title"] or "Unknown Track"
+    result["uploader"] = result["uploader"] or "Unknown Artist"
     
     # Use album art as fallback for artist image
     if not result["artist_image"]:
@@ -1327,7 +2206,9 @@ def get_spotify_metadata(track_url):
 
     result["thumbnail"] = _upgrade_spotify_image(result["thumbnail"])
     result["artist_image"] = _upgrade_spotify_image(result["artist_image"])
-    
+
+    if complete:
+        _spotify_track_meta.put(track_id, dict(result))
     return result
 
 
@@ -1350,7 +2231,7 @@ def index():
 
     return render_template('index.html', 
                            platforms=PLATFORMS, 
-                           downloads_remaining=downloads_remaining(),
+                           downloads_remaining=downloads_remaining(_client_ip()),
                            video_info=video_info,
                            error=error,
                            url=url,
@@ -1358,7 +2239,480 @@ def index():
                            platform=PLATFORMS.get(platform_id))
 
 
+# ── Resolve cache (canonical media ID → resolved info dict) ───────────────
+# Viral links get resolved over and over by different users; each miss costs
+# several seconds of yt-dlp work plus the avatar chain.  Entries never outlive
+# the signed stream URLs of the resolve they came from.
+RESOLVE_CACHE_TTL = int(os.environ.get('RESOLVE_CACHE_TTL', 1800))
+RESOLVE_CACHE_MAX_ENTRIES = int(os.environ.get('RESOLVE_CACHE_MAX_ENTRIES', 500))
+RESOLVE_CACHE_URL_MARGIN = 300   # drop entries this long before URLs expire
+RESOLVE_CACHE_INCOMPLETE_TTL = 60   # placeholder metadata ("Unknown Track") after a failed lookup
+
+_resolve_cache = _TTLCache(RESOLVE_CACHE_MAX_ENTRIES, RESOLVE_CACHE_TTL)
+
+# yt-dlp info fields the result card (template and main.js) reads; the rest of
+# the info dict (formats, thumbnails, captions…) is tens of KB per entry and
+# nothing downstream uses it — downloads re-extract with their own client.
+_RESOLVE_KEEP_KEYS = (
+    'id', 'title', 'uploader', 'channel', 'thumbnail', 'artist_image', 'enrich_id',
+    'duration', 'duration_display', 'duration_string', 'view_count', 'width', 'height',
+    'webpage_url', 'original_url', 'platform', 'platform_config', 'metadata_incomplete',
+    'best_quality_label', 'worst_quality_label', 'available_qualities',
+)
+
+
+# Hosts whose URLs carry a media ID; subdomains count, lookalikes don't
+_MEDIA_ID_HOSTS = {
+    'spotify': ('spotify.com',),
+    'youtu.be': ('youtu.be',),
+    'youtube': ('youtube.com', 'youtube-nocookie.com'),
+    'tiktok': ('tiktok.com',),
+    'instagram': ('instagram.com', 'instagr.am'),
+    'facebook': ('facebook.com', 'fb.com'),
+}
+
+
+def _host_matches(host, domains):
+    """True if ``host`` is one of ``domains`` or a subdomain of one."""
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+
+def _canonical_media_id(url):
+    """Return a platform-scoped media ID like ``youtube:dQw4w9WgXcQ``, or None.
+
+    Only IDs that can be read straight off the URL are recognised; short
+    links (vm.tiktok.com, fb.watch, …) need a resolve first.  The key is
+    shared by the resolve, artifact and in-flight caches, so hosts must
+    match exactly: ``notyoutube.com`` must never map onto a real video.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    parsed = urlparse(url if '://' in url else 'https://' + url)
+    host = (parsed.hostname or '').lower()
+    path = parsed.path or ''
+
+    if url.startswith('spotify:') or _host_matches(host, _MEDIA_ID_HOSTS['spotify']):
+        kind, item_id = _extract_spotify_item(url)
+        if kind and item_id:
+            return f"spotify:{kind}:{item_id}"
+
+    if _host_matches(host, _MEDIA_ID_HOSTS['youtu.be']):
+        m = re.match(r'/([\w-]{11})', path)
+        if m:
+            return f"youtube:{m.group(1)}"
+    if _host_matches(host, _MEDIA_ID_HOSTS['youtube']):
+        v = parse_qs(parsed.query).get('v', [''])[0]
+        if re.fullmatch(r'[\w-]{11}', v):
+            return f"youtube:{v}"
+        m = re.match(r'/(?:shorts|embed|live|v)/([\w-]{11})', path)
+        if m:
+            return f"youtube:{m.group(1)}"
+    if _host_matches(host, _MEDIA_ID_HOSTS['tiktok']):
+        m = re.search(r'/(?:video|photo)/(\d+)', path)
+        if m:
+            return f"tiktok:{m.group(1)}"
+    if _host_matches(host, _MEDIA_ID_HOSTS['instagram']):
+        m = re.search(r'/(?:p|reel|reels|tv)/([\w-]+)', path)
+        if m:
+            return f"instagram:{m.group(1)}"
+    if _host_matches(host, _MEDIA_ID_HOSTS['facebook']):
+        v = parse_qs(parsed.query).get('v', [''])[0]
+        if v.isdigit():
+            return f"facebook:{v}"
+        m = re.search(r'/(?:videos|reel|reels)/(?:[^/]+/)?(\d+)', path)
+        if m:
+            return f"facebook:{m.group(1)}"
+    return None
+
+
+def _signed_url_expiry(url):
+    """Return the unix expiry embedded in a signed CDN URL, or None.
+
+    Covers googlevideo (``expire``), TikTok (``x-expires``) and the Meta
+    CDNs (``oe``, hex-encoded).
+    """
+    if not url:
+        return None
+    query = parse_qs(urlparse(url).query)
+    for key in ('expire', 'x-expires', 'Expires'):
+        val = (query.get(key) or [''])[0]
+        if val.isdigit():
+            return int(val)
+    oe = (query.get('oe') or [''])[0]
+    if oe:
+        try:
+            return int(oe, 16)
+        except ValueError:
+            pass
+    m = re.search(r'/expire/(\d+)/', url)   # googlevideo manifest-style URLs
+    if m:
+        return int(m.group(1))
+    return None
+
+
+def _earliest_url_expiry(info):
+    """Earliest signed-URL expiry across ``info['formats']``, or None."""
+    expiries = [
+        _signed_url_expiry(fmt.get('url'))
+        for fmt in info.get('formats') or []
+        if isinstance(fmt, dict)
+    ]
+    expiries = [e for e in expiries if e]
+    return min(expiries) if expiries else None
+
+
+def _resolve_cache_ttl(info):
+    """Seconds an info dict may be served from cache (0 = don't cache)."""
+    ttl = RESOLVE_CACHE_TTL
+    if info.get('metadata_incomplete'):
+        # A transient lookup failure shouldn't pin placeholders for everyone
+        ttl = min(ttl, RESOLVE_CACHE_INCOMPLETE_TTL)
+    expires_at = _earliest_url_expiry(info)
+    if expires_at:
+        ttl = min(ttl, expires_at - time.time() - RESOLVE_CACHE_URL_MARGIN)
+    return max(int(ttl), 0)
+
+
+def _media_key(url):
+    """Canonical media ID for ``url``, falling back to the raw URL."""
+    return _canonical_media_id(url) or 'url:' + (url or '').strip()
+
+
 def resolve_video_data(video_url):
+    """Resolve metadata for any platform, served from the resolve cache when possible."""
+    url_key = _media_key(video_url)
+    cached = _resolve_cache.get(url_key)
+    if cached is not None:
+        return dict(cached), cached['platform']
+
+    info, platform_id = _resolve_video_data_uncached(video_url)
+    job = _enrich_avatar(info, platform_id)   # avatar lookups read the full info
+
+    ttl = _resolve_cache_ttl(info)
+    keys = [url_key]
+    # Short links (vm.tiktok.com, fb.watch…) also populate the canonical key
+    media_key = _canonical_media_id(info.get('webpage_url'))
+    if media_key and media_key != url_key:
+        keys.append(media_key)
+    if platform_id != 'spotify':   # Spotify metadata is already a small dict
+        info = {k: info[k] for k in _RESOLVE_KEEP_KEYS if k in info}
+    for key in keys:
+        _resolve_cache.put(key, info, ttl=ttl)
+    if job:
+        job.on_settled(lambda avatar: _patch_cached_info(keys, info, avatar))
+
+    return dict(info), platform_id
+
+
+# ── Avatar enrichment (concurrent, deadline-bounded) ─────────────────────
+# Creator avatars are cosmetic but used to cost a serial chain of scrapes
+# (Graph API → video page → profile page for Facebook).  Lookups now run on a
+# small pool; whatever lands within AVATAR_ENRICH_BUDGET goes into the
+# response, anything slower is handed out via /api/resolve/<id>/enrich and
+# patched into the cached resolve entry when it arrives.
+AVATAR_ENRICH_BUDGET = float(os.environ.get('AVATAR_ENRICH_BUDGET', 1.5))    # seconds
+AVATAR_ENRICH_WORKERS = int(os.environ.get('AVATAR_ENRICH_WORKERS', 8))
+AVATAR_ENRICH_MAX_WAIT = 10   # cap on ?wait= for the follow-up endpoint
+
+_enrich_pool = ThreadPoolExecutor(max_workers=AVATAR_ENRICH_WORKERS, thread_name_prefix='avatar')
+_pending_avatars = _TTLCache(512, 300)   # enrich_id → _AvatarJob
+
+# ── Avatar lookup cache (per platform + uploader, survives restarts) ──
+# Popular creators show up in a large share of resolves.  Found avatars are
+# kept for days (bounded by the CDN link's own expiry); misses — including
+# Facebook silhouettes rejected by _is_fb_default_avatar — are remembered
+# briefly so they are not re-scraped on every request.
+AVATAR_CACHE_TTL = int(os.environ.get('AVATAR_CACHE_TTL', 7 * 86400))
+AVATAR_NEGATIVE_TTL = int(os.environ.get('AVATAR_NEGATIVE_TTL', 900))
+AVATAR_CACHE_MAX_ENTRIES = int(os.environ.get('AVATAR_CACHE_MAX_ENTRIES', 20000))
+AVATAR_URL_MARGIN = 3600   # drop signed CDN avatars an hour before they expire
+_AVATAR_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.avatar_cache.sqlite3')
+
+
+class _AvatarCache:
+    """SQLite-backed LRU of avatar URLs with negative entries; in-memory if SQLite is unavailable."""
+
+    _PRUNE_EVERY = 200   # writes between expiry/LRU sweeps
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory = None
+        self._writes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS avatars ('
+                    ' key TEXT PRIMARY KEY, url TEXT, expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS avatars_last_used ON avatars (last_used)')
+        except sqlite3.Error as e:
+            print(f"Avatar cache: SQLite unavailable ({e}), using in-memory cache")
+            self._memory = _TTLCache(max_entries, AVATAR_CACHE_TTL)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _SQLiteTxn(conn)
+
+    def _count(self, found, url):
+        with self._lock:
+            if not found:
+                self.misses += 1
+            elif url:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+
+    def get(self, key):
+        """Return ``(found, url)``; ``url`` is None for a cached miss."""
+        if self._memory is not None:
+            entry = self._memory.get(key)
+            found, url = entry is not None, (entry or None)
+        else:
+            now = time.time()
+            try:
+                with self._conn() as conn:
+                    row = conn.execute(
+                        'SELECT url FROM avatars WHERE key = ? AND expires_at > ?', (key, now)
+                    ).fetchone()
+                    if row:
+                        conn.execute('UPDATE avatars SET last_used = ? WHERE key = ?', (now, key))
+            except sqlite3.Error as e:
+                print(f"Avatar cache read failed: {e}")
+                row = None
+            found, url = row is not None, (row[0] if row else None)
+        self._count(found, url)
+        return found, url
+
+    def put(self, key, url):
+        ttl = AVATAR_CACHE_TTL if url else AVATAR_NEGATIVE_TTL
+        expires_at = _signed_url_expiry(url) if url else None
+        if expires_at:
+            ttl = min(ttl, expires_at - time.time() - AVATAR_URL_MARGIN)
+        if ttl <= 0:
+            return
+        if self._memory is not None:
+            self._memory.put(key, url or '', ttl=ttl)
+            return
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO avatars (key, url, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                    (key, url, now + ttl, now),
+                )
+                with self._lock:
+                    self._writes += 1
+                    prune = self._writes % self._PRUNE_EVERY == 0
+                if prune:
+                    conn.execute('DELETE FROM avatars WHERE expires_at <= ?', (now,))
+                    conn.execute(
+                        'DELETE FROM avatars WHERE key IN ('
+                        ' SELECT key FROM avatars ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                        (self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            print(f"Avatar cache write failed: {e}")
+
+    def lookup(self, key, fetch):
+        """Cached avatar for ``key``, calling ``fetch()`` (and caching its result) on a miss."""
+        found, url = self.get(key)
+        if found:
+            return url
+        url = fetch()
+        self.put(key, url)
+        return url
+
+    def stats(self):
+        if self._memory is not None:
+            entries = self._memory.stats()['entries']
+        else:
+            try:
+                with self._conn() as conn:
+                    entries = conn.execute('SELECT COUNT(*) FROM avatars').fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'backend': 'memory' if self._memory is not None else 'sqlite',
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+_avatar_cache = _AvatarCache(_AVATAR_DB_FILE, AVATAR_CACHE_MAX_ENTRIES)
+
+_INLINE_AVATAR_KEYS = ('uploader_avatar', 'uploader_avatar_url', 'uploader_thumbnail', 'avatar')
+_PROXIED_AVATAR_PLATFORMS = ('facebook', 'instagram')
+
+
+def _tiktok_profile_url(info):
+    """Best-effort TikTok profile URL for the uploader of ``info``."""
+    profile_url = info.get('uploader_url')
+    if not profile_url:
+        uploader_id = info.get('uploader_id') or info.get('uploader')
+        if uploader_id:
+            profile_url = f"https://www.tiktok.com/@{uploader_id}"
+    if not profile_url:
+        match = re.search(r'tiktok\.com/@([^/?]+)', info.get('webpage_url') or '')
+        if match:
+            profile_url = f"https://www.tiktok.com/@{match.group(1)}"
+    return profile_url
+
+
+def _avatar_lookups(info, platform_id):
+    """Zero-arg avatar lookups for ``info``, highest priority first (all cache-backed)."""
+    cached = _avatar_cache.lookup
+    if platform_id == 'youtube' and info.get('channel_id'):
+        channel_id = info['channel_id']
+        return [lambda: cached(f"youtube:{channel_id}", lambda: get_youtube_channel_avatar(channel_id))]
+    if platform_id == 'tiktok':
+        profile_url = _tiktok_profile_url(info)
+        if not profile_url:
+            return []
+        handle = profile_url.rstrip('/').rsplit('/', 1)[-1].lower()
+        return [lambda: cached(f"tiktok:{handle}", lambda: get_tiktok_profile_avatar(profile_url))]
+    if platform_id == 'facebook':
+        uploader_id = info.get('uploader_id')
+        webpage_url = info.get('webpage_url')
+        video_page = webpage_url or info.get('url')
+        owner = uploader_id or video_page
+        return [
+            # PRIMARY: Graph API (fast & reliable for Pages)
+            lambda: cached(
+                f"facebook:graph:{owner}",
+                lambda: get_facebook_avatar_via_graph_api(uploader_id=uploader_id, webpage_url=webpage_url),
+            ),
+            # FALLBACK: HTML-scrape the video page
+            lambda: cached(f"facebook:page:{owner}", lambda: get_facebook_profile_avatar(video_page)),
+        ]
+    if platform_id == 'instagram' and info.get('uploader_id'):
+        # yt_dlp's uploader_id is the numeric user ID
+        user_id = info['uploader_id']
+        return [lambda: cached(f"instagram:{user_id}", lambda: get_instagram_user_avatar(user_id))]
+    return []
+
+
+def _public_avatar_url(url, platform_id):
+    """Route Meta CDN avatars through /proxy_image (geo-blocks, expiring links)."""
+    if url and platform_id in _PROXIED_AVATAR_PLATFORMS and _should_proxy_image(url):
+        from urllib.parse import quote as _url_quote
+        return '/proxy_image?url=' + _url_quote(url, safe='')
+    return url
+
+
+def _run_avatar_lookup(lookup):
+    try:
+        return lookup()
+    except Exception as e:
+        print(f"Avatar lookup failed: {e}")
+        return None
+
+
+class _AvatarJob:
+    """Avatar lookups running in parallel; the first non-empty one in priority order wins."""
+
+    def __init__(self, platform_id, lookups):
+        self.platform_id = platform_id
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._settled = False
+        self._futures = [_enrich_pool.submit(_run_avatar_lookup, fn) for fn in lookups]
+        for fut in self._futures:
+            fut.add_done_callback(self._on_lookup_done)
+
+    def done(self):
+        return all(f.done() for f in self._futures)
+
+    def wait(self, timeout):
+        """Winning avatar URL, or None if none found (or not decided within ``timeout``)."""
+        deadline = time.time() + timeout
+        for fut in self._futures:
+            try:
+                avatar = fut.result(timeout=max(deadline - time.time(), 0))
+            except FutureTimeoutError:
+                return None
+            if avatar:
+                return _public_avatar_url(avatar, self.platform_id)
+        return None
+
+    def on_settled(self, callback):
+        """Call ``callback(avatar)`` once the winner is known (avatar may be None)."""
+        with self._lock:
+            if not self._settled:
+                self._callbacks.append(callback)
+                return
+        callback(self.wait(0))
+
+    def _on_lookup_done(self, _fut):
+        avatar = self.wait(0)
+        with self._lock:
+            if self._settled or (avatar is None and not self.done()):
+                return
+            self._settled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(avatar)
+
+
+def _enrich_avatar(info, platform_id):
+    """Fill ``info['artist_image']`` within the budget, else leave an ``enrich_id``.
+
+    Returns the still-running ``_AvatarJob`` in the latter case, else None.
+    """
+    if info.get('artist_image'):
+        return
+    inline = next((info[k] for k in _INLINE_AVATAR_KEYS if info.get(k)), None)
+    if inline:
+        info['artist_image'] = _public_avatar_url(inline, platform_id)
+        return
+    lookups = _avatar_lookups(info, platform_id)
+    if not lookups:
+        return
+
+    job = _AvatarJob(platform_id, lookups)
+    avatar = job.wait(AVATAR_ENRICH_BUDGET)
+    if avatar:
+        info['artist_image'] = avatar
+        return
+    if job.done():
+        return   # every lookup came back empty
+
+    enrich_id = uuid.uuid4().hex
+    info['enrich_id'] = enrich_id
+    _pending_avatars.put(enrich_id, job)
+    return job
+
+
+def _patch_cached_info(keys, info, late_avatar):
+    """Replace the cached ``info`` with a copy carrying the late avatar.
+
+    The cached dict is never mutated: requests may be copying it right now.
+    """
+    patched = {k: v for k, v in info.items() if k != 'enrich_id'}
+    if late_avatar:
+        patched['artist_image'] = late_avatar
+    for key in keys:
+        _resolve_cache.replace(key, info, patched)
+
+
+def _resolve_video_data_uncached(video_url):
     """Core logic to resolve video metadata for any platform."""
     platform_id, platform_config = detect_platform(video_url)
     
@@ -1371,96 +2725,24 @@ def resolve_video_data(video_url):
     # Pass config back so frontend knows color/name
     info['platform_config'] = platform_config
 
-    if platform_id == 'tiktok' and not info.get('artist_image'):
-        avatar = (
-            info.get('uploader_avatar')
-            or info.get('uploader_avatar_url')
-            or info.get('uploader_thumbnail')
-            or info.get('avatar')
-        )
-        if not avatar:
-            profile_url = info.get('uploader_url')
-            if not profile_url:
-                uploader_id = info.get('uploader_id') or info.get('uploader')
-                if uploader_id:
-                    profile_url = f"https://www.tiktok.com/@{uploader_id}"
-            if not profile_url:
-                webpage_url = info.get('webpage_url')
-                if webpage_url:
-                    match = re.search(r'tiktok\.com/@([^/?]+)', webpage_url)
-                    if match:
-                        profile_url = f"https://www.tiktok.com/@{match.group(1)}"
-            avatar = get_tiktok_profile_avatar(profile_url)
-
-        if avatar:
-            info['artist_image'] = avatar
-
     if platform_id == 'tiktok':
         duration_display = _format_duration_seconds(info.get('duration'))
         if duration_display:
             info['duration_display'] = duration_display
 
     if platform_id == 'facebook':
-        if not info.get('artist_image'):
-            avatar = (
-                info.get('uploader_avatar')
-                or info.get('uploader_avatar_url')
-                or info.get('uploader_thumbnail')
-                or info.get('avatar')
-            )
-            if not avatar:
-                # ── PRIMARY: Graph API (fast & reliable for Pages) ──
-                avatar = get_facebook_avatar_via_graph_api(
-                    uploader_id=info.get('uploader_id'),
-                    webpage_url=info.get('webpage_url'),
-                )
-            if not avatar:
-                # ── FALLBACK: HTML-scrape the video page ──
-                video_page = info.get('webpage_url') or info.get('url')
-                avatar = get_facebook_profile_avatar(video_page)
-
-            if avatar:
-                info['artist_image'] = avatar
-
         duration_display = _format_duration_seconds(info.get('duration'))
         if duration_display:
             info['duration_display'] = duration_display
 
-        if info.get('artist_image') and _should_proxy_image(info['artist_image']):
-            from urllib.parse import quote as _url_quote
-            info['artist_image'] = (
-                '/proxy_image?url=' + _url_quote(info['artist_image'], safe='')
-            )
-
     if platform_id == 'instagram':
         if not info.get('thumbnail'):
             info['thumbnail'] = _pick_best_thumbnail(info.get('thumbnails', []))
 
-        # ── Avatar: fetch via Instagram's internal user API ──
-        if not info.get('artist_image'):
-            avatar = (
-                info.get('uploader_avatar')
-                or info.get('uploader_avatar_url')
-                or info.get('uploader_thumbnail')
-                or info.get('avatar')
-            )
-            if not avatar:
-                # yt_dlp's uploader_id is the numeric user ID
-                avatar = get_instagram_user_avatar(
-                    info.get('uploader_id')
-                )
-
-            if avatar:
-                info['artist_image'] = avatar
-
         # ── Proxy Instagram CDN images through our server ──
         # Instagram CDN URLs can be geo-blocked or expire for
         # direct browser requests, so we proxy them to be safe.
         from urllib.parse import quote as _url_quote
-        if info.get('artist_image') and _should_proxy_image(info['artist_image']):
-            info['artist_image'] = (
-                '/proxy_image?url=' + _url_quote(info['artist_image'], safe='')
-            )
         if info.get('thumbnail') and _should_proxy_image(info['thumbnail']):
             info['thumbnail'] = (
                 '/proxy_image?url=' + _url_quote(info['thumbnail'], safe='')
@@ -1498,17 +2780,536 @@ def api_resolve():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/resolve/<enrich_id>/enrich')
+def api_resolve_enrich(enrich_id):
+    """Late avatar for a resolve that returned an ``enrich_id``."""
+    job = _pending_avatars.get(enrich_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired enrichment id'}), 404
+    try:
+        timeout = min(max(float(request.args.get('wait', AVATAR_ENRICH_MAX_WAIT)), 0), AVATAR_ENRICH_MAX_WAIT)
+    except ValueError:
+        timeout = AVATAR_ENRICH_MAX_WAIT
+    avatar = job.wait(timeout)
+    return jsonify({'artist_image': avatar, 'pending': not avatar and not job.done()})
+
+# ── Completed-file cache (content-addressed, on disk) ─────────────────────
+# Finished downloads are hard-linked into a shared directory keyed by
+# (media ID, quality/format, codec/bitrate).  A later task for the same key
+# gets a hard link into its own temp dir, so TTL cleanup of one task never
+# pulls the file out from under another.  LRU by mtime under a byte budget.
+ARTIFACT_CACHE_DIR = os.environ.get(
+    'ARTIFACT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'simple_downloader_artifacts')
+)
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get('ARTIFACT_CACHE_MAX_BYTES', 5 * 1024 ** 3))
+AUDIO_BITRATE = '192'
+
+
+def _link_or_copy(src, dst):
+    """Hard-link ``src`` to ``dst``; copy only when they sit on different filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class _ArtifactCache:
+    """Size-bounded on-disk LRU of finished download files."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.root, digest)
+        return base + '.bin', base + '.json'
+
+    def fetch(self, key, dest_dir):
+        """Link the cached file for ``key`` into ``dest_dir``; return its metadata or None."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            dest = os.path.join(dest_dir, 'artifact.' + meta['ext'])
+            _link_or_copy(data_path, dest)
+            os.utime(data_path)   # bump LRU position
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        meta['filepath'] = dest
+        return meta
+
+    def store(self, key, filepath, meta):
+        """Add a finished file (linked, not copied) and evict down to the budget."""
+        data_path, meta_path = self._paths(key)
+        tmp_suffix = f'.{uuid.uuid4().hex[:8]}.tmp'
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            _link_or_copy(filepath, data_path + tmp_suffix)
+            os.replace(data_path + tmp_suffix, data_path)
+            with open(meta_path + tmp_suffix, 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + tmp_suffix, meta_path)
+        except OSError:
+            return
+        with self._lock:
+            self.stores += 1
+        self._evict()
+
+    def _evict(self):
+        try:
+            entries = [
+                e for e in os.scandir(self.root)
+                if e.name.endswith('.bin') and e.is_file()
+            ]
+        except OSError:
+            return
+        stats = []
+        for e in entries:
+            try:
+                st = e.stat()
+            except OSError:   # removed by a concurrent evict or TTL cleanup
+                continue
+            stats.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            for p in (path, path[:-len('.bin')] + '.json'):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        try:
+            used = sum(
+                e.stat().st_size for e in os.scandir(self.root) if e.name.endswith('.bin')
+            )
+        except OSError:
+            used = 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'bytes_used': used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_artifact_cache = _ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES)
+
+
+def _serve_from_artifact_cache(task):
+    """Finish ``task`` instantly from the artifact cache. Returns True on a hit."""
+    key = task.get('_artifact_key')
+    if not key:
+        return False
+    tmpdir = tempfile.mkdtemp()
+    meta = _artifact_cache.fetch(key, tmpdir)
+    if not meta:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        return False
+    task['tmpdir'] = tmpdir
+    task['filepath'] = meta['filepath']
+    task['filename'] = meta['filename']
+    task['filesize'] = os.path.getsize(meta['filepath'])
+    task['mime_type'] = meta['mime_type']
+    task['cache_hit'] = True
+    task['status'] = 'done'
+    task['progress'] = 100
+    task['message'] = 'Ready to download!'
+    task['last_activity'] = time.time()
+    return True
+
+
+def _store_artifact(task):
+    """Publish a finished task's file to the artifact cache."""
+    key = task.get('_artifact_key')
+    if not key or not task.get('filepath'):
+        return
+    ext = os.path.splitext(task['filepath'])[1].lstrip('.') or 'bin'
+    _artifact_cache.store(key, task['filepath'], {
+        'ext': ext,
+        'filename': task['filename'],
+        'mime_type': task['mime_type'],
+    })
+
+
+# ── Streaming delivery (serve bytes while yt-dlp is still writing) ───────
+# Only for outputs that yt-dlp writes sequentially and never rewrites: a
+# progressive single-file video format, or audio kept in its source container.
+# Merged or transcoded outputs still go through /download_file.
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Requested audio containers that the source can deliver without ffmpeg.
+# No fallback here: a source in another container is converted like any
+# other output (see _run_audio_download).
+_PASSTHROUGH_AUDIO_FORMATS = {
+    'm4a': 'bestaudio[ext=m4a]',
+    'webm': 'bestaudio[ext=webm]',
+}
+
+
+def _is_single_file_http(fmt):
+    """True for a plain http(s) format that yt-dlp writes as one sequential file."""
+    return bool(fmt) and fmt.get('protocol') in ('http', 'https') and not fmt.get('fragments')
+
+
+def _begin_stream(task, d):
+    """Record the file yt-dlp is writing so /download_stream can tail it."""
+    info = d.get('info_dict') or {}
+    ext = info.get('ext') or os.path.splitext(d.get('filename') or '')[1].lstrip('.')
+    title = info.get('title') or 'download'
+    task['_stream_name'] = re.sub(r'[^\w\-_.]', '_', title)[:100] + f'.{ext}'
+    task['_stream_mime'] = (
+        _video_mime_from_ext(ext) if task['_streamable'] == 'video' else _audio_mime_from_ext(ext)
+    )
+    task['_stream_size'] = d.get('total_bytes')
+    task['_stream_path'] = d.get('tmpfilename') or d.get('filename')
+
+
+# ── ffmpeg admission (CPU-aware transcode slots) ──────────────────────────
+# Merges and conversions run inside whichever download thread reaches them,
+# so without a gate a burst of mp3 jobs starts one ffmpeg per job, each with
+# a thread per core.  Every ffmpeg run — yt-dlp's Merger/ExtractAudio and
+# the streaming transcode — takes a slot first: at most TRANSCODE_WORKERS run
+# at once, the rest wait in FIFO order, each capped at TRANSCODE_THREADS
+# threads.  A streaming transcode holds its slot while the download feeds it,
+# so that time is kept apart (stream_seconds) and encode_seconds stays
+# CPU-bound work on finished files.
+TRANSCODE_THREADS = int(os.environ.get('TRANSCODE_THREADS', 2))
+TRANSCODE_WORKERS = int(os.environ.get(
+    'TRANSCODE_WORKERS', max(1, (os.cpu_count() or 1) // max(TRANSCODE_THREADS, 1))
+))
+
+# yt-dlp postprocessors that spawn a real encode/merge
+_GATED_POSTPROCESSORS = {'Merger', 'ExtractAudio'}
+
+
+class _TranscodeSlots:
+    """FIFO admission for ffmpeg jobs: at most ``limit`` run at once, the rest queue."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._active = 0
+        self._jobs = 0
+        self._total_wait = 0.0
+        self._total_encode = 0.0
+        self._streamed = 0
+        self._total_stream = 0.0
+
+    def acquire(self, task):
+        """Block until a slot is free; records the queue wait on ``task``."""
+        if task.get('_transcode_started'):
+            return   # already holding one
+        ticket = object()
+        started = time.time()
+        with self._cond:
+            self._waiting.append(ticket)
+            while self._waiting[0] is not ticket or self._active >= self.limit:
+                task['last_activity'] = time.time()
+                task['message'] = (
+                    f'Waiting for a free encoder (position {self._waiting.index(ticket) + 1})…'
+                )
+                _notify_task(task)
+                self._cond.wait(5)
+            self._waiting.popleft()
+            self._active += 1
+            self._cond.notify_all()   # the next in line may fit too
+            waited = time.time() - started
+            self._total_wait += waited
+        task['transcode_wait'] = task.get('transcode_wait', 0.0) + waited
+        task['_transcode_started'] = time.time()
+
+    def release(self, task, streamed=False):
+        """Free ``task``'s slot, if it holds one; safe to call more than once.
+
+        ``streamed`` books the held time as a streaming transcode (paced by
+        the download) instead of encode time.
+        """
+        started = task.pop('_transcode_started', None)
+        if started is None:
+            return
+        held = time.time() - started
+        key = 'stream_seconds' if streamed else 'transcode_seconds'
+        task[key] = task.get(key, 0.0) + held
+        with self._cond:
+            self._active -= 1
+            if streamed:
+                self._streamed += 1
+                self._total_stream += held
+            else:
+                self._jobs += 1
+                self._total_encode += held
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'threads_per_job': TRANSCODE_THREADS,
+                'active': self._active,
+                'waiting': len(self._waiting),
+                'jobs': self._jobs,
+                'mean_wait_seconds': round(self._total_wait / self._jobs, 3) if self._jobs else 0.0,
+                'mean_encode_seconds': round(self._total_encode / self._jobs, 3) if self._jobs else 0.0,
+                'streamed_jobs': self._streamed,
+                'mean_stream_seconds': round(self._total_stream / self._streamed, 3) if self._streamed else 0.0,
+            }
+
+
+_transcode_slots = _TranscodeSlots(TRANSCODE_WORKERS)
+
+
+def _gate_postprocessor(task, d):
+    """postprocessor_hooks helper: hold a transcode slot for the duration of a gated yt-dlp PP."""
+    if d.get('postprocessor') not in _GATED_POSTPROCESSORS:
+        return
+    if d.get('status') == 'started':
+        _transcode_slots.acquire(task)
+    elif d.get('status') == 'finished':
+        _transcode_slots.release(task)
+
+
+def _ffmpeg_pp_args(merger_args=None):
+    """``postprocessor_args`` that cap every yt-dlp ffmpeg run at TRANSCODE_THREADS."""
+    threads = ['-threads', str(TRANSCODE_THREADS)]
+    args = {'default': threads}
+    if merger_args is not None:
+        args['merger+ffmpeg'] = [*merger_args, *threads]
+    return args
+
+
+# ── Codec-aware processing (copy / remux / transcode) ─────────────────────
+# Format choices prefer streams whose codec the output container takes as-is,
+# so ffmpeg only re-encodes when nothing compatible is on offer.  Each task
+# records which path it took (also counted in /api/stats):
+#   copy      — bytes saved exactly as delivered, no ffmpeg
+#   remux     — streams copied into a new container (merge or audio rewrap)
+#   transcode — at least one stream re-encoded
+_MP4_CODECS = {
+    'video': ('avc1', 'h264', 'av01', 'hev1', 'hvc1'),
+    'audio': ('mp4a', 'aac'),
+}
+_processing_counts = {'copy': 0, 'remux': 0, 'transcode': 0}
+_processing_lock = threading.Lock()
+
+
+def _fits_mp4(kind, codec):
+    """True when a ``kind`` ('video'/'audio') stream in ``codec`` goes into mp4 by stream copy."""
+    codec = (codec or '').lower()
+    return codec not in ('', 'none') and codec.startswith(_MP4_CODECS[kind])
+
+
+def _record_processing(task, path):
+    task['processing'] = path
+    with _processing_lock:
+        _processing_counts[path] += 1
+
+
+# ── Streaming audio transcode (ffmpeg reads while the download runs) ──────
+# Outputs that need ffmpeg are no longer downloaded first and converted after:
+# the chosen audio stream is fetched in ranged chunks and piped into ffmpeg's
+# stdin, so encoding overlaps the transfer and the source never lands on disk.
+# When the source codec already fits the requested container the audio is
+# stream-copied (remux) instead of re-encoded.  Fragmented protocols
+# (DASH/HLS) and anything ffmpeg can't read from a pipe fall back to the
+# yt-dlp download + FFmpegExtractAudio path.
+STREAM_TRANSCODE = os.environ.get('STREAM_TRANSCODE', '1') != '0'
+STREAM_RANGE_SIZE = 10 * 1024 * 1024   # YouTube throttles larger single requests
+STREAM_TRANSCODE_TIMEOUT = int(os.environ.get('STREAM_TRANSCODE_TIMEOUT', 600))
+
+# Requested extension -> (ffmpeg encode args, source codecs that can be copied as-is)
+_STREAM_AUDIO_CODECS = {
+    'mp3': (['-c:a', 'libmp3lame', '-b:a', f'{AUDIO_BITRATE}k'], ('mp3',)),
+    'm4a': (['-c:a', 'aac', '-b:a', f'{AUDIO_BITRATE}k'], ('mp4a', 'aac')),
+    'opus': (['-c:a', 'libopus', '-b:a', f'{AUDIO_BITRATE}k'], ('opus',)),
+    'ogg': (['-c:a', 'libvorbis', '-b:a', f'{AUDIO_BITRATE}k'], ('vorbis', 'opus')),
+    'webm': (['-c:a', 'libopus', '-b:a', f'{AUDIO_BITRATE}k'], ('opus', 'vorbis')),
+    'wav': (['-c:a', 'pcm_s16le'], ()),
+}
+
+
+def _audio_codec_args(ext, acodec):
+    """``(ffmpeg args, 'remux' | 'transcode')`` for turning ``acodec`` into ``.ext``."""
+    encode_args, copyable = _STREAM_AUDIO_CODECS[ext]
+    acodec = (acodec or '').lower()
+    if acodec and acodec.startswith(copyable):
+        return ['-c:a', 'copy'], 'remux'
+    return encode_args, 'transcode'
+
+
+def _audio_selector(ext):
+    """``bestaudio``, preferring a source the requested output can take by stream copy."""
+    copyable = _STREAM_AUDIO_CODECS[ext][1] if ext in _STREAM_AUDIO_CODECS else ()
+    return '/'.join([f'bestaudio[acodec^={c}]' for c in copyable] + ['bestaudio', 'best'])
+
+
+def _iter_media_chunks(url, headers, size=None):
+    """Yield a progressive media URL's body, one Range request at a time."""
+    start = 0
+    while True:
+        end = start + STREAM_RANGE_SIZE - 1
+        if size:
+            end = min(end, size - 1)
+        resp = _http.get(url, headers={**headers, 'Range': f'bytes={start}-{end}'}, stream=True, timeout=(5, 30), retry=True)
+        try:
+            if resp.status_code == 416:   # asked past the end
+                return
+            resp.raise_for_status()
+            got = 0
+            for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+                got += len(chunk)
+                yield chunk
+        finally:
+            resp.close()
+        # 200 = Range ignored and the whole body already sent
+        if resp.status_code == 200 or got < end - start + 1 or (size and start + got >= size):
+            return
+        start += got
+
+
+def _stream_transcode_audio(task, info, ext, tmpdir):
+    """Pipe the selected format of ``info`` through ffmpeg into ``tmpdir``.
+
+    Returns the output path, or None when the caller should fall back to
+    download-then-convert.
+    """
+    url = info.get('url')
+    if not url or info.get('protocol') not in ('http', 'https'):
+        return None
+    codec_args, mode = _audio_codec_args(ext, info.get('acodec'))
+    out_path = os.path.join(tmpdir, f"{info.get('id') or 'audio'}.{ext}")
+    total = info.get('filesize') or info.get('filesize_approx') or 0
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', 'pipe:0', '-vn', *codec_args, '-threads', str(TRANSCODE_THREADS), out_path,
+    ]
+    # Counts against the same ffmpeg limit as yt-dlp's postprocessors; the
+    # time it holds the slot is paced by the download, so it is booked as
+    # stream_seconds rather than encode_seconds
+    task['_transcode_streaming'] = True
+    _transcode_slots.acquire(task)
+    try:
+        task['status'] = 'downloading'
+        task['message'] = 'Downloading audio…' if mode == 'remux' else f'Downloading and converting to .{ext}…'
+        _notify_task(task)
+
+        with tempfile.TemporaryFile() as errlog:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errlog)
+            sent = 0
+            failure = None
+            try:
+                for chunk in _iter_media_chunks(url, info.get('http_headers') or {}, info.get('filesize')):
+                    proc.stdin.write(chunk)
+                    sent += len(chunk)
+                    task['last_activity'] = time.time()
+                    if total:
+                        task['progress'] = min(int(sent / total * 95), 95)
+                    _notify_task(task)
+                proc.stdin.close()
+                proc.wait(timeout=STREAM_TRANSCODE_TIMEOUT)
+            except (OSError, requests.RequestException, subprocess.TimeoutExpired) as e:
+                failure = e
+            finally:
+                if proc.returncode is None:   # failed above, or an exception we let propagate
+                    proc.kill()
+                    proc.wait()
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+            if failure or proc.returncode != 0:
+                errlog.seek(0)
+                detail = errlog.read()[-300:].decode(errors='replace').strip()
+                print(f"Streaming {mode} failed ({failure or f'exit {proc.returncode}'}), falling back: {detail}")
+                try:
+                    os.remove(out_path)
+                except OSError:
+                    pass
+                return None
+    finally:
+        task.pop('_transcode_streaming', None)
+        _transcode_slots.release(task, streamed=True)
+
+    task['progress'] = 99
+    _notify_task(task)
+    return out_path
+
+
+def _try_stream_audio(task, client, video_url, ext, tmpdir):
+    """Resolve the audio stream and pipe it through ffmpeg.
+
+    Returns ``(path, title, 'remux' | 'transcode')``, or None to use yt-dlp.
+    """
+    if not (STREAM_TRANSCODE and HAS_FFMPEG) or ext not in _STREAM_AUDIO_CODECS:
+        return None
+    opts = _yt_dlp_base_opts(client, extra_opts={'format': _audio_selector(ext)})
+    with _client_scoreboard.track(client, video_url), yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+    path = _stream_transcode_audio(task, info, ext, tmpdir)
+    if not path:
+        return None
+    return path, info.get('title', 'audio'), _audio_codec_args(ext, info.get('acodec'))[1]
+
+
+def _extract_audio_processing(ext, info):
+    """Path the yt-dlp download took: FFmpegExtractAudio stream-copies a codec that already fits."""
+    if not HAS_FFMPEG or ext == 'webm':   # no FFmpegExtractAudio pass (see _run_audio_download)
+        return 'copy'
+    if ext not in _STREAM_AUDIO_CODECS:
+        return 'transcode'
+    return _audio_codec_args(ext, info.get('acodec'))[1]
+
+
 # ── Background download worker ───────────────────────────────────────────
+PROBE_URL_MARGIN = 60   # re-probe when signed URLs expire within this many seconds
+
+
+def _probe_expired(info):
+    """True when the signed stream URLs in a probed info dict are (nearly) stale."""
+    expires_at = _earliest_url_expiry(info or {})
+    return bool(expires_at) and expires_at - time.time() < PROBE_URL_MARGIN
+
+
+def _is_stale_url_error(exc):
+    """True for download errors that mean the probed URLs must be refreshed."""
+    err_str = str(exc).lower()
+    return '403' in err_str or 'forbidden' in err_str or 'expired' in err_str
+
+
 def _run_video_download(task, video_url, quality, proxies=None):
     """Download video (+ merge audio) in a background thread without proxies."""
+    if _serve_from_artifact_cache(task):
+        return
     last_error = None
 
     def _pick_video_format(video_url, quality):
         """Pick video format. quality: 'best', 'worst', or a specific height like '720'."""
-        # Use only top-5 clients + None, exit on first success (FAST)
-        player_clients = _YT_PLAYER_CLIENTS[:5] + [None]
+        # Use only the 5 best-ranked clients + None, exit on first success (FAST)
+        player_clients = _client_scoreboard.rank()[:5] + [None]
         chosen_fmt = None
         chosen_client = None
+        chosen_info = None
         probe_error = None
         target_height = None
 
@@ -1531,6 +3332,7 @@ def _run_video_download(task, video_url, quality, proxies=None):
         task['status'] = 'downloading'
         task['progress'] = max(task.get('progress', 0), 2)
         task['message'] = 'Analyzing available streams…'
+        _notify_task(task)
 
         for idx, player_client in enumerate(player_clients):
             try:
@@ -1540,9 +3342,10 @@ def _run_video_download(task, video_url, quality, proxies=None):
 
                 probe_opts = _yt_dlp_base_opts(player_client)
 
-                with yt_dlp.YoutubeDL(probe_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
-                    formats = info.get('formats') or []
+                with _client_scoreboard.track(player_client, video_url):
+                    with yt_dlp.YoutubeDL(probe_opts) as ydl:
+                        info = ydl.extract_info(video_url, download=False)
+                formats = info.get('formats') or []
 
                 candidates = [
                     fmt for fmt in formats
@@ -1563,10 +3366,16 @@ def _run_video_download(task, video_url, quality, proxies=None):
                     if capped:
                         candidates = capped
 
-                if quality == 'worst':
-                    candidate = min(candidates, key=_score)
-                else:
-                    candidate = max(candidates, key=_score)
+                pick = min if quality == 'worst' else max
+                candidate = pick(candidates, key=_score)
+                # At the same height, prefer a codec that stream-copies into mp4
+                if not _fits_mp4('video', candidate.get('vcodec')):
+                    copyable = [
+                        f for f in candidates
+                        if f.get('height') == candidate.get('height') and _fits_mp4('video', f.get('vcodec'))
+                    ]
+                    if copyable:
+                        candidate = pick(copyable, key=_score)
 
                 # Determine if we should early exit or keep probing for better quality
                 c_height = candidate.get('height') or 0
@@ -1575,12 +3384,14 @@ def _run_video_download(task, video_url, quality, proxies=None):
                     if c_height >= target_height:
                         chosen_fmt = candidate
                         chosen_client = player_client
+                        chosen_info = info
                         break
                     else:
                         # Keep looking, but remember the best we've seen
                         if not chosen_fmt or c_height > (chosen_fmt.get('height') or 0):
                             chosen_fmt = candidate
                             chosen_client = player_client
+                            chosen_info = info
                         continue
                 else:
                     # 'best' or 'worst' requested
@@ -1588,6 +3399,7 @@ def _run_video_download(task, video_url, quality, proxies=None):
                         if not chosen_fmt or c_height < (chosen_fmt.get('height') or 9999):
                             chosen_fmt = candidate
                             chosen_client = player_client
+                            chosen_info = info
                         # For worst, we might just want to check a couple and stop, 
                         # but web_safari usually gives 144p/360p. Let's just break on the first for 'worst' to save time.
                         break
@@ -1596,17 +3408,18 @@ def _run_video_download(task, video_url, quality, proxies=None):
                         if c_height >= 1080:
                             chosen_fmt = candidate
                             chosen_client = player_client
+                            chosen_info = info
                             break
                         else:
                             if not chosen_fmt or c_height > (chosen_fmt.get('height') or 0):
                                 chosen_fmt = candidate
                                 chosen_client = player_client
+                                chosen_info = info
                             continue
 
             except Exception as e:
                 probe_error = e
-                err_str = str(e).lower()
-                if 'sign in' in err_str or 'bot' in err_str or '403' in err_str:
+                if _is_bot_block_error(e):
                     time.sleep(0.3)
                 continue
 
@@ -1620,16 +3433,24 @@ def _run_video_download(task, video_url, quality, proxies=None):
         if not format_id:
             raise Exception('Selected format is missing format_id')
 
+        processing = 'copy'
         if HAS_FFMPEG:
             if has_audio:
                 # Video already has audio — no merge needed!
                 format_selector = format_id
             else:
-                audio_selector = (
-                    'worstaudio[ext=m4a]/worstaudio'
-                    if quality == 'worst'
-                    else 'bestaudio[ext=m4a]/bestaudio'
-                )
+                # AAC merges into mp4 by stream copy; anything else has to be re-encoded
+                aac_formats = [
+                    f for f in chosen_info.get('formats') or []
+                    if f.get('vcodec') == 'none' and f.get('format_id') and _fits_mp4('audio', f.get('acodec'))
+                ]
+                if aac_formats:
+                    pick = min if quality == 'worst' else max
+                    audio_selector = pick(aac_formats, key=lambda f: f.get('abr') or f.get('tbr') or 0)['format_id']
+                    processing = 'remux'
+                else:
+                    audio_selector = 'worstaudio' if quality == 'worst' else 'bestaudio'
+                    processing = 'transcode'
                 format_selector = f'{format_id}+{audio_selector}/{format_id}'
         else:
             if has_audio:
@@ -1637,13 +3458,28 @@ def _run_video_download(task, video_url, quality, proxies=None):
             else:
                 format_selector = 'worst' if quality == 'worst' else 'best'
 
-        return format_selector, chosen_client, chosen_fmt.get('height'), has_audio, best_info
+        return format_selector, chosen_client, chosen_fmt.get('height'), has_audio, chosen_info, processing
     
+    # Probe once, download many: the winning client's info dict is kept on the
+    # task and reused by every retry until its signed URLs go stale.
+    task['_probe'] = None
+
     for attempt in range(3):
         tmpdir = tempfile.mkdtemp()
         task['tmpdir'] = tmpdir
         try:
-            fmt, selected_client, selected_height, selected_has_audio, selected_info = _pick_video_format(video_url, quality)
+            probe = task['_probe']
+            if probe is None or _probe_expired(probe[4]):
+                probe = _pick_video_format(video_url, quality)
+                task['_probe'] = probe
+            fmt, selected_client, selected_height, selected_has_audio, selected_info, processing = probe
+            # Only a progressive http(s) format is written as one sequential file;
+            # HLS/DASH output is rewritten on disk, so it is served once finished
+            chosen = next(
+                (f for f in (selected_info or {}).get('formats') or [] if f.get('format_id') == fmt), None
+            )
+            task['_streamable'] = 'video' if selected_has_audio and _is_single_file_http(chosen) else None
+            task['_stream_path'] = None
 
             output_template = os.path.join(tmpdir, '%(id)s.%(ext)s')
 
@@ -1654,6 +3490,8 @@ def _run_video_download(task, video_url, quality, proxies=None):
                 task['last_activity'] = time.time()
                 if d.get('status') == 'downloading':
                     task['status'] = 'downloading'
+                    if task.get('_streamable') and not task.get('_stream_path'):
+                        _begin_stream(task, d)
                     total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
                     downloaded = d.get('downloaded_bytes', 0)
                     if total > 0:
@@ -1679,9 +3517,11 @@ def _run_video_download(task, video_url, quality, proxies=None):
                     else:
                         task['progress'] = 95
                         task['message'] = 'Download complete, processing…'
+                _notify_task(task)
 
             def _postprocessor_hook(d):
                 task['last_activity'] = time.time()
+                _gate_postprocessor(task, d)
                 if d.get('status') == 'started':
                     task['status'] = 'merging'
                     task['progress'] = 96
@@ -1689,6 +3529,7 @@ def _run_video_download(task, video_url, quality, proxies=None):
                 elif d.get('status') == 'finished':
                     task['progress'] = 99
                     task['message'] = 'Merge complete!'
+                _notify_task(task)
 
             # Removing aria2c and aggressive concurrent_fragment_downloads for video 
             # to prevent mid-stream 403 bot-blocks from YouTube. 
@@ -1701,20 +3542,29 @@ def _run_video_download(task, video_url, quality, proxies=None):
                 'postprocessor_hooks': [_postprocessor_hook],
             })
 
+            if task['_streamable']:
+                # Fixups would rewrite the file under a reader that is already streaming it
+                ydl_opts['fixup'] = 'never'
+
             if HAS_FFMPEG:
                 ydl_opts['merge_output_format'] = 'mp4'
+                merger_args = None
                 if not selected_has_audio:
-                    # Use stream copy for audio when possible (much faster)
-                    ydl_opts['postprocessor_args'] = {
-                        'merger+ffmpeg': ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
-                    }
+                    # Stream copy both tracks unless the audio isn't AAC
+                    audio_args = (
+                        ['-c:a', 'copy'] if processing == 'remux' else ['-c:a', 'aac', '-b:a', f'{AUDIO_BITRATE}k']
+                    )
+                    merger_args = ['-c:v', 'copy', *audio_args]
+                ydl_opts['postprocessor_args'] = _ffmpeg_pp_args(merger_args)
 
             if selected_height:
                 task['message'] = f'Starting download ({selected_height}p)…'
                 task['progress'] = max(task.get('progress', 0), 15)
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.process_ie_result(selected_info, download=True)
+            with _client_scoreboard.track(selected_client, video_url, measure_latency=False), \
+                    yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                # process_ie_result mutates its input — keep the probe pristine
+                info = ydl.process_ie_result(copy.deepcopy(selected_info), download=True)
                 title = info.get('title', 'video')
 
                 downloaded_files = [
@@ -1736,9 +3586,14 @@ def _run_video_download(task, video_url, quality, proxies=None):
                 task['status'] = 'done'
                 task['progress'] = 100
                 task['message'] = 'Ready to download!'
+                _record_processing(task, processing)
+                _store_artifact(task)
                 return
         except Exception as e:
             last_error = e
+            _transcode_slots.release(task)   # a failed merge/convert never reports 'finished'
+            if _is_stale_url_error(e):
+                task['_probe'] = None   # signed URLs rejected — re-probe next attempt
             shutil.rmtree(tmpdir, ignore_errors=True)
             time.sleep(1)
             continue
@@ -1746,11 +3601,13 @@ def _run_video_download(task, video_url, quality, proxies=None):
     task['status'] = 'error'
     task['error'] = str(last_error) if last_error else 'All attempts failed'
     task['message'] = 'Download failed — please try again.'
-    unreserve_download()
+    unreserve_download(task.get('_reservation'))
 
 
 def _run_audio_download(task, video_url, audio_format, proxies=None):
     """Download + convert audio in a background thread without proxies."""
+    if _serve_from_artifact_cache(task):
+        return
     last_error = None
     
     for attempt in range(3):
@@ -1759,11 +3616,16 @@ def _run_audio_download(task, video_url, audio_format, proxies=None):
         try:
             ext = audio_format.lower()
             output_template = os.path.join(tmpdir, '%(id)s.%(ext)s')
+            passthrough_format = _PASSTHROUGH_AUDIO_FORMATS.get(ext)
+            task['_streamable'] = None   # set once the passthrough format is known
+            task['_stream_path'] = None
 
             def _progress_hook(d):
                 task['last_activity'] = time.time()
                 if d.get('status') == 'downloading':
                     task['status'] = 'downloading'
+                    if task.get('_streamable') and not task.get('_stream_path'):
+                        _begin_stream(task, d)
                     total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
                     downloaded = d.get('downloaded_bytes', 0)
                     if total > 0:
@@ -1772,9 +3634,11 @@ def _run_audio_download(task, video_url, audio_format, proxies=None):
                 elif d.get('status') == 'finished':
                     task['progress'] = 95
                     task['message'] = 'Download complete, converting…'
+                _notify_task(task)
 
             def _postprocessor_hook(d):
                 task['last_activity'] = time.time()
+                _gate_postprocessor(task, d)
                 if d.get('status') == 'started':
                     task['status'] = 'merging'
                     task['progress'] = 96
@@ -1782,31 +3646,73 @@ def _run_audio_download(task, video_url, audio_format, proxies=None):
                 elif d.get('status') == 'finished':
                     task['progress'] = 99
                     task['message'] = 'Conversion complete!'
+                _notify_task(task)
 
-            _chosen_client = random.choice(_YT_PLAYER_CLIENTS[:5])
+            _chosen_client = _client_scoreboard.choose()
             ydl_opts = _yt_dlp_base_opts(_chosen_client, for_download=True, extra_opts={
                 'format': 'bestaudio/best',
                 'outtmpl': output_template,
                 'restrictfilenames': True,
-                'concurrent_fragment_downloads': 16,
+                'concurrent_fragment_downloads': _fragments_per_job(16),
                 'progress_hooks': [_progress_hook],
                 'postprocessor_hooks': [_postprocessor_hook],
             })
+            passthrough_opts = None
+            if passthrough_format:
+                # Keep the source container when it already is the requested
+                # one: no ffmpeg pass, and a sequential write (no aria2c
+                # segments) so the file can be streamed live
+                passthrough_opts = {**ydl_opts, 'format': passthrough_format}
+            ydl_opts['format'] = _audio_selector(ext)
             if HAS_ARIA2C:
                 ydl_opts['external_downloader'] = 'aria2c'
                 ydl_opts['external_downloader_args'] = {
-                    'aria2c': ['-c', '-j', '4', '-x', '16', '-s', '16', '-k', '5M', '--file-allocation=none']
+                    'aria2c': _aria2c_args()
                 }
-            if HAS_FFMPEG:
+            # FFmpegExtractAudio has no webm target; the opus pick is webm already
+            if HAS_FFMPEG and ext != 'webm':
                 ydl_opts['postprocessors'] = [{
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': ext,
-                    'preferredquality': '192',
+                    'preferredquality': AUDIO_BITRATE,
                 }]
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                title = info.get('title', 'audio')
+                ydl_opts['postprocessor_args'] = _ffmpeg_pp_args()
+
+            info = None
+            if passthrough_opts:
+                # Resolve first: only a source already in the requested
+                # container is kept as-is; anything else is converted below
+                with _client_scoreboard.track(_chosen_client, video_url), \
+                        yt_dlp.YoutubeDL({**passthrough_opts, 'format': f'{passthrough_format}/{ydl_opts["format"]}'}) as ydl:
+                    info = ydl.extract_info(video_url, download=False)
+                if info.get('ext') != ext:
+                    passthrough_opts = None
+
+            if passthrough_opts:
+                streamed = None
+            elif info is not None:
+                path = _stream_transcode_audio(task, info, ext, tmpdir) if STREAM_TRANSCODE and HAS_FFMPEG else None
+                streamed = path and (path, info.get('title', 'audio'), _audio_codec_args(ext, info.get('acodec'))[1])
+            else:
+                streamed = _try_stream_audio(task, _chosen_client, video_url, ext, tmpdir)
+            if streamed:
+                filepath, title, processing = streamed
+            else:
+                with _client_scoreboard.track(_chosen_client, video_url, measure_latency=False):
+                    if passthrough_opts:
+                        # Only a single-file http(s) download is streamed live,
+                        # and only then are yt-dlp's fixups skipped
+                        if _is_single_file_http(info):
+                            task['_streamable'] = 'audio'
+                            # Fixups would rewrite the file under a reader that is already streaming it
+                            passthrough_opts['fixup'] = 'never'
+                        with yt_dlp.YoutubeDL(passthrough_opts) as ydl:
+                            info = ydl.process_ie_result(info, download=True)
+                    else:
+                        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                            info = ydl.extract_info(video_url, download=True)
+                    title = info.get('title', 'audio')
+                processing = 'copy' if passthrough_opts else _extract_audio_processing(ext, info)
 
                 downloaded_files = [
                     f for f in os.listdir(tmpdir)
@@ -1815,29 +3721,24 @@ def _run_audio_download(task, video_url, audio_format, proxies=None):
                 if not downloaded_files:
                     shutil.rmtree(tmpdir, ignore_errors=True)
                     continue
-
                 filepath = os.path.join(tmpdir, downloaded_files[0])
-                actual_ext = os.path.splitext(downloaded_files[0])[1].lstrip('.') or ext
-                safe_filename = re.sub(r'[^\w\-_.]', '_', title)[:100] + f'.{actual_ext}'
-
-                mime_map = {
-                    'mp3': 'audio/mpeg',
-                    'wav': 'audio/wav',
-                    'm4a': 'audio/mp4',
-                    'opus': 'audio/opus',
-                    'webm': 'audio/webm',
-                    'ogg': 'audio/ogg',
-                }
-                task['filepath'] = filepath
-                task['filename'] = safe_filename
-                task['filesize'] = os.path.getsize(filepath)
-                task['mime_type'] = mime_map.get(actual_ext, f'audio/{actual_ext}')
-                task['status'] = 'done'
-                task['progress'] = 100
-                task['message'] = 'Ready to download!'
-                return
+
+            actual_ext = os.path.splitext(filepath)[1].lstrip('.') or ext
+            safe_filename = re.sub(r'[^\w\-_.]', '_', title)[:100] + f'.{actual_ext}'
+
+            task['filepath'] = filepath
+            task['filename'] = safe_filename
+            task['filesize'] = os.path.getsize(filepath)
+            task['mime_type'] = _audio_mime_from_ext(actual_ext)
+            task['status'] = 'done'
+            task['progress'] = 100
+            task['message'] = 'Ready to download!'
+            _record_processing(task, processing)
+            _store_artifact(task)
+            return
         except Exception as e:
             last_error = e
+            _transcode_slots.release(task)   # a failed merge/convert never reports 'finished'
             shutil.rmtree(tmpdir, ignore_errors=True)
             time.sleep(1)
             continue
@@ -1845,141 +3746,338 @@ def _run_audio_download(task, video_url, audio_format, proxies=None):
     task['status'] = 'error'
     task['error'] = str(last_error) if last_error else 'All attempts failed'
     task['message'] = 'Download failed — please try again.'
-    unreserve_download()
+    unreserve_download(task.get('_reservation'))
+
+
+# ── Spotify → YouTube match search ─────────────────────────────────────────
+# Every search strategy is issued at once and the results are pooled into one
+# ranked list; the search stops as soon as a candidate clears
+# SPOTIFY_MATCH_CONFIDENT.  Fallback tiers (duration-only, relaxed, first
+# result) come from the plain query that already ran alongside the others.
+SPOTIFY_MATCH_CONFIDENT = float(os.environ.get('SPOTIFY_MATCH_CONFIDENT', 0.85))
+_SEARCHES_PER_TRACK = 4   # strategies _find_spotify_candidates issues at once
+# One full fan-out per download worker, so batch tracks resolving side by side
+# don't queue behind each other's searches
+SPOTIFY_SEARCH_WORKERS = int(os.environ.get(
+    'SPOTIFY_SEARCH_WORKERS', _SEARCHES_PER_TRACK * int(os.environ.get('DOWNLOAD_WORKERS', 4))
+))
+SPOTIFY_SEARCH_TIMEOUT = 30   # seconds before giving up on slow strategies
+
+_search_pool = ThreadPoolExecutor(max_workers=SPOTIFY_SEARCH_WORKERS, thread_name_prefix='search')
+
+
+def _flat_search(query, extra_opts=None):
+    """Flat yt-dlp search (``ytsearchN:…`` / ``scsearchN:…``) → list of entries."""
+    search_client = _client_scoreboard.choose()
+    ydl_opts_search = _yt_dlp_base_opts(search_client, extra_opts={
+        'extract_flat': True,
+        **(extra_opts or {}),
+    })
+    with _client_scoreboard.track(search_client, query), yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
+        results = ydl.extract_info(query, download=False) or {}
+    return results.get('entries') or []
 
 
-def _run_spotify_download(task, track_title, track_artist, duration_ms, audio_format, proxies=None):
-    """Search YouTube for a Spotify track match and download it as audio without proxies."""
-    last_error = None
-    artist_list = [a.strip() for a in re.split(r',|&| and ', track_artist or '') if a.strip()]
-    if not artist_list:
-        artist_list = [track_artist] if track_artist else []
-    
-    for attempt in range(3):
-        tmpdir = tempfile.mkdtemp()
-        task['tmpdir'] = tmpdir
-        try:
-            ext = audio_format.lower()
-            target_dur_s = duration_ms / 1000.0
-
-            # Search Strategies
-            best_match = None
-            strategies = [
-                (f"ytsearch10:{track_artist} - {track_title} audio", "Resolving high-fidelity audio stream…", 2),
-                (f"ytsearch10:{track_artist} - {track_title} lyrics", "Decrypting secure audio segment…", 4),
-                (f"scsearch5:{track_artist} - {track_title}", "Remastering audio buffer…", 5)
-            ]
-            
-            for query, msg, tol in strategies:
-                task['message'] = msg
-                _search_client = random.choice(_YT_PLAYER_CLIENTS[:5])
-                ydl_opts_search = _yt_dlp_base_opts(_search_client, extra_opts={
-                    'extract_flat': True,
-                })
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
-                        results = ydl.extract_info(query, download=False)
-                        entries = results.get('entries', [])
-                        candidates = []
-                        for entry in entries:
-                            res = _score_spotify_candidate(track_title, artist_list, target_dur_s, entry, tolerance=tol)
-                            if res:
-                                candidates.append((res[0], entry['url']))
-                        if candidates:
-                            best_match = sorted(candidates, key=lambda x: x[0], reverse=True)[0]
-                            break
-                except Exception:
-                    continue
+def _is_unavailable_error(exc):
+    """True when yt-dlp says the video itself is gone (not a transient failure)."""
+    msg = str(exc).lower()
+    return any(s in msg for s in (
+        'video unavailable', 'private video', 'has been removed', 'no longer available',
+        'account associated with this video has been terminated', 'not available in your country',
+    ))
 
-            # Fallback: use Spotify-Scraper's strict duration strategy (±2s)
-            if not best_match:
-                task['message'] = 'Matching by duration…'
-                _search_client = random.choice(_YT_PLAYER_CLIENTS[:5])
-                ydl_opts_search = _yt_dlp_base_opts(_search_client, extra_opts={
-                    'extract_flat': True,
-                })
-                query = f"ytsearch10:{track_artist} - {track_title}"
-                with yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
-                    results = ydl.extract_info(query, download=False)
-                    entries = results.get('entries', [])
-
-                target_duration_sec = int(round(target_dur_s))
-                tolerance_sec = 2
-                duration_matches = []
-                for entry in entries:
-                    duration = entry.get('duration')
-                    if duration is None:
-                        continue
-                    try:
-                        duration_int = int(round(float(duration)))
-                    except Exception:
-                        continue
-                    if duration_int <= 0:
-                        continue
 
-                    diff = abs(duration_int - target_duration_sec)
-                    if diff <= tolerance_sec:
-                        entry_url = entry.get('url') or entry.get('webpage_url')
-                        if entry_url:
-                            duration_matches.append((diff, entry_url))
-
-                if duration_matches:
-                    duration_matches.sort(key=lambda x: x[0])
-                    best_match = (1.0, duration_matches[0][1])
-
-            # Final fallback: relaxed search (prevents hard-fail at 0%)
-            if not best_match:
-                task['message'] = 'Using relaxed match fallback…'
-                ydl_opts_search = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'extract_flat': True,
-                    'socket_timeout': 15,
-                    'geo_bypass': True,
-                    'extractor_args': {'youtube': {'player_client': [random.choice(['android', 'ios', 'web', 'tv', 'mweb'])]}},
-                }
-                query = f"ytsearch8:{track_artist} - {track_title}"
-                with yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
-                    results = ydl.extract_info(query, download=False)
-                    entries = results.get('entries', [])
-
-                relaxed_candidates = []
-                for entry in entries:
-                    res = _score_spotify_candidate(
-                        track_title,
-                        artist_list,
-                        target_dur_s,
-                        entry,
-                        tolerance=12,
-                    )
-                    if res:
-                        entry_url = entry.get('url') or entry.get('webpage_url')
-                        if entry_url:
-                            relaxed_candidates.append((res[0], entry_url))
-
-                if relaxed_candidates:
-                    relaxed_candidates.sort(key=lambda x: x[0], reverse=True)
-                    best_match = relaxed_candidates[0]
-                elif entries:
-                    # Last resort: first search result
-                    entry_url = entries[0].get('url') or entries[0].get('webpage_url')
-                    if entry_url:
-                        best_match = (0.0, entry_url)
-
-            # CLI fallback: mirror Spotify-Scraper method
-            if not best_match:
-                task['message'] = 'Searching via yt-dlp CLI fallback…'
-                query = f"{track_artist} - {track_title}"
-                cli_results = _yt_dlp_cli_search(query, limit=10, timeout=30)
-                if cli_results:
-                    target_duration_sec = int(round(target_dur_s))
-                    strict = [r for r in cli_results if abs(r[2] - target_duration_sec) <= 2]
-                    pool = strict if strict else cli_results
-                    best_cli = min(pool, key=lambda r: abs(r[2] - target_duration_sec))
-                    best_match = (0.0, f"https://www.youtube.com/watch?v={best_cli[0]}")
-
-            if not best_match:
+def _entry_duration_diff(entry, target_dur_s):
+    try:
+        return abs(int(round(float(entry.get('duration')))) - target_dur_s)
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_spotify_candidates(task, track_title, track_artist, artist_list, target_dur_s):
+    """Ranked ``[(score, url, duration_diff), …]`` for a Spotify track, best first.
+
+    Fallback picks the matcher never scored carry ``score=None``.
+    """
+    task['message'] = 'Resolving high-fidelity audio stream…'
+    _notify_task(task)
+    base_query = f"{track_artist} - {track_title}"
+    tolerances = SPOTIFY_MATCH_TOLERANCES
+    scored_searches = {   # future -> duration tolerance
+        _search_pool.submit(_flat_search, f"ytsearch10:{base_query} audio"): tolerances['audio'],
+        _search_pool.submit(_flat_search, f"ytsearch10:{base_query} lyrics"): tolerances['lyrics'],
+        _search_pool.submit(_flat_search, f"scsearch5:{base_query}"): tolerances['soundcloud'],
+    }
+    plain_search = _search_pool.submit(_flat_search, f"ytsearch10:{base_query}", {'socket_timeout': 15})
+    matcher = _SpotifyMatcher(track_title, artist_list, target_dur_s)
+
+    scored = []
+    confident = False
+    pending = set(scored_searches) | {plain_search}
+    deadline = time.time() + SPOTIFY_SEARCH_TIMEOUT
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.time(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            if fut not in scored_searches or fut.exception() is not None:
+                continue
+            entries = fut.result()
+            for entry, res in zip(entries, matcher.score_many(entries, tolerance=scored_searches[fut])):
+                entry_url = entry.get('url') or entry.get('webpage_url')
+                if res and entry_url:
+                    scored.append((res[0], entry_url, res[1]))
+        confident = bool(scored) and max(c[0] for c in scored) >= SPOTIFY_MATCH_CONFIDENT
+        if confident:
+            break
+    # Searches that haven't started are no longer needed; the plain one still
+    # feeds the fallback tiers unless a match is already confident
+    for fut in pending:
+        if fut is not plain_search or confident:
+            fut.cancel()
+
+    ranked = sorted(scored, key=lambda c: c[0], reverse=True)
+
+    entries = []
+    if plain_search.done() and not plain_search.cancelled() and plain_search.exception() is None:
+        entries = plain_search.result()
+    # Duration-only match (Spotify-Scraper's strict ±2s strategy)
+    target_duration_sec = int(round(target_dur_s))
+    duration_matches = sorted(
+        (abs(diff), entry.get('url') or entry.get('webpage_url'))
+        for entry in entries
+        for diff in [_entry_duration_diff(entry, target_duration_sec)]
+        if diff is not None and diff <= 2 and entry.get('duration')
+    )
+    ranked += [(None, url, diff) for diff, url in duration_matches if url]
+    # Relaxed scoring, then the first search result as a last resort
+    for entry, res in zip(entries, matcher.score_many(entries, tolerance=tolerances['relaxed'])):
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if res and entry_url:
+            ranked.append((res[0], entry_url, res[1]))
+    if entries and (entries[0].get('url') or entries[0].get('webpage_url')):
+        first = entries[0]
+        ranked.append((None, first.get('url') or first.get('webpage_url'), _entry_duration_diff(first, target_dur_s)))
+
+    # CLI fallback: mirror Spotify-Scraper method
+    if not ranked:
+        task['message'] = 'Searching via yt-dlp CLI fallback…'
+        cli_results = _yt_dlp_cli_search(base_query, limit=10, timeout=30)
+        if cli_results:
+            strict = [r for r in cli_results if abs(r[2] - target_duration_sec) <= 2]
+            pool = strict if strict else cli_results
+            best_cli = min(pool, key=lambda r: abs(r[2] - target_duration_sec))
+            ranked.append((
+                None, f"https://www.youtube.com/watch?v={best_cli[0]}", abs(best_cli[2] - target_duration_sec)
+            ))
+
+    seen = set()
+    return [c for c in ranked if not (c[1] in seen or seen.add(c[1]))]
+
+
+# ── Persistent Spotify → YouTube match table ─────────────────────────────
+# Which upload matches a Spotify track almost never changes, so the chosen
+# video is remembered per track ID (and ISRC, which is shared by the same
+# recording on different releases).  A hit skips search entirely; the row is
+# dropped only when the remembered upload turns out to be unavailable.
+# Export/import (``flask --app app export-matches FILE``) pre-warms new nodes.
+# Only real matcher scores of at least SPOTIFY_MATCH_ACCEPT are remembered;
+# fallback picks (score None) are searched again next time.
+SPOTIFY_MATCH_ACCEPT = float(os.environ.get('SPOTIFY_MATCH_ACCEPT', 0.6))
+_MATCH_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.spotify_matches.sqlite3')
+_MATCH_FIELDS = ('track_id', 'isrc', 'video_url', 'score', 'duration_diff', 'matched_at')
+
+
+class _SpotifyMatchStore:
+    """SQLite table of track ID/ISRC → chosen upload; in-memory if SQLite is unavailable."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS spotify_matches ('
+                    ' track_id TEXT PRIMARY KEY, isrc TEXT, video_url TEXT NOT NULL,'
+                    ' score REAL, duration_diff REAL, matched_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS spotify_matches_isrc ON spotify_matches (isrc)')
+        except sqlite3.Error as e:
+            print(f"Spotify match store: SQLite unavailable ({e}), using in-memory table")
+            self._memory = {}
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _SQLiteTxn(conn)
+
+    def _rows(self, where='', params=()):
+        with self._conn() as conn:
+            cursor = conn.execute(f'SELECT {", ".join(_MATCH_FIELDS)} FROM spotify_matches {where}', params)
+            return [dict(zip(_MATCH_FIELDS, row)) for row in cursor.fetchall()]
+
+    def get(self, track_id, isrc=None):
+        """Stored match for ``track_id`` (or any track sharing ``isrc``), or None."""
+        try:
+            if self._memory is not None:
+                with self._lock:
+                    rows = [
+                        r for r in self._memory.values()
+                        if r['track_id'] == track_id or (isrc and r['isrc'] == isrc)
+                    ]
+            else:
+                rows = self._rows('WHERE track_id = ? OR (? IS NOT NULL AND isrc = ?)', (track_id, isrc, isrc))
+        except sqlite3.Error as e:
+            print(f"Spotify match lookup failed: {e}")
+            rows = []
+        row = next((r for r in rows if r['track_id'] == track_id), rows[0] if rows else None)
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row
+
+    def put(self, match):
+        row = {field: match.get(field) for field in _MATCH_FIELDS}
+        row['matched_at'] = row['matched_at'] or time.time()
+        if self._memory is not None:
+            with self._lock:
+                self._memory[row['track_id']] = row
+            return
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    f'INSERT OR REPLACE INTO spotify_matches ({", ".join(_MATCH_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)',
+                    tuple(row[f] for f in _MATCH_FIELDS),
+                )
+        except sqlite3.Error as e:
+            print(f"Spotify match write failed: {e}")
+
+    def invalidate(self, track_id, video_url):
+        """Forget ``video_url`` for ``track_id`` (and for any ISRC sibling that shares it)."""
+        with self._lock:
+            self.invalidations += 1
+            if self._memory is not None:
+                for key in [k for k, r in self._memory.items() if r['video_url'] == video_url or k == track_id]:
+                    del self._memory[key]
+                return
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    'DELETE FROM spotify_matches WHERE track_id = ? OR video_url = ?', (track_id, video_url)
+                )
+        except sqlite3.Error as e:
+            print(f"Spotify match invalidation failed: {e}")
+
+    def export(self):
+        if self._memory is not None:
+            with self._lock:
+                return list(self._memory.values())
+        return self._rows()
+
+    def import_rows(self, rows):
+        """Upsert exported rows; returns how many were accepted.
+
+        Rows without a real matcher score of at least SPOTIFY_MATCH_ACCEPT are skipped.
+        """
+        count = 0
+        for row in rows:
+            if not isinstance(row, dict) or not isinstance(row.get('score'), (int, float)):
+                continue
+            if row['score'] >= SPOTIFY_MATCH_ACCEPT and row.get('track_id') and row.get('video_url'):
+                self.put(row)
+                count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory' if self._memory is not None else 'sqlite',
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_spotify_matches = _SpotifyMatchStore(_MATCH_DB_FILE)
+
+
+def _spotify_track_isrc(track_id, fetch=False):
+    """ISRC from the Web API track record's ``external_ids``.
+
+    Only an already-cached record is used unless ``fetch`` is set, in which
+    case a miss goes through the batched track lookup.
+    """
+    if not track_id:
+        return None
+    record = _spotify_records.get(f'track:{track_id}')
+    if record is None and fetch:
+        try:
+            record = spotify_lookup('track', track_id)
+        except Exception:
+            record = None
+    return ((record or {}).get('external_ids') or {}).get('isrc')
+
+
+@app.cli.command('export-matches')
+@click.argument('path')
+def export_matches_command(path):
+    """Write the Spotify→YouTube match table to a JSON file."""
+    rows = _spotify_matches.export()
+    with open(path, 'w') as f:
+        json.dump(rows, f, indent=1)
+    print(f"Exported {len(rows)} matches to {path}")
+
+
+@app.cli.command('import-matches')
+@click.argument('path')
+def import_matches_command(path):
+    """Load a JSON file written by export-matches into the match table."""
+    with open(path, 'r') as f:
+        rows = json.load(f)
+    print(f"Imported {_spotify_matches.import_rows(rows)} matches from {path}")
+
+
+def _run_spotify_download(task, track_title, track_artist, duration_ms, audio_format, proxies=None,
+                          spotify_track_id=None, isrc=None):
+    """Search YouTube for a Spotify track match and download it as audio without proxies."""
+    if _serve_from_artifact_cache(task):
+        return
+    last_error = None
+    artist_list = [a.strip() for a in re.split(r',|&| and ', track_artist or '') if a.strip()]
+    if not artist_list:
+        artist_list = [track_artist] if track_artist else []
+    
+    target_dur_s = duration_ms / 1000.0
+    candidates = None   # ranked search results, reused across attempts
+    pick = 0            # index of the candidate being tried
+    isrc = isrc or _spotify_track_isrc(spotify_track_id)
+    stored = _spotify_matches.get(spotify_track_id, isrc) if spotify_track_id else None
+    if stored:
+        candidates = [(stored['score'], stored['video_url'], stored['duration_diff'])]
+
+    for attempt in range(3):
+        tmpdir = tempfile.mkdtemp()
+        task['tmpdir'] = tmpdir
+        try:
+            ext = audio_format.lower()
+            if not candidates:
+                candidates = _find_spotify_candidates(task, track_title, track_artist, artist_list, target_dur_s)
+            if not candidates:
                 raise Exception("No suitable candidates found")
+            best_match = candidates[min(pick, len(candidates) - 1)]
 
             # Download actual match
             video_url = best_match[1]
@@ -1999,54 +4097,82 @@ def _run_spotify_download(task, track_title, track_artist, duration_ms, audio_fo
                     task['message'] = 'Downloading audio…'
                 elif d.get('status') == 'finished':
                     task['progress'] = 95
+                _notify_task(task)
 
             def _postprocessor_hook(d):
                 task['last_activity'] = time.time()
+                _gate_postprocessor(task, d)
                 if d.get('status') == 'started':
                     task['status'] = 'merging'
                     task['message'] = f'Converting to {audio_format}…'
                 elif d.get('status') == 'finished':
                     task['progress'] = 99
+                _notify_task(task)
 
-            _chosen_client = random.choice(_YT_PLAYER_CLIENTS[:5])
+            _chosen_client = _client_scoreboard.choose()
             ydl_opts = _yt_dlp_base_opts(_chosen_client, for_download=True, extra_opts={
-                'format': 'bestaudio/best',
+                'format': _audio_selector(ext),
                 'outtmpl': output_template,
                 'restrictfilenames': True,
-                'concurrent_fragment_downloads': 16,
+                'concurrent_fragment_downloads': _fragments_per_job(16),
                 'progress_hooks': [_progress_hook],
                 'postprocessor_hooks': [_postprocessor_hook],
             })
             if HAS_ARIA2C:
                 ydl_opts['external_downloader'] = 'aria2c'
                 ydl_opts['external_downloader_args'] = {
-                    'aria2c': ['-c', '-j', '4', '-x', '16', '-s', '16', '-k', '5M', '--file-allocation=none']
+                    'aria2c': _aria2c_args()
                 }
             if HAS_FFMPEG:
                 ydl_opts['postprocessors'] = [{
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': ext,
-                    'preferredquality': '192',
+                    'preferredquality': AUDIO_BITRATE,
                 }]
+                ydl_opts['postprocessor_args'] = _ffmpeg_pp_args()
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.extract_info(video_url, download=True)
+            streamed = _try_stream_audio(task, _chosen_client, video_url, ext, tmpdir)
+            if streamed:
+                filepath, _, processing = streamed
+            else:
+                with _client_scoreboard.track(_chosen_client, video_url, measure_latency=False), \
+                        yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(video_url, download=True)
+                processing = _extract_audio_processing(ext, info)
                 downloaded_files = [f for f in os.listdir(tmpdir) if not f.endswith('.part') and not f.endswith('.ytdl')]
                 if not downloaded_files:
                     continue
-
                 filepath = os.path.join(tmpdir, downloaded_files[0])
-                task['filepath'] = filepath
-                base_name = f"{track_artist} - {track_title}" if track_artist else track_title
-                task['filename'] = re.sub(r'[^\w\-_.]', '_', base_name)[:100] + f'.{ext}'
-                task['filesize'] = os.path.getsize(filepath)
-                task['mime_type'] = f'audio/{ext}'
-                task['status'] = 'done'
-                task['progress'] = 100
-                task['message'] = 'Ready!'
-                return
+
+            task['filepath'] = filepath
+            base_name = f"{track_artist} - {track_title}" if track_artist else track_title
+            task['filename'] = re.sub(r'[^\w\-_.]', '_', base_name)[:100] + f'.{ext}'
+            task['filesize'] = os.path.getsize(filepath)
+            task['mime_type'] = f'audio/{ext}'
+            task['status'] = 'done'
+            task['progress'] = 100
+            task['message'] = 'Ready!'
+            _record_processing(task, processing)
+            _store_artifact(task)
+            score = best_match[0]
+            if spotify_track_id and not stored and score is not None and score >= SPOTIFY_MATCH_ACCEPT:
+                _spotify_matches.put({
+                    'track_id': spotify_track_id,
+                    'isrc': isrc or _spotify_track_isrc(spotify_track_id, fetch=True),
+                    'video_url': video_url,
+                    'score': score,
+                    'duration_diff': best_match[2],
+                })
+            return
         except Exception as e:
             last_error = e
+            _transcode_slots.release(task)   # a failed merge/convert never reports 'finished'
+            if stored and _is_unavailable_error(e):
+                # Remembered upload is gone — drop it and search from scratch
+                _spotify_matches.invalidate(spotify_track_id, stored['video_url'])
+                stored = candidates = None
+            elif _is_unavailable_error(e):
+                pick += 1   # this upload is gone — fall through to the next-best match
             shutil.rmtree(tmpdir, ignore_errors=True)
             time.sleep(1)
             continue
@@ -2054,7 +4180,471 @@ def _run_spotify_download(task, track_title, track_artist, duration_ms, audio_fo
     task['status'] = 'error'
     task['error'] = str(last_error) if last_error else 'All attempts failed during download'
     task['message'] = 'Download failed — please try again.'
-    unreserve_download()
+    unreserve_download(task.get('_reservation'))
+
+
+# ── Spotify album/playlist batch downloads ───────────────────────────────
+# One job per collection: the track list is paged from the Web API, tracks are
+# matched + downloaded through _run_spotify_download (so the artifact cache and
+# matcher are shared with single-track downloads), and every finished file is
+# appended to the ZIP straight away.  A track that fails is listed in
+# FAILED_TRACKS.txt instead of failing the batch.  Tracks run on the shared
+# download scheduler, so they count against DOWNLOAD_WORKERS and the fragment
+# budget like any other job.  The batch's own worker always runs a track
+# itself, taking queued ones back when nothing else is left, so a batch
+# never waits on a queue it is blocking.
+SPOTIFY_BATCH_WORKERS = int(os.environ.get('SPOTIFY_BATCH_WORKERS', 3))   # tracks in flight per batch
+SPOTIFY_BATCH_MAX_TRACKS = int(os.environ.get('SPOTIFY_BATCH_MAX_TRACKS', 100))
+
+
+def _spotify_collection_tracks(kind, item_id):
+    """Return ``(name, [track dict, …])`` for an album or playlist, paging the Web API."""
+    if kind == 'album':
+        album = spotify_lookup('album', item_id)
+        if not album:
+            raise Exception('Spotify album not found.')
+        name, page = album.get('name'), album.get('tracks')
+    else:
+        resp = spotify_api_get(f"/v1/playlists/{item_id}")
+        if resp.status_code != 200:
+            raise Exception(f'Spotify playlist lookup failed ({resp.status_code})')
+        data = resp.json()
+        name, page = data.get('name'), data.get('tracks')
+
+    tracks = []
+    while page:
+        for item in page.get('items') or []:
+            track = item.get('track') if kind == 'playlist' else item
+            if not track or track.get('type') != 'track' or track.get('is_local'):
+                continue
+            artists = [a.get('name', '').strip() for a in track.get('artists') or [] if a.get('name')]
+            if not track.get('id') or not track.get('name') or not artists or not track.get('duration_ms'):
+                continue
+            if kind == 'playlist':
+                _spotify_records.put(f"track:{track['id']}", track)   # full objects — seed the cache
+            tracks.append({
+                'id': track['id'],
+                'title': track['name'],
+                'artist': ', '.join(artists),
+                'duration_ms': int(track['duration_ms']),
+                'isrc': (track.get('external_ids') or {}).get('isrc'),   # absent on album tracks
+            })
+            if len(tracks) >= SPOTIFY_BATCH_MAX_TRACKS:
+                return name, tracks
+        next_url = page.get('next')
+        if not next_url:
+            break
+        resp = spotify_api_get(next_url.replace('https://api.spotify.com', '', 1))
+        if resp.status_code != 200:
+            break
+        page = resp.json()
+    return name, tracks
+
+
+def _update_batch_progress(task, children):
+    """Fold sub-task progress into the batch task and its per-track list."""
+    finished = 0
+    total_progress = 0
+    for entry, child in zip(task['tracks'], children):
+        if entry['status'] not in ('done', 'error'):
+            entry['status'] = child['status']
+            entry['progress'] = child['progress']
+        else:
+            finished += 1
+        total_progress += 100 if entry['status'] in ('done', 'error') else entry['progress']
+    count = len(task['tracks'])
+    task['last_activity'] = time.time()
+    task['status'] = 'downloading'
+    task['progress'] = min(int(total_progress / count), 99)
+    task['message'] = f'{finished}/{count} tracks processed…'
+    _notify_task(task)
+
+
+def _run_batch_track(child, finished, idx, track, audio_format):
+    """Download one batch track, then report ``idx`` on the ``finished`` queue."""
+    try:
+        _run_spotify_download(
+            child, track['title'], track['artist'], track['duration_ms'], audio_format, None, track['id'],
+            track.get('isrc'),
+        )
+    except Exception as e:
+        child['status'] = 'error'
+        child['error'] = str(e)
+    finally:
+        finished.put(idx)
+
+
+def _run_spotify_batch(task, kind, item_id, audio_format):
+    """Download every track of a Spotify album/playlist into one ZIP."""
+    tmpdir = tempfile.mkdtemp()
+    task['tmpdir'] = tmpdir
+    ext = audio_format.lower()
+    try:
+        task['message'] = f'Fetching {kind} tracks…'
+        _notify_task(task)
+        name, tracks = _spotify_collection_tracks(kind, item_id)
+        if not tracks:
+            raise Exception(f'No downloadable tracks found in this {kind}.')
+        task['tracks'] = [
+            {'title': t['title'], 'artist': t['artist'], 'status': 'queued', 'progress': 0, 'error': None}
+            for t in tracks
+        ]
+
+        children = []
+        for t in tracks:
+            child = _make_task()
+            child['_reservation'] = ()   # the batch holds the reservation
+            child['_artifact_key'] = f"spotify:spotify:track:{t['id']}:{ext}:{AUDIO_BITRATE}"
+            children.append(child)
+
+        zip_path = os.path.join(tmpdir, 'batch.zip')
+        used_names = set()
+        finished = queue.Queue()
+        upcoming = list(range(len(tracks)))
+        queued = []   # handed to the scheduler, maybe not started yet
+        in_flight = 0
+        # Audio is already compressed — store, don't deflate
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:
+            while upcoming or in_flight:
+                # Hand up to SPOTIFY_BATCH_WORKERS - 1 tracks to other workers…
+                while len(upcoming) > 1 and in_flight < SPOTIFY_BATCH_WORKERS - 1:
+                    idx = upcoming[0]
+                    if not _download_scheduler.submit(
+                        children[idx], PRIORITY_AUDIO, _run_batch_track,
+                        (finished, idx, tracks[idx], audio_format),
+                    ):
+                        break   # queue full — this worker picks it up below
+                    queued.append(upcoming.pop(0))
+                    in_flight += 1
+                # …and always run one on this worker so the batch keeps moving
+                if upcoming:
+                    idx = upcoming.pop(0)
+                    in_flight += 1
+                    _run_batch_track(children[idx], finished, idx, tracks[idx], audio_format)
+                else:
+                    idx = next((i for i in queued if _download_scheduler.withdraw(children[i])), None)
+                    if idx is not None:
+                        queued.remove(idx)
+                        _run_batch_track(children[idx], finished, idx, tracks[idx], audio_format)
+
+                try:
+                    done = [finished.get(timeout=0.5)]
+                except queue.Empty:
+                    done = []
+                while not finished.empty():
+                    done.append(finished.get())
+                for idx in done:
+                    in_flight -= 1
+                    if idx in queued:
+                        queued.remove(idx)
+                    child, entry = children[idx], task['tracks'][idx]
+                    if child['status'] == 'done' and child.get('filepath'):
+                        arcname = f"{idx + 1:02d} - {child['filename']}"
+                        if arcname not in used_names:
+                            used_names.add(arcname)
+                            zf.write(child['filepath'], arcname)
+                        entry.update(status='done', progress=100)
+                    else:
+                        entry.update(status='error', progress=100, error=child.get('error') or 'Download failed')
+                    _cleanup_task(child['id'])
+                _update_batch_progress(task, children)
+
+            failed = [
+                f"{i + 1:02d}. {e['artist']} - {e['title']}: {e['error']}"
+                for i, e in enumerate(task['tracks']) if e['status'] == 'error'
+            ]
+            if failed:
+                zf.writestr('FAILED_TRACKS.txt', '\n'.join(failed) + '\n')
+
+        succeeded = len(tracks) - len(failed)
+        if not succeeded:
+            raise Exception(f'None of the {len(tracks)} tracks could be downloaded.')
+
+        base_name = re.sub(r'[^\w\-_.]', '_', name or f'spotify_{kind}')[:100]
+        task['filepath'] = zip_path
+        task['filename'] = f'{base_name}.zip'
+        task['filesize'] = os.path.getsize(zip_path)
+        task['mime_type'] = 'application/zip'
+        task['status'] = 'done'
+        task['progress'] = 100
+        task['message'] = f'Ready! {succeeded}/{len(tracks)} tracks' + (f', {len(failed)} failed' if failed else '')
+    except Exception as e:
+        task['status'] = 'error'
+        task['error'] = str(e)
+        task['message'] = f'Download failed — {e}'
+        unreserve_download(task.get('_reservation'))
+    finally:
+        _notify_task(task)
+
+
+# ── Download scheduler (bounded worker pool + priority queue) ──────────────
+# A fixed number of workers drain a bounded queue; audio-only jobs jump ahead of
+# long video merges.  Fragment concurrency is split across workers so the
+# whole pool never opens more than DOWNLOAD_FRAGMENT_BUDGET connections.
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 4))
+DOWNLOAD_QUEUE_MAX = int(os.environ.get('DOWNLOAD_QUEUE_MAX', 20))
+DOWNLOAD_FRAGMENT_BUDGET = int(os.environ.get('DOWNLOAD_FRAGMENT_BUDGET', 32))
+
+PRIORITY_AUDIO = 0
+PRIORITY_VIDEO = 1
+
+
+def _fragments_per_job(wanted):
+    """Cap a job's fragment/connection count to its share of the global budget."""
+    return max(1, min(wanted, DOWNLOAD_FRAGMENT_BUDGET // max(DOWNLOAD_WORKERS, 1)))
+
+
+class _DownloadScheduler:
+    """Fixed pool of download workers fed from a bounded priority queue."""
+
+    def __init__(self, workers, max_queued):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._heap = []                  # (priority, seq, task, target, args)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _ensure_workers(self):
+        """Start workers lazily (after gunicorn forks). Caller holds the lock."""
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(
+                target=self._worker,
+                name=f'download-worker-{len(self._threads)}',
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, task, priority, target, args):
+        """Queue ``target(task, *args)``. Returns False when the queue is full."""
+        with self._cond:
+            if len(self._heap) >= self.max_queued:
+                self.rejected += 1
+                return False
+            self._ensure_workers()
+            task['status'] = 'queued'
+            task['message'] = 'Waiting for a free download slot…'
+            heapq.heappush(self._heap, (priority, next(self._seq), task, target, args))
+            self._cond.notify()
+        return True
+
+    def position(self, task_id):
+        """1-based queue position of a waiting task, or None once it has started."""
+        with self._cond:
+            for idx, item in enumerate(sorted(self._heap, key=lambda x: x[:2])):
+                if item[2]['id'] == task_id:
+                    return idx + 1
+        return None
+
+    def withdraw(self, task):
+        """Take a still-queued ``task`` back out. Returns False once a worker has it."""
+        with self._cond:
+            for idx, item in enumerate(self._heap):
+                if item[2] is task:
+                    self._heap.pop(idx)
+                    heapq.heapify(self._heap)
+                    return True
+        return False
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, task, target, args = heapq.heappop(self._heap)
+                self.running += 1
+                still_queued = [item[2] for item in self._heap]
+            for waiting in still_queued:
+                _notify_task(waiting, force=True)   # everyone behind moved up one
+            try:
+                task['status'] = 'starting'
+                task['message'] = 'Preparing…'
+                task['last_activity'] = time.time()
+                _notify_task(task)
+                target(task, *args)
+            except Exception as e:
+                task['status'] = 'error'
+                task['error'] = str(e)
+                task['message'] = 'Download failed — please try again.'
+                unreserve_download(task.get('_reservation'))
+            finally:
+                _release_inflight(task)
+                _notify_task(task)   # runners set done/error without notifying
+                with self._cond:
+                    self.running -= 1
+                    self.completed += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'running': self.running,
+                'queued': len(self._heap),
+                'max_queued': self.max_queued,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'fragment_budget': DOWNLOAD_FRAGMENT_BUDGET,
+            }
+
+
+_download_scheduler = _DownloadScheduler(DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_MAX)
+
+
+def _queue_full_response(task):
+    """Undo the reservation for a task the scheduler refused and build the 503."""
+    _release_inflight(task)
+    _cleanup_task(task['id'])
+    unreserve_download(task.get('_reservation'))
+    resp = jsonify({'error': 'Server is busy — too many downloads in progress. Please try again shortly.'})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = '30'
+    return resp
+
+
+def _progress_payload(task):
+    """status/progress/message for a task, with its live queue position when waiting."""
+    _sync_follower(task)
+    payload = {
+        'status': task['status'],
+        'progress': task['progress'],
+        'message': task['message'],
+    }
+    source = download_tasks.get(task.get('_leader_id')) or task
+    if source.get('_stream_path') and task['status'] != 'error':
+        payload['stream_url'] = f"/download_stream/{task['id']}"
+    if task.get('_stream_state'):
+        payload['stream_state'] = task['_stream_state']
+    if source.get('tracks'):
+        payload['tracks'] = [dict(entry) for entry in source['tracks']]
+    if source.get('processing'):
+        payload['processing'] = source['processing']
+    if source.get('transcode_wait') is not None:
+        encode = source.get('transcode_seconds', 0.0)
+        stream = source.get('stream_seconds', 0.0)
+        if source.get('_transcode_started'):
+            held = time.time() - source['_transcode_started']
+            if source.get('_transcode_streaming'):
+                stream += held
+            else:
+                encode += held
+        payload['transcode'] = {
+            'queue_wait_seconds': round(source['transcode_wait'], 2),
+            'encode_seconds': round(encode, 2),
+            'stream_seconds': round(stream, 2),
+        }
+    if task['status'] == 'queued':
+        position = _download_scheduler.position(task.get('_leader_id') or task['id'])
+        if position:
+            payload['queue_position'] = position
+            payload['message'] = f'Waiting in queue (position {position})…'
+    return payload
+
+
+# ── In-flight download deduplication (single-flight) ──────────────────────
+# A second request for the same (media ID, type, quality/format) while the
+# first is still running gets its own task — so reservations and serve counts
+# stay per user — that mirrors the leader's progress and, once the leader is
+# done, hard-links the leader's output instead of downloading it again.
+_ACTIVE_STATUSES = ('queued', 'starting', 'downloading', 'merging')
+_inflight_downloads = {}   # artifact key -> leader task id
+_inflight_lock = threading.Lock()
+
+
+def _attach_to_inflight(task):
+    """Make ``task`` follow a running identical job. Returns True when attached.
+
+    When nothing identical is running, ``task`` is registered as the leader
+    and False is returned so the caller schedules it.
+    """
+    key = task.get('_artifact_key')
+    if not key:
+        return False
+    with _inflight_lock:
+        leader = download_tasks.get(_inflight_downloads.get(key))
+        if leader is not None and leader['status'] in _ACTIVE_STATUSES:
+            task['_leader_id'] = leader['id']
+            task['status'] = leader['status']
+            task['progress'] = leader['progress']
+            task['message'] = leader['message']
+            return True
+        _inflight_downloads[key] = task['id']
+    return False
+
+
+def _release_inflight(task):
+    """Forget ``task`` as its key's leader once it has finished (or never ran).
+
+    Followers hold the leader's task ID and sync from ``download_tasks``, so
+    they are unaffected; a later identical request simply becomes a leader.
+    """
+    key = task.get('_artifact_key')
+    if not key:
+        return
+    with _inflight_lock:
+        if _inflight_downloads.get(key) == task['id']:
+            del _inflight_downloads[key]
+
+
+def _adopt_leader_file(task, leader):
+    """Hard-link the leader's finished file into the follower's own temp dir."""
+    src = leader.get('filepath')
+    if not src or not os.path.isfile(src):
+        return False
+    tmpdir = tempfile.mkdtemp()
+    dest = os.path.join(tmpdir, os.path.basename(src))
+    try:
+        _link_or_copy(src, dest)
+    except OSError:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        return False
+    task['tmpdir'] = tmpdir
+    task['filepath'] = dest
+    task['filename'] = leader['filename']
+    task['filesize'] = os.path.getsize(dest)
+    task['mime_type'] = leader['mime_type']
+    task['status'] = 'done'
+    task['progress'] = 100
+    task['message'] = 'Ready to download!'
+    return True
+
+
+def _sync_follower(task):
+    """Bring a follower task up to date with its leader.
+
+    Only the bookkeeping runs under ``_inflight_lock``.  Settling a finished
+    follower (cache lookup, hard link, quota release) touches the disk, so
+    the caller that claims it via ``_settling`` does it after the lock is
+    released; concurrent callers see the task still active until then.
+    """
+    if not task.get('_leader_id'):
+        return
+    with _inflight_lock:
+        if task['status'] not in _ACTIVE_STATUSES or task.get('_settling'):
+            return
+        leader = download_tasks.get(task['_leader_id'])
+        task['last_activity'] = time.time()
+        if leader is not None and leader['status'] in _ACTIVE_STATUSES:
+            task['status'] = leader['status']
+            task['progress'] = leader['progress']
+            task['message'] = leader['message']
+            return
+        task['_settling'] = True
+
+    try:
+        if leader is not None and leader['status'] in ('done', 'served'):
+            if _serve_from_artifact_cache(task) or _adopt_leader_file(task, leader):
+                return
+        task['status'] = 'error'
+        task['error'] = (leader or {}).get('error') or 'Shared download failed'
+        task['message'] = 'Download failed — please try again.'
+        unreserve_download(task.get('_reservation'))
+    finally:
+        task.pop('_settling', None)
 
 
 # ── API routes for task-based downloads ────────────────────────────────────
@@ -2072,10 +4662,40 @@ def download_start():
         return jsonify({'error': 'No URL provided'}), 400
 
     # Atomic check+reserve — no race condition possible
-    if not try_reserve_download():
-        return jsonify({'error': 'Daily download limit reached (100/day). Try again later.'}), 429
+    client_ip = _client_ip()
+    platform_id = 'spotify' if dl_type == 'spotify' else detect_platform(video_url)[0]
+    reservation = try_reserve_download(client_ip, platform_id)
+    if not reservation:
+        return jsonify({'error': _quota_exceeded_message(client_ip, platform_id)}), 429
 
     task = _make_task()
+    task['_reservation'] = reservation
+
+    spotify_kind, spotify_id = _extract_spotify_item(video_url) if platform_id == 'spotify' else (None, None)
+    if spotify_kind in ('album', 'playlist'):
+        task['_artifact_key'] = f"spotify-batch:{spotify_kind}:{spotify_id}:{audio_format.lower()}"
+        if _attach_to_inflight(task):
+            return jsonify({'task_id': task['id']})
+        if not _download_scheduler.submit(
+            task, PRIORITY_AUDIO, _run_spotify_batch, (spotify_kind, spotify_id, audio_format)
+        ):
+            return _queue_full_response(task)
+        return jsonify({'task_id': task['id']})
+
+    if dl_type == 'spotify':
+        spotify_key = _canonical_media_id(video_url) or (
+            'spotify-search:{}|{}|{}'.format(
+                data.get('track_artist', ''), data.get('track_title', ''), data.get('duration_ms', 0)
+            )
+        )
+        task['_artifact_key'] = f"spotify:{spotify_key}:{audio_format.lower()}:{AUDIO_BITRATE}"
+    elif dl_type == 'audio':
+        task['_artifact_key'] = f"audio:{_media_key(video_url)}:{audio_format.lower()}:{AUDIO_BITRATE}"
+    else:
+        task['_artifact_key'] = f"video:{_media_key(video_url)}:{quality}:mp4"
+
+    if _serve_from_artifact_cache(task):
+        return jsonify({'task_id': task['id']})
 
     if dl_type == 'spotify':
         # Spotify download: use metadata from request body
@@ -2094,35 +4714,61 @@ def download_start():
                 pass
 
         if not track_title or not track_artist or duration_ms <= 0:
-            unreserve_download()
+            _cleanup_task(task['id'])
+            unreserve_download(reservation)
             return jsonify({'error': 'Could not determine track metadata for Spotify download.'}), 400
 
-        t = threading.Thread(
-            target=_run_spotify_download,
-            args=(task, track_title, track_artist, duration_ms, audio_format),
-            daemon=True,
+        priority, target, args = (
+            PRIORITY_AUDIO, _run_spotify_download,
+            (track_title, track_artist, duration_ms, audio_format, None, _extract_spotify_track_id(video_url)),
         )
     elif dl_type == 'audio':
-        t = threading.Thread(
-            target=_run_audio_download,
-            args=(task, video_url, audio_format),
-            daemon=True,
-        )
+        priority, target, args = PRIORITY_AUDIO, _run_audio_download, (video_url, audio_format)
     else:
-        t = threading.Thread(
-            target=_run_video_download,
-            args=(task, video_url, quality),
-            daemon=True,
-        )
-    t.start()
+        priority, target, args = PRIORITY_VIDEO, _run_video_download, (video_url, quality)
+
+    # An identical job is already running — share it instead of starting another
+    if _attach_to_inflight(task):
+        return jsonify({'task_id': task['id']})
+
+    if not _download_scheduler.submit(task, priority, target, args):
+        return _queue_full_response(task)
 
     return jsonify({'task_id': task['id']})
 
 
+@app.route('/api/stats')
+def api_stats():
+    """Cache and scheduler counters for capacity sizing."""
+    return jsonify({
+        'resolve_cache': _resolve_cache.stats(),
+        'download_scheduler': _download_scheduler.stats(),
+        'artifact_cache': _artifact_cache.stats(),
+        'http': _http.stats(),
+        'avatar_cache': _avatar_cache.stats(),
+        'image_cache': _image_cache.stats(),
+        'spotify_records': _spotify_cache_stats(),
+        'spotify_tiers': _spotify_tiers.stats(),
+        'spotify_matches': _spotify_matches.stats(),
+        'processing': dict(_processing_counts),
+        'transcode': _transcode_slots.stats(),
+    })
+
+
+@app.route('/api/stats/player_clients')
+def api_player_client_stats():
+    """Per-client health on this node's egress IP (decayed success/block rates)."""
+    return jsonify({
+        'host': socket.gethostname(),
+        'clients': _client_scoreboard.stats(),
+        'winners': {p: c or 'default' for p, c in _winning_clients.items()},
+    })
+
+
 @app.route('/downloads_remaining')
 def api_downloads_remaining():
     """Return how many downloads are left in the 24-h window."""
-    return jsonify({'remaining': downloads_remaining(), 'limit': DAILY_DOWNLOAD_LIMIT})
+    return jsonify({'remaining': downloads_remaining(_client_ip()), 'limit': DAILY_DOWNLOAD_LIMIT})
 
 
 @app.route('/download_progress/<task_id>')
@@ -2131,17 +4777,88 @@ def download_progress(task_id):
     task = download_tasks.get(task_id)
     if not task:
         return jsonify({'status': 'error', 'message': 'Task not found'}), 404
-    return jsonify({
-        'status': task['status'],
-        'progress': task['progress'],
-        'message': task['message'],
-    })
+    return jsonify(_progress_payload(task))
+
+
+# Server-Sent Events push progress as it changes instead of being polled.
+# Bursts of hook updates are coalesced to at most SSE_MAX_EVENTS_PER_SEC.
+SSE_MAX_EVENTS_PER_SEC = float(os.environ.get('SSE_MAX_EVENTS_PER_SEC', 4))
+SSE_KEEPALIVE = 15            # seconds between comment lines on an idle stream
+SSE_MAX_STREAM_SECONDS = 300  # close long streams; the client falls back to polling
+
+# SSE and live download streams each pin a gthread worker thread for as long
+# as they are open, so together they are capped well below the Procfile's
+# --threads and short requests (resolve, polling, /download_file) always
+# find a free thread.  Over the cap an event stream gets a 503 and the page
+# polls instead; a refused live stream is marked aborted so the page fetches
+# /download_file once the task is done.
+SSE_MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS', 12))
+STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 8))
+_sse_slots = threading.BoundedSemaphore(max(SSE_MAX_CONNECTIONS, 1))
+_stream_slots = threading.BoundedSemaphore(max(STREAM_MAX_CONNECTIONS, 1))
+
+
+def _release_on_close(resp, slots):
+    """Give back one of ``slots`` when the server closes ``resp`` (done or disconnected)."""
+    resp.call_on_close(slots.release)
+    return resp
+
+
+@app.route('/download_events/<task_id>')
+def download_events(task_id):
+    """Stream live progress of a download task as Server-Sent Events."""
+    task = download_tasks.get(task_id)
+    if not task:
+        return jsonify({'status': 'error', 'message': 'Task not found'}), 404
+    if not _sse_slots.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'Too many event streams, poll instead'}), 503
+
+    def _stream():
+        min_gap = 1.0 / max(SSE_MAX_EVENTS_PER_SEC, 0.1)
+        opened_at = last_write = time.time()
+        last_sent_at = 0.0
+        last_payload = None
+        yield 'retry: 2000\n\n'
+        while time.time() - opened_at < SSE_MAX_STREAM_SECONDS:
+            # Followers mirror their leader, so wait on the leader's changes
+            source = download_tasks.get(task.get('_leader_id')) or task
+            seen = source.get('_version', 0)   # read before the payload so no change slips by
+            payload = _progress_payload(task)
+            now = time.time()
+            if payload != last_payload:
+                if now - last_sent_at < min_gap:
+                    # Coalesce: wait out the gap, then send whatever is latest
+                    time.sleep(min_gap - (now - last_sent_at))
+                    continue
+                yield f"data: {json.dumps(payload)}\n\n"
+                last_payload, last_sent_at, last_write = payload, now, now
+                if payload['status'] in ('done', 'served', 'error'):
+                    return
+            elif now - last_write >= SSE_KEEPALIVE:
+                yield ': keepalive\n\n'
+                last_write = now
+
+            # Sleep until _notify_task bumps the version, or a keep-alive is due
+            timeout = min(
+                SSE_KEEPALIVE - (time.time() - last_write),
+                SSE_MAX_STREAM_SECONDS - (time.time() - opened_at),
+            )
+            with source['_changed']:
+                source['_changed'].wait_for(lambda: source.get('_version', 0) != seen, timeout=max(timeout, 0.05))
+
+    return _release_on_close(Response(
+        stream_with_context(_stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    ), _sse_slots)
 
 
 @app.route('/download_file/<task_id>')
 def download_file(task_id):
     """Serve the finished file.  Temp dir is cleaned later by TTL."""
     task = download_tasks.get(task_id)
+    if task:
+        _sync_follower(task)
     if not task or task['status'] not in ('done', 'served'):
         return 'File not ready', 404
 
@@ -2166,62 +4883,524 @@ def download_file(task_id):
     )
 
 
+@app.route('/download_stream/<task_id>')
+def download_stream(task_id):
+    """Stream a progressive download to the client while it is still being written.
+
+    The open file descriptor survives yt-dlp's final ``.part`` rename, so the
+    reader simply drains it until the task is done.  If the download fails
+    mid-way the response is aborted so the browser marks it as failed.  The
+    outcome is kept in ``_stream_state`` so the page can fall back to
+    /download_file when the browser dropped the stream.
+    """
+    task = download_tasks.get(task_id)
+    if task:
+        _sync_follower(task)
+    if not task or task['status'] == 'error':
+        return 'File not ready', 404
+    source = download_tasks.get(task.get('_leader_id')) or task
+    path = source.get('_stream_path')
+    if not path:
+        if task['status'] in ('done', 'served'):
+            return redirect(url_for('download_file', task_id=task_id))
+        return 'Stream not ready', 404
+
+    serve_count = task.get('_serve_count', 0)
+    if serve_count >= 3:
+        return 'Download link expired', 410
+    if not _stream_slots.acquire(blocking=False):
+        if not task.get('_stream_state'):
+            task['_stream_state'] = 'aborted'   # the page fetches /download_file when done
+            _notify_task(task, force=True)
+        return 'Too many live downloads, the file will follow when ready', 503
+    try:
+        fh = open(path if os.path.exists(path) else source['filepath'], 'rb')
+    except (OSError, TypeError, KeyError):
+        _stream_slots.release()
+        return 'File no longer available', 410
+    task['_serve_count'] = serve_count + 1
+    task['last_activity'] = time.time()
+    task['_stream_state'] = 'streaming'
+
+    def _tail():
+        try:
+            with fh:
+                while True:
+                    chunk = fh.read(STREAM_CHUNK_SIZE)
+                    if chunk:
+                        yield chunk
+                        continue
+                    if source['status'] in ('done', 'served'):
+                        # Writer finished; drain whatever landed after the last read
+                        for rest in iter(lambda: fh.read(STREAM_CHUNK_SIZE), b''):
+                            yield rest
+                        task['_stream_state'] = 'complete'
+                        return
+                    if source['status'] == 'error' or source.get('_stream_path') != path:
+                        raise IOError('Download failed while streaming')
+                    with source['_changed']:
+                        source['_changed'].wait(timeout=0.25)
+        finally:
+            # Client disconnects surface here as GeneratorExit
+            if task.get('_stream_state') != 'complete':
+                task['_stream_state'] = 'aborted'
+            _notify_task(task, force=True)
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{source["_stream_name"]}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    }
+    if source.get('_stream_size'):
+        headers['Content-Length'] = str(source['_stream_size'])
+    return _release_on_close(
+        Response(_tail(), mimetype=source['_stream_mime'], headers=headers), _stream_slots
+    )
+
+
 # ── Image proxy  (Instagram CDN returns 403 to bare browser requests) ─────
 
+# ── Image proxy (streaming, on-disk cache, conditional requests) ───────────
+# Instagram/Facebook CDN images are relayed through /proxy_image.  Upstream
+# bytes are streamed to the client while being written to a URL-keyed disk
+# cache; later requests are served from disk with ETag / Last-Modified so
+# browsers revalidate with a 304.  Concurrent misses for the same image wait
+# for the first fetch instead of hitting the CDN again.
+IMAGE_CACHE_DIR = os.environ.get(
+    'IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'simple_downloader_images')
+)
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+IMAGE_MAX_BYTES = 10 * 1024 ** 2   # larger images are relayed but not cached
+IMAGE_MAX_AGE = 86400              # browser Cache-Control max-age
+IMAGE_FILL_WAIT = 15               # seconds a coalesced request waits for the leader
+IMAGE_CHUNK_SIZE = 64 * 1024
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+IMAGE_VARIANT_WAIT = 10            # seconds a request waits for a variant before serving the original
+IMAGE_VARIANT_TIMEOUT = 20         # hard cap on one ffmpeg run
+# Requested widths snap up to one of these so variants stay few and shareable
+_IMAGE_VARIANT_WIDTHS = (64, 96, 128, 160, 240, 320, 480, 640, 720, 960, 1280)
+# Only hosts a browser can't load directly (hotlink 403s, geo-blocks, expiring
+# links).  YouTube/Spotify/TikTok CDN images load fine from the page and are
+# served straight from their CDN rather than through a Flask worker.
+_PROXY_IMAGE_DOMAINS = ('cdninstagram.com', 'fbcdn.net')
+
+_IMAGE_UPSTREAM_HEADERS = (
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                      'AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/120.0.0.0 Safari/537.36',
+        'Referer': 'https://www.instagram.com/',
+        'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+    },
+    # Final fallback
+    {
+        'User-Agent': 'Mozilla/5.0',
+        'Referer': 'https://www.instagram.com/',
+        'Accept': 'image/*,*/*;q=0.8',
+    },
+)
+
+
+class _ImageCache:
+    """Size-bounded on-disk LRU of proxied images with single-flight fills."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fills = {}       # key -> threading.Event set when the fill ends
+        self._used = None      # bytes on disk, scanned lazily
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.evictions = 0
+        self.variants_built = 0
+        self.variant_failures = 0
+
+    def _paths(self, key):
+        base = os.path.join(self.root, hashlib.sha256(key.encode('utf-8')).hexdigest())
+        return base + '.img', base + '.json'
+
+    def get(self, key):
+        """Return ``(path, meta)`` for a cached image, or None."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            os.utime(data_path)   # bump LRU position
+        except (OSError, ValueError):
+            return None
+        return data_path, meta
+
+    def claim(self, key):
+        """Return ``(is_leader, event)``; followers wait on ``event``."""
+        with self._lock:
+            event = self._fills.get(key)
+            if event is not None:
+                self.coalesced += 1
+                return False, event
+            event = self._fills[key] = threading.Event()
+            return True, event
+
+    def release(self, key):
+        with self._lock:
+            event = self._fills.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def new_part_path(self, key):
+        os.makedirs(self.root, exist_ok=True)
+        return self._paths(key)[0] + f'.{uuid.uuid4().hex[:8]}.part'
+
+    def commit(self, key, part_path, meta):
+        """Move a fully written ``part_path`` into the cache and evict down to the budget."""
+        data_path, meta_path = self._paths(key)
+        try:
+            os.replace(part_path, data_path)
+            tmp_meta = meta_path + f'.{uuid.uuid4().hex[:8]}.tmp'
+            with open(tmp_meta, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except OSError:
+            return
+        with self._lock:
+            self.stores += 1
+            if self._used is not None:
+                self._used += meta.get('size', 0)
+            over = self._used is None or self._used > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        try:
+            entries = [e for e in os.scandir(self.root) if e.name.endswith('.img') and e.is_file()]
+            stats = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries)
+        except OSError:
+            return
+        total = sum(size for _, size, _ in stats)
+        evicted = 0
+        for _, size, path in stats:
+            if total <= self.max_bytes:
+                break
+            for p in (path, path[:-len('.img')] + '.json'):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._used = total
+            self.evictions += evicted
+
+    def count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'bytes_used': self._used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'coalesced': self.coalesced,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'variants_built': self.variants_built,
+                'variant_failures': self.variant_failures,
+                'in_flight': len(self._fills),
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_image_cache = _ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+
+def _open_image_upstream(img_url):
+    """Streaming 200 response for ``img_url``, trying each header set; None on failure."""
+    for headers in _IMAGE_UPSTREAM_HEADERS:
+        try:
+            resp = _http.get(img_url, headers=headers, timeout=10, stream=True, retry=True)
+        except Exception:
+            continue
+        if resp.status_code == 200:
+            return resp
+        resp.close()
+    return None
+
+
+def _upstream_etag(upstream):
+    etag = (upstream.headers.get('ETag') or '').strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag.strip('"')
+
+
+def _serve_cached_image(path, meta):
+    resp = send_file(
+        path,
+        mimetype=meta.get('content_type', 'image/jpeg'),
+        conditional=True,
+        etag=meta['etag'],
+        last_modified=meta.get('last_modified'),
+        max_age=IMAGE_MAX_AGE,
+    )
+    _image_cache.count('not_modified' if resp.status_code == 304 else 'hits')
+    return resp
+
+
+def _relay_image(key, upstream, store):
+    """Yield upstream chunks, writing them to the cache when ``store`` is set."""
+    part_path = _image_cache.new_part_path(key) if store else None
+    digest = hashlib.sha1()
+    size = 0
+    complete = False
+    out = open(part_path, 'wb') if part_path else None
+    try:
+        for chunk in upstream.iter_content(IMAGE_CHUNK_SIZE):
+            if not chunk:
+                continue
+            size += len(chunk)
+            if out is not None:
+                if size > IMAGE_MAX_BYTES:
+                    out.close()
+                    os.remove(part_path)
+                    out = None
+                else:
+                    out.write(chunk)
+                    digest.update(chunk)
+            yield chunk
+        complete = True
+    finally:
+        upstream.close()
+        if out is not None:
+            out.close()
+            if complete:
+                _image_cache.commit(key, part_path, {
+                    'content_type': upstream.headers.get('Content-Type', 'image/jpeg'),
+                    'etag': _upstream_etag(upstream) or digest.hexdigest(),
+                    'last_modified': time.time(),
+                    'size': size,
+                })
+            else:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+        if store:
+            _image_cache.release(key)
+
+
+# ── Image variants (resized WebP/AVIF via ffmpeg) ──
+# ``/proxy_image?url=…&w=320&fmt=auto`` returns a downscaled re-encode of the
+# cached original.  Encoding runs on a small pool, one job per variant; a
+# request that can't get its variant in time is served the original instead.
+_image_variant_pool = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS, thread_name_prefix='imgvariant')
+_variant_jobs = {}   # variant key -> Future
+_variant_jobs_lock = threading.Lock()
+_ffmpeg_encoders = None
+
+# fmt -> (ffmpeg encoder, codec args, muxer, mime type)
+_IMAGE_VARIANT_CODECS = {
+    'avif': ('libaom-av1', ['-still-picture', '1', '-crf', '35', '-cpu-used', '6'], 'avif', 'image/avif'),
+    'webp': ('libwebp', ['-quality', '75', '-compression_level', '4'], 'webp', 'image/webp'),
+    'jpeg': ('mjpeg', ['-q:v', '4'], 'mjpeg', 'image/jpeg'),
+}
+
+
+def _image_encoder_available(fmt):
+    """Whether the local ffmpeg build can encode ``fmt`` (checked once)."""
+    global _ffmpeg_encoders
+    if not HAS_FFMPEG or fmt not in _IMAGE_VARIANT_CODECS:
+        return False
+    if _ffmpeg_encoders is None:
+        try:
+            out = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True, timeout=10
+            ).stdout
+            _ffmpeg_encoders = {line.split()[1] for line in out.splitlines() if len(line.split()) > 1}
+        except (OSError, subprocess.SubprocessError):
+            _ffmpeg_encoders = set()
+    return _IMAGE_VARIANT_CODECS[fmt][0] in _ffmpeg_encoders
+
+
+def _pick_variant_format(fmt):
+    """Resolve the ``fmt`` query value (``auto`` uses the Accept header) to a codec key, or None."""
+    fmt = (fmt or 'auto').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt != 'auto':
+        return fmt if _image_encoder_available(fmt) else None
+    accept = request.headers.get('Accept', '')
+    for candidate in ('avif', 'webp'):
+        if f'image/{candidate}' in accept and _image_encoder_available(candidate):
+            return candidate
+    return 'jpeg' if _image_encoder_available('jpeg') else None
+
+
+def _snap_variant_width(raw):
+    try:
+        width = int(raw)
+    except (TypeError, ValueError):
+        return None
+    if width <= 0:
+        return None
+    return next((w for w in _IMAGE_VARIANT_WIDTHS if w >= width), _IMAGE_VARIANT_WIDTHS[-1])
+
+
+def _ensure_cached_image(img_url):
+    """``(path, meta)`` of the original image, fetching it into the cache if needed."""
+    cached = _image_cache.get(img_url)
+    if cached:
+        return cached
+    leader, done = _image_cache.claim(img_url)
+    if not leader:
+        done.wait(IMAGE_FILL_WAIT)
+        return _image_cache.get(img_url)
+    upstream = _open_image_upstream(img_url)
+    if upstream is None:
+        _image_cache.release(img_url)
+        return None
+    for _ in _relay_image(img_url, upstream, store=True):
+        pass
+    return _image_cache.get(img_url)
+
+
+def _build_image_variant(img_url, variant_key, width, fmt):
+    """Encode and cache one variant; returns ``(path, meta)`` or None."""
+    original = _ensure_cached_image(img_url)
+    if not original:
+        return None
+    encoder, codec_args, muxer, mime = _IMAGE_VARIANT_CODECS[fmt]
+    part_path = _image_cache.new_part_path(variant_key)
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', original[0],
+        '-vf', f"scale='min({width},iw)':-2" if width else 'null',
+        '-frames:v', '1', '-c:v', encoder, *codec_args, '-threads', str(TRANSCODE_THREADS),
+        '-f', muxer, part_path,
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, timeout=IMAGE_VARIANT_TIMEOUT, check=True)
+        with open(part_path, 'rb') as f:
+            data = f.read()
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Image variant {fmt}/{width} failed: {e}")
+        _image_cache.count('variant_failures')
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return None
+    _image_cache.commit(variant_key, part_path, {
+        'content_type': mime,
+        'etag': hashlib.sha1(data).hexdigest(),
+        'last_modified': time.time(),
+        'size': len(data),
+    })
+    _image_cache.count('variants_built')
+    return _image_cache.get(variant_key)
+
+
+def _image_variant(img_url, width, fmt):
+    """Cached variant, building it on the pool (single-flight); None to fall back to the original."""
+    variant_key = f'{img_url}#w={width or 0}&fmt={fmt}'
+    cached = _image_cache.get(variant_key)
+    if cached:
+        return cached
+    with _variant_jobs_lock:
+        future = _variant_jobs.get(variant_key)
+        if future is None:
+            future = _image_variant_pool.submit(_build_image_variant, img_url, variant_key, width, fmt)
+            _variant_jobs[variant_key] = future
+
+            def _forget(_f, key=variant_key):
+                with _variant_jobs_lock:
+                    _variant_jobs.pop(key, None)
+
+            future.add_done_callback(_forget)
+    try:
+        return future.result(timeout=IMAGE_VARIANT_WAIT)
+    except Exception:
+        return None
+
+
+@app.template_filter('sized_image')
+def _sized_image_url(url, width, fmt='auto'):
+    """Point ``url`` at a resized /proxy_image variant when it is proxied anyway.
+
+    Other hosts are returned untouched and load straight from their CDN.
+    """
+    if not url:
+        return url
+    if url.startswith('/proxy_image'):
+        return f'{url}&w={width}&fmt={fmt}'
+    host = urlparse(url).hostname or ''
+    if any(host.endswith('.' + domain) for domain in _PROXY_IMAGE_DOMAINS):
+        from urllib.parse import quote as _url_quote
+        return f"/proxy_image?url={_url_quote(url, safe='')}&w={width}&fmt={fmt}"
+    return url
+
+
 @app.route('/proxy_image')
 def proxy_image():
-    """Proxy an external image through this server."""
-    from urllib.parse import urlparse
-
+    """Proxy an external image through this server (``w``/``fmt`` for a resized re-encode)."""
     img_url = request.args.get('url', '')
     if not img_url:
         return '', 204
 
     host = urlparse(img_url).hostname or ''
-    allowed = host.endswith('.cdninstagram.com') or host.endswith('.fbcdn.net')
+    allowed = any(host.endswith('.' + domain) for domain in _PROXY_IMAGE_DOMAINS)
     if not allowed:
         return '', 403
 
-    try:
-        resp = requests.get(
-            img_url,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                              'AppleWebKit/537.36 (KHTML, like Gecko) '
-                              'Chrome/120.0.0.0 Safari/537.36',
-                'Referer': 'https://www.instagram.com/',
-                'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
-            },
-            timeout=10,
-        )
-        if resp.status_code == 200:
-            ct = resp.headers.get('Content-Type', 'image/jpeg')
-            return Response(
-                resp.content,
-                content_type=ct,
-                headers={'Cache-Control': 'public, max-age=86400'},
-            )
-    except Exception:
-        pass
-
-    # Final fallback
-    try:
-        resp = requests.get(
-            img_url,
-            headers={
-                'User-Agent': 'Mozilla/5.0',
-                'Referer': 'https://www.instagram.com/',
-                'Accept': 'image/*,*/*;q=0.8',
-            },
-            timeout=10,
-        )
-        if resp.status_code == 200:
-            ct = resp.headers.get('Content-Type', 'image/jpeg')
-            return Response(resp.content, content_type=ct)
-    except:
-        pass
-
-    return '', 502
+    width = _snap_variant_width(request.args.get('w'))
+    if width or request.args.get('fmt'):
+        fmt = _pick_variant_format(request.args.get('fmt'))
+        variant = _image_variant(img_url, width, fmt) if fmt else None
+        if variant:
+            resp = _serve_cached_image(*variant)
+            if (request.args.get('fmt') or 'auto').lower() == 'auto':
+                resp.vary.add('Accept')
+            return resp
+
+    cached = _image_cache.get(img_url)
+    if cached:
+        return _serve_cached_image(*cached)
+
+    leader, done = _image_cache.claim(img_url)
+    if not leader:
+        done.wait(IMAGE_FILL_WAIT)
+        cached = _image_cache.get(img_url)
+        if cached:
+            return _serve_cached_image(*cached)
+        # Leader failed or is too slow — relay directly, without caching
+
+    _image_cache.count('misses')
+    upstream = _open_image_upstream(img_url)
+    if upstream is None:
+        if leader:
+            _image_cache.release(img_url)
+        return '', 502
+
+    headers = {'Cache-Control': f'public, max-age={IMAGE_MAX_AGE}'}
+    if upstream.headers.get('Content-Length') and not upstream.headers.get('Content-Encoding'):
+        headers['Content-Length'] = upstream.headers['Content-Length']
+    resp = Response(
+        _relay_image(img_url, upstream, store=leader),
+        content_type=upstream.headers.get('Content-Type', 'image/jpeg'),
+        headers=headers,
+    )
+    # The generator's cleanup never runs if the client leaves before the first chunk
+    resp.call_on_close(upstream.close)
+    if leader:
+        resp.call_on_close(lambda: _image_cache.release(img_url))
+    return resp
 
 
 # ── Public API: YouTube Audio (.mp3) ───────────────────────────────────────
@@ -2256,8 +5435,10 @@ def api_youtube_audio():
     if not _is_youtube_url(video_url):
         return jsonify({'error': 'Only YouTube URLs are supported by this endpoint.'}), 400
 
-    if not try_reserve_download():
-        return jsonify({'error': 'Daily download limit reached (100/day). Try again later.'}), 429
+    client_ip = _client_ip()
+    reservation = try_reserve_download(client_ip, 'youtube')
+    if not reservation:
+        return jsonify({'error': _quota_exceeded_message(client_ip, 'youtube')}), 429
 
     # Quick metadata extraction so the caller gets title/duration right away
     meta = {}
@@ -2271,13 +5452,14 @@ def api_youtube_audio():
         pass  # non-fatal — download can still proceed
 
     task = _make_task()
+    task['_reservation'] = reservation
+    task['_artifact_key'] = f"audio:{_media_key(video_url)}:mp3:{AUDIO_BITRATE}"
 
-    t = threading.Thread(
-        target=_run_audio_download,
-        args=(task, video_url, 'mp3'),
-        daemon=True,
-    )
-    t.start()
+    if _serve_from_artifact_cache(task) or _attach_to_inflight(task):
+        return jsonify({'task_id': task['id'], **meta})
+
+    if not _download_scheduler.submit(task, PRIORITY_AUDIO, _run_audio_download, (video_url, 'mp3')):
+        return _queue_full_response(task)
 
     return jsonify({
         'task_id': task['id'],
@@ -2296,11 +5478,7 @@ def api_youtube_audio_status(task_id):
     if not task:
         return jsonify({'error': 'Task not found'}), 404
 
-    payload = {
-        'status': task['status'],
-        'progress': task['progress'],
-        'message': task['message'],
-    }
+    payload = _progress_payload(task)
     if task['status'] == 'done':
         payload['download_url'] = f'/api/youtube/audio/download/{task_id}'
         payload['filename'] = task.get('filename')
@@ -2315,6 +5493,8 @@ def api_youtube_audio_status(task_id):
 def api_youtube_audio_download(task_id):
     """Serve the finished .mp3 file."""
     task = download_tasks.get(task_id)
+    if task:
+        _sync_follower(task)
     if not task or task['status'] not in ('done', 'served'):
         return jsonify({'error': 'File not ready or task not found'}), 404
 
@@ -2368,9 +5548,10 @@ def get_formats():
     last_error = None
     for attempt in range(3):
         try:
-            _chosen_client = random.choice(_YT_PLAYER_CLIENTS[:5])
+            _chosen_client = _client_scoreboard.choose()
             ydl_opts = _yt_dlp_base_opts(_chosen_client)
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with _client_scoreboard.track(_chosen_client, video_url), \
+                    yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(video_url, download=False)
                 formats = info.get('formats', [])
                 video_fmts = [f for f in formats if f.get('vcodec') != 'none' and f.get('height')]
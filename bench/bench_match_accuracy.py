@@ -0,0 +1,226 @@
+"""Offline accuracy and speed suite for the Spotify → YouTube matcher.
+
+Replays the synthetic ``extract_flat`` search entries in
+``fixtures/spotify_search.json`` (hand-written, not recorded — see its
+``note``) through ``_find_spotify_candidates`` with ``_flat_search``
+answered from the fixture (no network), and compares the top pick with each
+track's ground-truth IDs (every upload of the right recording; an empty list
+means no correct upload exists).  Each configuration in CONFIGS is scored
+twice: ``matcher`` with the plain-query fallbacks switched off, so it shows
+what the thresholds themselves accept, and ``pipeline`` as shipped.  The
+``current`` one is checked against ``fixtures/match_baseline.json``; speed is
+checked as the speed-up over the legacy scorer measured in the same run, so
+the gate doesn't depend on the machine.  Exits non-zero on a regression.
+
+    python bench/bench_match_accuracy.py [--rounds N] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import app  # noqa: E402
+from bench_matcher import legacy_score  # noqa: E402
+
+FIXTURES = os.path.join(HERE, 'fixtures', 'spotify_search.json')
+BASELINE = os.path.join(HERE, 'fixtures', 'match_baseline.json')
+
+# Threshold configurations to compare; ``current`` is whatever app.py ships with.
+CONFIGS = {
+    'current': {},
+    'strict': {
+        'SPOTIFY_MIN_ARTIST_COVERAGE': 0.5, 'SPOTIFY_MIN_TITLE_SIMILARITY': 0.7,
+    },
+    'loose': {
+        'SPOTIFY_MIN_ARTIST_COVERAGE': 0.2, 'SPOTIFY_MIN_TITLE_SIMILARITY': 0.45,
+    },
+    'wide-duration': {
+        'SPOTIFY_MATCH_TOLERANCES': {'audio': 4, 'lyrics': 6, 'soundcloud': 8, 'relaxed': 20},
+    },
+}
+
+
+def _load_cases():
+    with open(FIXTURES, encoding='utf-8') as f:
+        return json.load(f)['cases']
+
+
+def _strategy(query):
+    """Which recorded search a ``_find_spotify_candidates`` query corresponds to."""
+    if query.startswith('scsearch'):
+        return 'soundcloud'
+    if query.endswith(' audio'):
+        return 'audio'
+    if query.endswith(' lyrics'):
+        return 'lyrics'
+    return 'plain'
+
+
+def _fake_task():
+    return {'status': 'downloading', 'progress': 0, 'message': '', '_changed': threading.Condition()}
+
+
+def _run_case(case, fallback):
+    """``(picked_id, seconds)`` for one track replayed through the pipeline.
+
+    Without ``fallback`` the plain query comes back empty, so only candidates
+    the matcher accepted from the scored strategies can be picked.
+    """
+    searches = case['searches']
+    ids = {e['url']: e['id'] for group in searches.values() for e in group}
+
+    def _search(query, extra_opts=None):
+        strategy = _strategy(query)
+        if strategy == 'plain' and not fallback:
+            return []
+        return list(searches.get(strategy, []))
+
+    app._flat_search = _search
+    t = case['track']
+    artists = t['artists']
+    start = time.perf_counter()
+    ranked = app._find_spotify_candidates(
+        _fake_task(), t['title'], ', '.join(artists), artists, t['duration_ms'] / 1000
+    )
+    elapsed = time.perf_counter() - start
+    picked = ids.get(ranked[0][1], ranked[0][1]) if ranked else None
+    return picked, elapsed
+
+
+def _evaluate(cases, rounds, verbose, fallback=True):
+    correct = wrong = missed = 0
+    latencies = []
+    for case in cases:
+        picks = []
+        for _ in range(rounds):
+            picked, elapsed = _run_case(case, fallback)
+            picks.append(picked)
+            latencies.append(elapsed)
+        picked = picks[-1]
+        expected = case['expected_ids']
+        if picked is None:
+            missed += bool(expected)
+        elif picked in expected:
+            correct += 1
+        else:
+            wrong += 1
+            if verbose:
+                print(f"    wrong: {case['track']['title']!r} picked {picked}, expected one of {expected}")
+    with_truth = sum(1 for c in cases if c['expected_ids'])
+    picked_total = correct + wrong
+    return {
+        'precision': correct / picked_total if picked_total else 1.0,
+        'recall': correct / with_truth if with_truth else 1.0,
+        'wrong_rate': wrong / len(cases),
+        'missed': missed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def _scorer_us(cases, rounds):
+    """Mean cost per candidate of ``(legacy scorer, _SpotifyMatcher)``, in microseconds."""
+    work = [
+        (c['track'], [e for group in c['searches'].values() for e in group]) for c in cases
+    ]
+    n = sum(len(entries) for _, entries in work) * rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t, entries in work:
+            for e in entries:
+                legacy_score(t['title'], t['artists'], t['duration_ms'] // 1000, e)
+    legacy_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t, entries in work:
+            app._SpotifyMatcher(t['title'], t['artists'], t['duration_ms'] // 1000).score_many(entries)
+    return legacy_us, (time.perf_counter() - start) / n * 1e6
+
+
+def _with_config(overrides, fn):
+    saved = {name: getattr(app, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(app, name, value)
+        return fn()
+    finally:
+        for name, value in saved.items():
+            setattr(app, name, value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5, help='replays per track (latency samples)')
+    parser.add_argument('--update-baseline', action='store_true', help='record the current config as the baseline')
+    parser.add_argument('--speed-slack', type=float, default=1.5,
+                        help='allowed drop factor of the speed-up over the legacy scorer vs the baseline')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    cases = _load_cases()
+    # Offline: the CLI fallback would shell out to yt-dlp
+    app._yt_dlp_cli_search = lambda *a, **kw: []
+
+    print(f"{len(cases)} tracks, {args.rounds} rounds")
+    print(f"{'config':<14} {'stage':<9} {'precision':>9} {'recall':>7} {'wrong':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    results = {}
+    for name, overrides in CONFIGS.items():
+        for stage, fallback in (('matcher', False), ('pipeline', True)):
+            if args.verbose:
+                print(f"  {name} / {stage}:")
+            r = _with_config(overrides, lambda: _evaluate(cases, args.rounds, args.verbose, fallback))
+            results[name, stage] = r
+            print(f"{name:<14} {stage:<9} {r['precision']:9.2%} {r['recall']:7.2%} {r['wrong_rate']:6.2%} "
+                  f"{r['p50_ms']:7.2f} {r['p95_ms']:7.2f}")
+
+    legacy_us, scorer_us = _scorer_us(cases, 100)
+    matcher, pipeline = results['current', 'matcher'], results['current', 'pipeline']
+    current = {
+        'matcher_precision': matcher['precision'],
+        'matcher_recall': matcher['recall'],
+        'precision': pipeline['precision'],
+        'recall': pipeline['recall'],
+        'wrong_rate': pipeline['wrong_rate'],
+        'speedup': legacy_us / scorer_us,
+    }
+    print(f"scorer: {scorer_us:.2f} us/candidate, legacy {legacy_us:.2f} us ({current['speedup']:.1f}x)")
+
+    if args.update_baseline:
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump({k: round(v, 4) for k, v in current.items()}, f, indent=1)
+            f.write('\n')
+        print(f"baseline written to {os.path.relpath(BASELINE)}")
+        return 0
+
+    try:
+        with open(BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print('no baseline yet; run with --update-baseline')
+        return 0
+
+    eps = 1e-4   # baseline values are rounded
+    failures = []
+    for key in ('matcher_precision', 'matcher_recall', 'precision', 'recall'):
+        if current[key] < baseline[key] - eps:
+            failures.append(f"{key} {current[key]:.2%} < baseline {baseline[key]:.2%}")
+    if current['wrong_rate'] > baseline['wrong_rate'] + eps:
+        failures.append(f"wrong-match rate {current['wrong_rate']:.2%} > baseline {baseline['wrong_rate']:.2%}")
+    if current['speedup'] < baseline['speedup'] / args.speed_slack:
+        failures.append(
+            f"scorer speed-up {current['speedup']:.1f}x over legacy < baseline {baseline['speedup']:.1f}x"
+            f" / {args.speed_slack}"
+        )
+    for msg in failures:
+        print(f"REGRESSION: {msg}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
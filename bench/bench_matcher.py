@@ -0,0 +1,107 @@
+"""Micro-benchmark for Spotify → YouTube candidate scoring.
+
+Replays the synthetic search entries in ``fixtures/spotify_search.json``
+through the legacy SequenceMatcher scorer and through ``_SpotifyMatcher``,
+and reports per-candidate cost plus how often the two agree.
+
+    python bench/bench_matcher.py [--rounds N]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'spotify_search.json')
+
+
+def legacy_score(track_title, track_artists, target_dur_s, candidate, tolerance=5):
+    """The scorer as it was before _SpotifyMatcher, kept here as the reference."""
+    title = (candidate.get("title") or "").strip()
+    uploader = (candidate.get("uploader") or candidate.get("channel") or "").strip()
+    duration = candidate.get("duration")
+    url = candidate.get("webpage_url") or candidate.get("url")
+    if not title or not url:
+        return None
+    if duration is None:
+        duration = target_dur_s
+    duration_diff = abs(int(duration) - target_dur_s)
+    if duration_diff > tolerance:
+        return None
+    combined_text = f"{title} {uploader}"
+    norm = app._normalize_text(combined_text)
+    for hint in app.EXCLUDED_HINTS:
+        if re.search(r"(?:^|\s)" + re.escape(hint) + r"(?:\s|$)", norm):
+            return None
+    title_similarity = SequenceMatcher(None, app._normalize_text(track_title), app._normalize_text(title)).ratio()
+    artist_cov = app._artist_coverage(list(track_artists), combined_text)
+    if artist_cov < 0.35 and title_similarity < 0.9:
+        return None
+    if title_similarity < 0.55:
+        return None
+    duration_score = 1.0 - (duration_diff / max(tolerance, 1))
+    score = (title_similarity * 0.60) + (artist_cov * 0.30) + (duration_score * 0.10) + 0.03
+    return score, duration_diff
+
+
+def _cases():
+    with open(FIXTURES, encoding='utf-8') as f:
+        for case in json.load(f)['cases']:
+            t = case['track']
+            entries = [e for group in case['searches'].values() for e in group]
+            yield t['title'], t['artists'], t['duration_ms'] // 1000, entries
+
+
+def _top(results, entries):
+    best = max(((r[0], e['url']) for r, e in zip(results, entries) if r), default=None)
+    return best[1] if best else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--tolerance', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = list(_cases())
+    n_candidates = sum(len(c[3]) for c in cases)
+    tol = args.tolerance
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for title, artists, dur, entries in cases:
+            for e in entries:
+                legacy_score(title, artists, dur, e, tol)
+    legacy_us = (time.perf_counter() - start) / (args.rounds * n_candidates) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for title, artists, dur, entries in cases:
+            app._SpotifyMatcher(title, artists, dur).score_many(entries, tol)
+    matcher_us = (time.perf_counter() - start) / (args.rounds * n_candidates) * 1e6
+
+    accept_agree = top_agree = 0
+    for title, artists, dur, entries in cases:
+        old = [legacy_score(title, artists, dur, e, tol) for e in entries]
+        new = app._SpotifyMatcher(title, artists, dur).score_many(entries, tol)
+        accept_agree += sum(1 for a, b in zip(old, new) if bool(a) == bool(b))
+        if _top(old, entries) == _top(new, entries):
+            top_agree += 1
+        else:
+            print(f"  top pick differs for {title!r}: {_top(old, entries)} -> {_top(new, entries)}")
+
+    print(f"cases={len(cases)} candidates={n_candidates} rounds={args.rounds} tolerance={tol}")
+    print(f"legacy   {legacy_us:8.2f} us/candidate")
+    print(f"matcher  {matcher_us:8.2f} us/candidate  ({legacy_us / matcher_us:.1f}x)")
+    print(f"accept/reject agreement {accept_agree}/{n_candidates}")
+    print(f"top-pick agreement      {top_agree}/{len(cases)}")
+
+
+if __name__ == '__main__':
+    main()
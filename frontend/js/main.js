@@ -172,6 +172,9 @@ function renderVideoCard(info, originalUrl) {
         window._spotifyTrackTitle = info.title || '';
         window._spotifyTrackArtist = info.uploader || '';
         window._spotifyDurationMs = info.duration_ms || 0;
+        // Albums and playlists download as one ZIP of every track
+        const isCollection = ['album', 'playlist'].includes(info.spotify_type);
+        const zipNote = isCollection ? ' (ZIP)' : '';
 
         downloadOptionsHtml = `
         <div class="download-options" id="spotifyDownloadOptions"
@@ -181,16 +184,16 @@ function renderVideoCard(info, originalUrl) {
              data-artist="${escapeHtml(info.uploader || '')}" 
              data-duration-ms="${info.duration_ms || 0}">
             <div class="download-section" style="grid-column: 1 / -1;">
-                <div class="download-section-title">🎵 Spotify Audio Download</div>
+                <div class="download-section-title">🎵 Spotify ${isCollection ? 'Batch' : 'Audio'} Download</div>
                 <div class="download-btn-group">
                     <a href="#" onclick="startSpotifyDownload('mp3'); return false;" class="btn-small btn-audio"
                         style="background: linear-gradient(135deg, #1DB954, #1ed760); color: white;">
-                        Download MP3
+                        Download MP3${zipNote}
                         <span class="quality-label">.mp3</span>
                     </a>
                     <a href="#" onclick="startSpotifyDownload('wav'); return false;"
                         class="btn-small btn-audio">
-                        Download WAV
+                        Download WAV${zipNote}
                         <span class="quality-label">.wav</span>
                     </a>
                 </div>
@@ -238,16 +241,9 @@ function renderVideoCard(info, originalUrl) {
     }
 
     // Proxy images logic
-    // If the image url is relative (starts with /proxy_image), prepend API_BASE_URL
-    let thumbnail = info.thumbnail;
-    let artistImage = info.artist_image;
-
-    if (thumbnail && thumbnail.startsWith('/proxy_image')) {
-        thumbnail = API_BASE_URL + thumbnail;
-    }
-    if (artistImage && artistImage.startsWith('/proxy_image')) {
-        artistImage = API_BASE_URL + artistImage;
-    }
+    // Proxied (Meta CDN) card images are requested as resized WebP/AVIF variants
+    let thumbnail = sizedImage(info.thumbnail, 720);
+    let artistImage = sizedImage(info.artist_image, 112);
 
     const cardHtml = `
     <div class="video-card">
@@ -278,6 +274,51 @@ function renderVideoCard(info, originalUrl) {
     </div>`;
 
     container.innerHTML = cardHtml;
+
+    if (info.enrich_id && !artistImage) {
+        loadLateAvatar(info.enrich_id, container.querySelector('.channel-avatar'));
+    }
+}
+
+/* Hosts that must go through /proxy_image; keep in sync with _PROXY_IMAGE_DOMAINS */
+const PROXY_IMAGE_DOMAINS = ['cdninstagram.com', 'fbcdn.net'];
+
+/* Resized variant URL for a proxied image; other CDNs are loaded directly */
+function sizedImage(url, width) {
+    if (!url) return url;
+    if (url.startsWith('/proxy_image')) {
+        return `${API_BASE_URL}${url}&w=${width}&fmt=auto`;
+    }
+    let host = '';
+    try {
+        host = new URL(url).hostname;
+    } catch (e) {
+        return url;
+    }
+    if (PROXY_IMAGE_DOMAINS.some(domain => host.endsWith('.' + domain))) {
+        return `${API_BASE_URL}/proxy_image?url=${encodeURIComponent(url)}&w=${width}&fmt=auto`;
+    }
+    return url;
+}
+
+/* Avatar lookups that missed the resolve deadline are fetched afterwards */
+function loadLateAvatar(enrichId, avatarEl) {
+    fetch(`${API_BASE_URL}/api/resolve/${enrichId}/enrich`)
+        .then(response => response.ok ? response.json() : null)
+        .then(data => {
+            if (!data || !data.artist_image || !avatarEl) return;
+            const src = sizedImage(data.artist_image, 112);
+            const img = document.createElement('img');
+            img.alt = 'Avatar';
+            img.src = src;
+            img.onload = function () {
+                const fallback = avatarEl.querySelector('span');
+                if (fallback) fallback.style.display = 'none';
+            };
+            img.onerror = function () { img.remove(); };
+            avatarEl.prepend(img);
+        })
+        .catch(() => { /* avatar is cosmetic */ });
 }
 
 function escapeHtml(text) {
@@ -313,7 +354,7 @@ function startDownload(url, type, quality, fmt) {
                 return;
             }
             updateDlCounter();
-            pollProgress(data.task_id);
+            watchProgress(data.task_id);
         })
         .catch(err => {
             handleDownloadError('Failed to start download.');
@@ -354,7 +395,7 @@ function startSpotifyDownload(fmt) {
                 return;
             }
             updateDlCounter();
-            pollProgress(data.task_id);
+            watchProgress(data.task_id);
         })
         .catch(function () {
             handleDownloadError('Failed to start Spotify download.');
@@ -410,8 +451,10 @@ function handleDownloadError(message) {
 }
 
 
-async function triggerFileDownload(taskId) {
-    const downloadUrl = `${API_BASE_URL}/download_file/${encodeURIComponent(taskId)}?t=${Date.now()}`;
+async function triggerFileDownload(taskId, path) {
+    const downloadUrl = path
+        ? `${API_BASE_URL}${path}?t=${Date.now()}`
+        : `${API_BASE_URL}/download_file/${encodeURIComponent(taskId)}?t=${Date.now()}`;
 
     // Use a hidden iframe so the browser streams directly to disk.
     // This avoids loading large files fully into JS memory via fetch+blob.
@@ -433,7 +476,7 @@ async function triggerFileDownload(taskId) {
     }, 120000);
 }
 
-function pollProgress(taskId) {
+function createProgressHandler(taskId) {
     const overlay = document.getElementById('dlProgressOverlay');
     const bar = document.getElementById('dlBar');
     const percent = document.getElementById('dlPercent');
@@ -442,58 +485,108 @@ function pollProgress(taskId) {
     const stepMrg = document.getElementById('stepMerge');
     const stepDone = document.getElementById('stepDone');
 
-    let pollInFlight = false;
     let finalizeStarted = false;
+    let streamStarted = false;
+
+    // Apply one progress update; returns true once the task is finished.
+    return function (data) {
+        if (finalizeStarted) return true;
+
+        const pct = data.progress || 0;
+        bar.style.width = pct + '%';
+        percent.textContent = pct + '%';
+        msg.textContent = data.message || '';
+
+        // Progressive formats can be saved while the server is still downloading
+        if (data.stream_url && !streamStarted && data.status !== 'done' && data.status !== 'served') {
+            streamStarted = true;
+            triggerFileDownload(taskId, data.stream_url);
+        }
+
+        if (data.status === 'downloading') {
+            stepDl.className = 'dl-step active';
+            stepMrg.className = 'dl-step';
+            stepDone.className = 'dl-step';
+        } else if (data.status === 'merging') {
+            stepDl.className = 'dl-step completed';
+            stepMrg.className = 'dl-step active';
+            stepDone.className = 'dl-step';
+        } else if (data.status === 'done' || data.status === 'served') {
+            finalizeStarted = true;
+            bar.style.width = '100%';
+            percent.textContent = '100%';
+            stepDl.className = 'dl-step completed';
+            stepMrg.className = 'dl-step completed';
+            stepDone.className = 'dl-step active';
+            msg.textContent = 'Ready!';
+
+            // A dropped stream (tab closed the connection, network blip) still
+            // leaves the finished file on the server, so fetch that instead.
+            if (streamStarted && data.stream_state !== 'aborted') {
+                setTimeout(function () { overlay.classList.remove('active'); }, 1200);
+                return true;
+            }
+
+            setTimeout(function () {
+                triggerFileDownload(taskId)
+                    .then(function () {
+                        setTimeout(function () {
+                            overlay.classList.remove('active');
+                        }, 1200);
+                    })
+                    .catch(function (err) {
+                        msg.textContent = err && err.message ? err.message : 'Download failed.';
+                        msg.classList.add('dl-progress-error');
+                        setTimeout(function () { overlay.classList.remove('active'); }, 3500);
+                    });
+            }, 500);
+        } else if (data.status === 'error') {
+            finalizeStarted = true;
+            msg.textContent = data.message || 'Download failed.';
+            msg.classList.add('dl-progress-error');
+            setTimeout(function () { overlay.classList.remove('active'); }, 4000);
+        }
+        return finalizeStarted;
+    };
+}
+
+// Prefer the pushed event stream; fall back to polling if it is unavailable.
+function watchProgress(taskId) {
+    if (!window.EventSource) {
+        pollProgress(taskId);
+        return;
+    }
+    const handle = createProgressHandler(taskId);
+    let finished = false;
+    const source = new EventSource(`${API_BASE_URL}/download_events/${encodeURIComponent(taskId)}`);
+
+    source.onmessage = function (e) {
+        if (handle(JSON.parse(e.data))) {
+            finished = true;
+            source.close();
+        }
+    };
+    source.onerror = function () {
+        source.close();
+        if (!finished) pollProgress(taskId, handle);
+    };
+}
+
+function pollProgress(taskId, handle) {
+    handle = handle || createProgressHandler(taskId);
+    let pollInFlight = false;
+    let finished = false;
 
     const timer = setInterval(function () {
-        if (pollInFlight || finalizeStarted) return;
+        if (pollInFlight || finished) return;
         pollInFlight = true;
 
         fetch(`${API_BASE_URL}/download_progress/${taskId}`)
             .then(r => r.json())
             .then(data => {
-                const pct = data.progress || 0;
-                bar.style.width = pct + '%';
-                percent.textContent = pct + '%';
-                msg.textContent = data.message || '';
-
-                if (data.status === 'downloading') {
-                    stepDl.className = 'dl-step active';
-                    stepMrg.className = 'dl-step';
-                    stepDone.className = 'dl-step';
-                } else if (data.status === 'merging') {
-                    stepDl.className = 'dl-step completed';
-                    stepMrg.className = 'dl-step active';
-                    stepDone.className = 'dl-step';
-                } else if ((data.status === 'done' || data.status === 'served') && !finalizeStarted) {
-                    finalizeStarted = true;
-                    clearInterval(timer);
-                    bar.style.width = '100%';
-                    percent.textContent = '100%';
-                    stepDl.className = 'dl-step completed';
-                    stepMrg.className = 'dl-step completed';
-                    stepDone.className = 'dl-step active';
-                    msg.textContent = 'Ready!';
-
-                    setTimeout(function () {
-                        triggerFileDownload(taskId)
-                            .then(function () {
-                                setTimeout(function () {
-                                    overlay.classList.remove('active');
-                                }, 1200);
-                            })
-                            .catch(function (err) {
-                                msg.textContent = err && err.message ? err.message : 'Download failed.';
-                                msg.classList.add('dl-progress-error');
-                                setTimeout(function () { overlay.classList.remove('active'); }, 3500);
-                            });
-                    }, 500);
-                } else if (data.status === 'error') {
-                    finalizeStarted = true;
+                if (handle(data)) {
+                    finished = true;
                     clearInterval(timer);
-                    msg.textContent = data.message || 'Download failed.';
-                    msg.classList.add('dl-progress-error');
-                    setTimeout(function () { overlay.classList.remove('active'); }, 4000);
                 }
             })
             .catch(function () {
@@ -0,0 +1,43 @@
+"""Long-lived responses are capped so they can't take every gthread worker."""
+import threading
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, '_sse_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(app, '_stream_slots', threading.BoundedSemaphore(1))
+    return app.app.test_client()
+
+
+def test_event_streams_over_the_cap_get_503(client):
+    task = app._make_task()
+    first = client.get(f"/download_events/{task['id']}", buffered=False)
+    assert first.status_code == 200
+    assert client.get(f"/download_events/{task['id']}").status_code == 503
+
+    first.close()   # disconnect frees the slot
+    again = client.get(f"/download_events/{task['id']}", buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+def test_refused_live_stream_falls_back_to_the_file(client, tmp_path):
+    path = tmp_path / 'a.m4a'
+    path.write_bytes(b'x' * 10)
+    tasks = []
+    for _ in range(2):
+        task = app._make_task()
+        task.update(status='downloading', _stream_path=str(path), _stream_name='a.m4a',
+                    _stream_mime='audio/mp4')
+        tasks.append(task)
+
+    first = client.get(f"/download_stream/{tasks[0]['id']}", buffered=False)
+    assert first.status_code == 200
+    refused = client.get(f"/download_stream/{tasks[1]['id']}")
+    assert refused.status_code == 503
+    assert app._progress_payload(tasks[1])['stream_state'] == 'aborted'
+    first.close()
@@ -0,0 +1,25 @@
+"""Followers of an identical in-flight download settle without holding the global lock."""
+import app
+
+
+def test_follower_links_the_leader_file_outside_the_lock(monkeypatch, tmp_path):
+    src = tmp_path / 'song.mp3'
+    src.write_bytes(b'x' * 10)
+    leader = app._make_task()
+    leader.update(status='done', filepath=str(src), filename='song.mp3', mime_type='audio/mpeg')
+    follower = app._make_task()
+    follower.update(status='downloading', _leader_id=leader['id'])
+
+    held = []
+    real_link = app._link_or_copy
+
+    def link(src, dest):
+        held.append(app._inflight_lock.locked())
+        return real_link(src, dest)
+
+    monkeypatch.setattr(app, '_link_or_copy', link)
+    app._sync_follower(follower)
+
+    assert held == [False]
+    assert follower['status'] == 'done' and follower['filepath'] != str(src)
+    assert '_settling' not in follower
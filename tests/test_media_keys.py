@@ -0,0 +1,32 @@
+"""Canonical media keys are shared by the resolve, artifact and in-flight caches."""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://m.youtube.com/shorts/dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://youtu.be/dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://www.tiktok.com/@someone/video/7301234567890123456', 'tiktok:7301234567890123456'),
+    ('https://www.instagram.com/reel/Cabc123/', 'instagram:Cabc123'),
+    ('https://www.facebook.com/watch/?v=1234567890', 'facebook:1234567890'),
+    ('https://open.spotify.com/track/4cOdK2wGLETKBW3PvgPWqT', 'spotify:track:4cOdK2wGLETKBW3PvgPWqT'),
+    ('spotify:track:4cOdK2wGLETKBW3PvgPWqT', 'spotify:track:4cOdK2wGLETKBW3PvgPWqT'),
+])
+def test_known_hosts_map_to_media_ids(url, expected):
+    assert app._canonical_media_id(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    'https://notyoutube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtube.com.evil.example/watch?v=dQw4w9WgXcQ',
+    'https://evilyoutu.be/dQw4w9WgXcQ',
+    'https://faketiktok.com/@x/video/7301234567890123456',
+    'https://notinstagram.com/p/Cabc123/',
+    'https://myfb.com/watch/?v=1234567890',
+    'https://notspotify.com/track/4cOdK2wGLETKBW3PvgPWqT',
+])
+def test_lookalike_hosts_get_no_media_id(url):
+    assert app._canonical_media_id(url) is None
+    assert app._media_key(url).startswith('url:')
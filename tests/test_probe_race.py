@@ -0,0 +1,42 @@
+"""Player clients are raced only when the leading probe fails or is slow."""
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    calls = []
+
+    def fake_probe(video_url, client):
+        calls.append(client)
+        if client == 'blocked':
+            raise Exception('Sign in to confirm you are not a bot')
+        if client == 'slow':
+            time.sleep(0.3)
+        return {'client': client}, 720
+
+    monkeypatch.setattr(app, '_probe_client', fake_probe)
+    monkeypatch.setattr(app, 'YT_PROBE_CONCURRENCY', 3)
+    monkeypatch.setattr(app, 'YT_PROBE_HEDGE_SECONDS', 0.05)
+    return calls
+
+
+def test_healthy_leader_is_probed_alone(probes):
+    info, client, _ = app._race_player_clients('u', ['a', 'b', 'c', 'd'], 1)
+    assert client == 'a' and probes == ['a']
+
+
+def test_failed_leader_widens_the_race(probes):
+    info, client, error = app._race_player_clients('u', ['blocked', 'a', 'b', 'c'], 1)
+    assert client in ('a', 'b') and error is not None
+    assert probes[0] == 'blocked' and 'c' not in probes
+
+
+def test_slow_leader_is_hedged(probes):
+    start = time.monotonic()
+    info, client, _ = app._race_player_clients('u', ['slow', 'a', 'b'], 1)
+    assert client in ('a', 'b')
+    assert time.monotonic() - start < 0.25
@@ -0,0 +1,25 @@
+"""Resolve cache entries keep only the fields the result card renders."""
+import app
+
+
+def test_cached_entry_drops_formats_and_captions(monkeypatch):
+    info = {
+        'id': 'dQw4w9WgXcQ', 'title': 'Video', 'uploader': 'Channel', 'duration': 212,
+        'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'thumbnail': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/hqdefault.jpg',
+        'artist_image': 'https://yt3.ggpht.com/avatar',
+        'formats': [{'url': 'https://rr1.googlevideo.com/videoplayback', 'height': 720,
+                     'vcodec': 'avc1', 'acodec': 'mp4a', 'ext': 'mp4'}],
+        'automatic_captions': {'en': [{'url': 'https://www.youtube.com/api/timedtext'}]},
+        'thumbnails': [{'url': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/0.jpg'}],
+    }
+    monkeypatch.setattr(app, 'extract_video_info', lambda url, target_height=None: dict(info))
+    monkeypatch.setattr(app, '_resolve_cache', app._TTLCache(10, 60))
+
+    resolved, platform_id = app.resolve_video_data('https://youtu.be/dQw4w9WgXcQ')
+    cached = app._resolve_cache.get(app._media_key('https://youtu.be/dQw4w9WgXcQ'))
+
+    assert platform_id == 'youtube'
+    assert resolved == cached
+    assert not {'formats', 'automatic_captions', 'thumbnails'} & set(cached)
+    assert cached['title'] == 'Video' and cached['best_quality_label']
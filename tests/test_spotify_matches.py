@@ -0,0 +1,26 @@
+"""Remembered matches carry the track's ISRC from the Web API's external_ids."""
+import app
+
+
+def test_isrc_is_fetched_when_the_record_is_not_cached(monkeypatch):
+    lookups = []
+
+    def lookup(kind, item_id):
+        lookups.append((kind, item_id))
+        return {'id': item_id, 'external_ids': {'isrc': 'GBUM71029604'}}
+
+    monkeypatch.setattr(app, 'spotify_lookup', lookup)
+    monkeypatch.setattr(app, '_spotify_records', app._TTLCache(10, 60))
+
+    assert app._spotify_track_isrc('4u7EnebtmKWzUH433cf5Qv') is None   # cache only
+    assert app._spotify_track_isrc('4u7EnebtmKWzUH433cf5Qv', fetch=True) == 'GBUM71029604'
+    assert lookups == [('track', '4u7EnebtmKWzUH433cf5Qv')]
+
+
+def test_isrc_lookup_failure_is_not_fatal(monkeypatch):
+    def lookup(kind, item_id):
+        raise Exception('Spotify tracks lookup failed (503)')
+
+    monkeypatch.setattr(app, 'spotify_lookup', lookup)
+    monkeypatch.setattr(app, '_spotify_records', app._TTLCache(10, 60))
+    assert app._spotify_track_isrc('4u7EnebtmKWzUH433cf5Qv', fetch=True) is None
@@ -0,0 +1,25 @@
+"""Match searches that haven't started are dropped once a confident match is found."""
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+
+def test_confident_match_cancels_queued_searches(monkeypatch):
+    queries = []
+
+    def fake_search(query, extra_opts=None):
+        queries.append(query)
+        return [{'url': 'https://www.youtube.com/watch?v=abc', 'title': 'Bohemian Rhapsody',
+                 'uploader': 'Queen', 'duration': 354}]
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app, '_search_pool', pool)
+    monkeypatch.setattr(app, '_flat_search', fake_search)
+    monkeypatch.setattr(app, '_notify_task', lambda task, force=False: None)
+
+    ranked = app._find_spotify_candidates({}, 'Bohemian Rhapsody', 'Queen', ['Queen'], 354)
+    pool.shutdown(wait=True)
+
+    assert ranked[0][1] == 'https://www.youtube.com/watch?v=abc'
+    assert ranked[0][0] >= app.SPOTIFY_MATCH_CONFIDENT
+    assert len(queries) < 4
@@ -0,0 +1,73 @@
+"""Streaming transcodes count against the same ffmpeg limit as yt-dlp's postprocessors."""
+import threading
+import time
+
+import app
+
+
+class _FakeFfmpeg:
+    """Stands in for subprocess.Popen; tracks how many run at once."""
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def __init__(self, *args, **kwargs):
+        self.returncode = None
+        self.stdin = self
+        self.closed = False
+        with _FakeFfmpeg.lock:
+            _FakeFfmpeg.running += 1
+            _FakeFfmpeg.peak = max(_FakeFfmpeg.peak, _FakeFfmpeg.running)
+
+    def write(self, chunk):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def _exit(self, code):
+        if self.returncode is None:
+            with _FakeFfmpeg.lock:
+                _FakeFfmpeg.running -= 1
+            self.returncode = code
+
+    def wait(self, timeout=None):
+        self._exit(0)
+        return 0
+
+    def kill(self):
+        self._exit(-9)
+
+
+def _slow_chunks(url, headers, size=None):
+    for _ in range(3):
+        time.sleep(0.05)
+        yield b'x' * 1024
+
+
+def test_streaming_transcodes_respect_the_slot_limit(monkeypatch, tmp_path):
+    limit = 2
+    monkeypatch.setattr(app, '_transcode_slots', app._TranscodeSlots(limit))
+    monkeypatch.setattr(app.subprocess, 'Popen', _FakeFfmpeg)
+    monkeypatch.setattr(app, '_iter_media_chunks', _slow_chunks)
+    info = {'url': 'https://example.com/a', 'protocol': 'https', 'acodec': 'opus', 'id': 'a'}
+
+    tasks = [app._make_task() for _ in range(limit + 1)]
+    results = []
+    threads = [
+        threading.Thread(target=lambda t=t: results.append(
+            app._stream_transcode_audio(t, info, 'mp3', str(tmp_path))
+        ))
+        for t in tasks
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert len(results) == limit + 1 and all(results)
+    assert _FakeFfmpeg.peak == limit
+    stats = app._transcode_slots.stats()
+    assert stats['active'] == 0 and stats['streamed_jobs'] == limit + 1
+    assert any(t['transcode_wait'] > 0.05 for t in tasks)   # the extra one queued
+    assert all(t.get('stream_seconds', 0) > 0 and not t.get('transcode_seconds') for t in tasks)